@@ -0,0 +1,5 @@
+# coding=utf-8
+
+from JPKay.analysis.adhesion import analyze_adhesion, analyze_samples, fit_baseline, stack_curves, stack_segment
+from JPKay.analysis.steps import detect_sample_steps, detect_steps, rolling_step_statistic, segment_sampling_rate
+from JPKay.analysis.elasticity import FIT_DTYPE, MODELS, contact_factor, fit_elasticity, fit_samples, indentation_axis
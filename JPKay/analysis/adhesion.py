@@ -0,0 +1,221 @@
+# coding=utf-8
+
+import numpy as np
+import pandas as pd
+
+from JPKay.core.channel_array import ChannelArray
+
+# result columns of analyze_adhesion and their dtypes
+ADHESION_COLUMNS = (('baseline_slope', np.float64), ('baseline_intercept', np.float64), ('noise', np.float64),
+                    ('contact_index', np.intp), ('contact_height', np.float64), ('max_adhesion', np.float64),
+                    ('max_adhesion_height', np.float64), ('detachment_index', np.intp),
+                    ('detachment_length', np.float64), ('work', np.float64))
+
+
+def stack_curves(curves, dtype=np.float64):
+    """
+    Stack curves of possibly different length into one 2-D array of shape (curves, samples), padded with NaN to
+    the length of the longest curve.
+
+    :param curves: 1-D arrays, :class:`~JPKay.core.channel_array.ChannelArray` are converted straight into the result
+    :type curves: iterable
+    :param dtype: float dtype of the result
+    :type dtype: numpy.dtype
+    :return: stacked curves and the length of each curve
+    :rtype: tuple
+    """
+    curves = list(curves)
+    lengths = np.array([len(curve) for curve in curves], dtype=np.intp)
+    stacked = np.full((len(curves), lengths.max(initial=0)), np.nan, dtype=dtype)
+    for row, (curve, length) in enumerate(zip(curves, lengths)):
+        if isinstance(curve, ChannelArray):
+            curve.convert(out=stacked[row, :length])
+        else:
+            stacked[row, :length] = curve
+    return stacked, lengths
+
+
+def stack_segment(samples, segment='retract', dtype=np.float64):
+    """
+    Stack force and height of one segment of many samples, see :func:`stack_curves`.
+
+    :param samples: loaded force files
+    :type samples: iterable of :class:`~JPKay.core.data_structures.CellHesion`
+    :param segment: segment name
+    :type segment: str
+    :param dtype: float dtype of the result
+    :type dtype: numpy.dtype
+    :return: force, height and the length of each curve
+    :rtype: tuple
+    """
+    forces, heights = [], []
+    for sample in samples:
+        forces.append(sample.load_channel(segment, 'force'))
+        heights.append(sample.load_channel(segment, 'height'))
+    force, lengths = stack_curves(forces, dtype=dtype)
+    height, _ = stack_curves(heights, dtype=dtype)
+    return force, height, lengths
+
+
+def _lengths(force, lengths):
+    if lengths is None:
+        return (~np.isnan(force)).sum(axis=1)
+    return np.asarray(lengths, dtype=np.intp)
+
+
+def fit_baseline(force, height, lengths=None, fraction=0.2):
+    """
+    Fit a straight line force over height to the last ``fraction`` of each curve, where the cantilever is free,
+    all curves at once.
+
+    :param force: stacked forces, shape (curves, samples)
+    :type force: numpy.ndarray
+    :param height: stacked heights, same shape as ``force``
+    :type height: numpy.ndarray
+    :param lengths: valid samples of each curve, counted from the NaN padding if not given
+    :type lengths: numpy.ndarray
+    :param fraction: fraction of the curve used as baseline
+    :type fraction: float
+    :return: slope, intercept and standard deviation of the residuals of each curve
+    :rtype: tuple
+    """
+    if not 0 < fraction <= 1:
+        raise ValueError("fraction has to be in (0, 1]")
+    lengths = _lengths(force, lengths)
+    positions = np.arange(force.shape[1])
+    start = lengths - np.maximum(np.ceil(lengths * fraction).astype(np.intp), 2)
+    mask = (positions >= start[:, None]) & (positions < lengths[:, None])
+
+    # least squares of all rows in closed form, from masked sums
+    count = mask.sum(axis=1)
+    x = np.where(mask, height, 0.0)
+    y = np.where(mask, force, 0.0)
+    mean_x = x.sum(axis=1) / count
+    mean_y = y.sum(axis=1) / count
+    dx = np.where(mask, height - mean_x[:, None], 0.0)
+    dy = np.where(mask, force - mean_y[:, None], 0.0)
+    variance = (dx * dx).sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        slope = np.where(variance > 0, (dx * dy).sum(axis=1) / variance, 0.0)
+    intercept = mean_y - slope * mean_x
+
+    residuals = np.where(mask, dy - slope[:, None] * dx, 0.0)
+    noise = np.sqrt((residuals * residuals).sum(axis=1) / np.maximum(count - 2, 1))
+    return slope, intercept, noise
+
+
+def _analyze_block(force, height, lengths, fraction, threshold):
+    """Analyze a block of curves, see :func:`analyze_adhesion`"""
+    rows = np.arange(force.shape[0])
+    positions = np.arange(force.shape[1])
+    valid = positions < lengths[:, None]
+
+    slope, intercept, noise = fit_baseline(force, height, lengths, fraction)
+    corrected = force - (slope[:, None] * height + intercept[:, None])
+    corrected[~valid] = np.nan
+
+    # contact: first sample pulling after one pushing
+    crossing = (corrected[:, :-1] > 0) & (corrected[:, 1:] <= 0)
+    has_contact = crossing.any(axis=1)
+    before = crossing.argmax(axis=1)
+    after = np.minimum(before + 1, force.shape[1] - 1)
+    f0, f1 = corrected[rows, before], corrected[rows, after]
+    h0, h1 = height[rows, before], height[rows, after]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        contact_height = np.where(has_contact, h0 + (h1 - h0) * f0 / (f0 - f1), np.nan)
+    contact = np.where(has_contact, after, 0)
+
+    # only the part after contact counts, without contact the whole curve
+    pulling = np.where(valid & (positions >= contact[:, None]), np.minimum(corrected, 0.0), 0.0)
+    pulling = np.nan_to_num(pulling, copy=False)
+
+    adhesion_position = pulling.argmin(axis=1)
+    max_adhesion = -pulling[rows, adhesion_position]
+
+    detached = pulling < -threshold * noise[:, None]
+    has_detachment = detached.any(axis=1)
+    detachment = force.shape[1] - 1 - detached[:, ::-1].argmax(axis=1)
+
+    # steps into the NaN padding do not count, so that a curve's work does not depend on the curves stacked with it
+    steps = np.where(positions[1:] < lengths[:, None], np.abs(np.diff(height, axis=1)), 0.0)
+    work = -(0.5 * (pulling[:, :-1] + pulling[:, 1:]) * steps).sum(axis=1)
+
+    return {
+        'baseline_slope': slope,
+        'baseline_intercept': intercept,
+        'noise': noise,
+        'contact_index': np.where(has_contact, contact, -1),
+        'contact_height': contact_height,
+        'max_adhesion': max_adhesion,
+        'max_adhesion_height': height[rows, adhesion_position],
+        'detachment_index': np.where(has_detachment, detachment, -1),
+        'detachment_length': np.where(has_detachment & has_contact,
+                                      np.abs(height[rows, detachment] - contact_height), np.nan),
+        'work': work,
+    }
+
+
+def analyze_adhesion(force, height, lengths=None, fraction=0.2, threshold=5.0, index=None, chunk_size=1024):
+    """
+    Contact point, maximum adhesion, detachment and adhesion work of many retract curves at once.
+
+    Forces are corrected by a baseline fitted with :func:`fit_baseline`. The contact point is the first zero
+    crossing of the corrected force from pushing to pulling, interpolated linearly. The detachment point is the last
+    sample pulling stronger than ``threshold`` times the baseline noise. Work is the area enclosed by the pulling
+    force and the baseline between contact and the end of the curve.
+
+    - **example usage**::
+
+        >>> force, height, lengths = stack_segment(samples, 'retract')
+        >>> results = analyze_adhesion(force, height, lengths, index=[sample.file for sample in samples])
+        >>> results.max_adhesion.describe()
+
+    :param force: stacked forces, shape (curves, samples)
+    :type force: numpy.ndarray
+    :param height: stacked heights, same shape as ``force``
+    :type height: numpy.ndarray
+    :param lengths: valid samples of each curve, counted from the NaN padding if not given
+    :type lengths: numpy.ndarray
+    :param fraction: fraction of each curve used as baseline
+    :type fraction: float
+    :param threshold: detachment threshold in units of the baseline noise
+    :type threshold: float
+    :param index: index of the results, e.g. file names
+    :type index: iterable
+    :param chunk_size: number of curves analyzed at once
+    :type chunk_size: int
+    :return: one row of results per curve, NaN where a curve has no contact
+    :rtype: pandas.DataFrame
+    """
+    force = np.atleast_2d(np.asarray(force, dtype=np.float64))
+    height = np.atleast_2d(np.asarray(height, dtype=np.float64))
+    if force.shape != height.shape:
+        raise ValueError("force and height have to be of the same shape")
+    lengths = _lengths(force, lengths)
+
+    # blocks of curves bound the memory of intermediate arrays
+    blocks = [_analyze_block(force[start:start + chunk_size], height[start:start + chunk_size],
+                             lengths[start:start + chunk_size], fraction, threshold)
+              for start in range(0, force.shape[0], chunk_size)]
+    if not blocks:
+        return pd.DataFrame({column: np.empty(0, dtype=dtype) for column, dtype in ADHESION_COLUMNS}, index=index)
+    return pd.DataFrame({column: np.concatenate([block[column] for block in blocks]) for column in blocks[0]},
+                        index=index)
+
+
+def analyze_samples(samples, segment='retract', **kwargs):
+    """
+    Stack one segment of many samples and analyze them with :func:`analyze_adhesion`, indexed by file.
+
+    :param samples: loaded force files
+    :type samples: iterable of :class:`~JPKay.core.data_structures.CellHesion`
+    :param segment: segment name
+    :type segment: str
+    :param kwargs: passed on to :func:`analyze_adhesion`
+    :return: one row of results per sample
+    :rtype: pandas.DataFrame
+    """
+    samples = list(samples)
+    force, height, lengths = stack_segment(samples, segment)
+    kwargs.setdefault('index', pd.Index([sample.file for sample in samples], name='file'))
+    return analyze_adhesion(force, height, lengths, **kwargs)
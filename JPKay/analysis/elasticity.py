@@ -0,0 +1,348 @@
+# coding=utf-8
+
+import numpy as np
+
+from JPKay.analysis.adhesion import stack_segment
+from JPKay.data_io.batch import pool_class
+
+
+# force grows with indentation to this power
+MODELS = {'hertz': 1.5, 'sneddon': 2.0}
+
+FIT_DTYPE = np.dtype([
+    ('modulus', np.float64),
+    ('contact', np.float64),
+    ('offset', np.float64),
+    ('rss', np.float64),
+    ('rmse', np.float64),
+    ('r_squared', np.float64),
+    ('iterations', np.int32),
+    ('converged', np.bool_),
+])
+
+
+def contact_factor(model, radius=None, half_angle=None, poisson=0.5):
+    """
+    Factor between Young's modulus and force over indentation to the power of the model, so that
+    ``force = contact_factor * modulus * indentation ** MODELS[model]``.
+
+    :param model: hertz for a spherical indenter of ``radius``, sneddon for a conical one of ``half_angle``
+    :type model: str
+    :param radius: radius of the sphere in m
+    :type radius: float
+    :param half_angle: half opening angle of the cone in degrees
+    :type half_angle: float
+    :param poisson: Poisson's ratio of the sample
+    :type poisson: float
+    :return: contact factor
+    :rtype: float
+    """
+    if model == 'hertz':
+        if radius is None:
+            raise ValueError("hertz model needs the radius of the indenter")
+        return 4 / 3 * np.sqrt(radius) / (1 - poisson ** 2)
+    elif model == 'sneddon':
+        if half_angle is None:
+            raise ValueError("sneddon model needs the half opening angle of the indenter")
+        return 2 / np.pi * np.tan(np.radians(half_angle)) / (1 - poisson ** 2)
+    else:
+        raise ValueError("model has to be one of {}".format(', '.join(sorted(MODELS))))
+
+
+def indentation_axis(force, height, spring_constant=None):
+    """
+    Position of the tip along the approach, growing towards the sample, for many curves at once. Heights are
+    flipped for curves approaching with decreasing height. With a spring constant, the deflection of the
+    cantilever is subtracted, which makes the indentation of the sample the distance past the contact point.
+
+    :param force: stacked forces, shape (curves, samples), NaN padded at the end
+    :type force: numpy.ndarray
+    :param height: stacked heights of the same shape
+    :type height: numpy.ndarray
+    :param spring_constant: spring constant in N/m, one value or one per curve
+    :type spring_constant: float or numpy.ndarray
+    :return: tip positions
+    :rtype: numpy.ndarray
+    """
+    force = np.atleast_2d(force)
+    height = np.atleast_2d(height)
+    lengths = (~np.isnan(height)).sum(axis=1)
+    rows = np.arange(height.shape[0])
+    direction = np.sign(height[rows, np.maximum(lengths - 1, 0)] - height[:, 0])
+    position = np.where(direction == 0, 1.0, direction)[:, None] * height
+    if spring_constant is not None:
+        position = position - force / np.reshape(spring_constant, (-1, 1))
+    return position
+
+
+def _evaluate(x, y, mask, params, exponent):
+    """
+    Derivative of the power by depth past contact, divided by the exponent, model power and masked residuals of
+    ``y = k * max(x - x0, 0) ** exponent + b``
+    """
+    depth = np.maximum(x - params[:, 1:2], 0.0)
+    # a general power is several times slower than these
+    if exponent == 1.5:
+        root = np.sqrt(depth)
+    elif exponent == 2.0:
+        root = depth
+    else:
+        root = depth ** (exponent - 1)
+    power = depth * root
+    residual = np.where(mask, params[:, 0:1] * power + params[:, 2:3] - y, 0.0)
+    return root, power, residual
+
+
+def _initial_guess(x, y, mask, exponent):
+    """
+    Closed-form guess by linearization: past contact, ``(y - b) ** (1 / exponent)`` is a straight line in ``x``
+    crossing zero at the contact point. The baseline ``b`` is the mean of the first fifth of each curve.
+    """
+    lengths = mask.sum(axis=1)
+    positions = np.arange(x.shape[1])
+    early = mask & (positions < np.maximum(lengths // 5, 1)[:, None])
+    baseline = np.where(early, y, 0.0).sum(axis=1) / early.sum(axis=1)
+
+    lifted = np.where(mask, y - baseline[:, None], 0.0)
+    top = lifted.max(axis=1)
+    contact = mask & (lifted > 0.2 * top[:, None])
+    line = np.where(contact, np.maximum(lifted, 0.0) ** (1 / exponent), 0.0)
+
+    count = np.maximum(contact.sum(axis=1), 1)
+    mean_x = np.where(contact, x, 0.0).sum(axis=1) / count
+    mean_y = line.sum(axis=1) / count
+    dx = np.where(contact, x - mean_x[:, None], 0.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        slope = (dx * (line - mean_y[:, None])).sum(axis=1) / (dx * dx).sum(axis=1)
+    good = np.isfinite(slope) & (slope > 0)
+    slope = np.where(good, slope, 1.0)
+    x0 = np.where(good, mean_x - mean_y / slope, 0.5)
+    return np.column_stack([slope ** exponent, x0, baseline])
+
+
+def _fit_block(x, y, mask, exponent, initial, max_iter=100, tol=1e-10):
+    """
+    Levenberg-Marquardt on a block of normalized curves at once, each curve with its own damping. Normal equations
+    of all curves are built from the analytic Jacobian and solved in one batched call per iteration, curves drop out
+    once converged.
+
+    :return: parameters, residual sum of squares, iterations and convergence of each curve
+    :rtype: tuple
+    """
+    curves = x.shape[0]
+    params = np.array(initial, dtype=np.float64)
+    cost = (_evaluate(x, y, mask, params, exponent)[2] ** 2).sum(axis=1)
+    damping = np.full(curves, 1e-3)
+    iterations = np.zeros(curves, dtype=np.int32)
+    converged = np.zeros(curves, dtype=bool)
+    diagonal = np.arange(3)
+
+    for _ in range(max_iter):
+        active = np.flatnonzero(~converged & (damping < 1e12))
+        if not len(active):
+            break
+        xa, ya, ma, pa = x[active], y[active], mask[active], params[active]
+        root, power, residual = _evaluate(xa, ya, ma, pa, exponent)
+
+        # columns of the Jacobian by k, x0 and b, the last one is the mask
+        by_k = np.where(ma, power, 0.0)
+        by_x0 = np.where(ma, root, 0.0)
+        by_x0 *= -pa[:, 0:1] * exponent
+        sum_k, sum_x0, count = by_k.sum(axis=1), by_x0.sum(axis=1), ma.sum(axis=1)
+        cross = (by_k * by_x0).sum(axis=1)
+        normal = np.stack([np.column_stack([(by_k * by_k).sum(axis=1), cross, sum_k]),
+                           np.column_stack([cross, (by_x0 * by_x0).sum(axis=1), sum_x0]),
+                           np.column_stack([sum_k, sum_x0, count])], axis=1)
+        gradient = np.column_stack([(by_k * residual).sum(axis=1), (by_x0 * residual).sum(axis=1),
+                                    residual.sum(axis=1)])
+
+        damped = normal.copy()
+        damped[:, diagonal, diagonal] += damping[active, None] * (normal[:, diagonal, diagonal] + 1e-12)
+        try:
+            step = np.linalg.solve(damped, -gradient[..., None])[..., 0]
+        except np.linalg.LinAlgError:
+            step = np.stack([np.linalg.lstsq(matrix, -vector, rcond=None)[0]
+                             for matrix, vector in zip(damped, gradient)])
+
+        candidate = pa + step
+        new_cost = (_evaluate(xa, ya, ma, candidate, exponent)[2] ** 2).sum(axis=1)
+        better = new_cost < cost[active]
+        improved = active[better]
+
+        converged[improved] = cost[improved] - new_cost[better] <= tol * np.maximum(new_cost[better], 1e-300)
+        params[improved] = candidate[better]
+        cost[improved] = new_cost[better]
+        damping[improved] /= 10
+        damping[active[~better]] *= 10
+        iterations[active] += 1
+
+    # no more progress possible at the smallest steps means a minimum as well
+    converged |= damping >= 1e12
+    return params, cost, iterations, converged
+
+
+def _neighbors(curves, shape):
+    """Indices of the neighbors of each curve, -1 where there is none"""
+    index = np.arange(curves)
+    if shape is None:
+        return np.column_stack([index - 1, np.where(index + 1 < curves, index + 1, -1)])
+    rows, columns = shape
+    if rows * columns != curves:
+        raise ValueError("shape {} does not match {} curves".format(shape, curves))
+    row, column = np.divmod(index, columns)
+    return np.column_stack([np.where(column > 0, index - 1, -1), np.where(column < columns - 1, index + 1, -1),
+                            np.where(row > 0, index - columns, -1), np.where(row < rows - 1, index + columns, -1)])
+
+
+def fit_elasticity(force, position, model='hertz', radius=None, half_angle=None, poisson=0.5, shape=None,
+                   initial=None, warm_start=True, min_r_squared=0.9, max_iter=100, tol=1e-10, workers=None,
+                   executor='process', chunk_size=1024):
+    """
+    Fit Young's modulus, contact point and force offset of many approach curves at once, with the Hertz model of a
+    spherical or the Sneddon model of a conical indenter, see :func:`contact_factor`.
+
+    Each curve starts from a closed-form guess of the linearized model. With ``warm_start``, curves that did not
+    converge or fit worse than ``min_r_squared`` are fitted again, starting from the median parameters of their
+    successful neighbors, which are the adjacent pixels on a force map of ``shape`` or adjacent curves otherwise.
+    Results of an earlier fit may be given as ``initial`` to start from.
+
+    - **example usage**::
+
+        >>> force_map = ForceMap(r'path/to/jpk-force-map/file')
+        >>> force = force_map.channel_array('approach', 'force').reshape(-1, samples)
+        >>> height = force_map.channel_array('approach', 'height').reshape(-1, samples)
+        >>> position = indentation_axis(force, height, spring_constant=0.01)
+        >>> fits = fit_elasticity(force, position, radius=5e-6, shape=force_map.shape, workers=4)
+        >>> moduli = fits['modulus'].reshape(force_map.shape)
+
+    :param force: stacked forces, shape (curves, samples), NaN padded at the end
+    :type force: numpy.ndarray
+    :param position: stacked tip positions growing towards the sample, see :func:`indentation_axis`
+    :type position: numpy.ndarray
+    :param model: either hertz or sneddon
+    :type model: str
+    :param radius: radius of a spherical indenter in m
+    :type radius: float
+    :param half_angle: half opening angle of a conical indenter in degrees
+    :type half_angle: float
+    :param poisson: Poisson's ratio of the sample
+    :type poisson: float
+    :param shape: grid shape of a force map, the curves are ordered row by row
+    :type shape: tuple
+    :param initial: results of an earlier fit of the same curves to start from
+    :type initial: numpy.ndarray
+    :param warm_start: refit failed curves starting from their neighbors
+    :type warm_start: bool
+    :param min_r_squared: coefficient of determination below which a fit is refitted
+    :type min_r_squared: float
+    :param max_iter: maximum number of iterations
+    :type max_iter: int
+    :param tol: relative decrease of the residuals below which a fit has converged
+    :type tol: float
+    :param workers: number of workers fitting blocks of curves in parallel, serial if None
+    :type workers: int
+    :param executor: either process or thread
+    :type executor: str
+    :param chunk_size: number of curves in a block
+    :type chunk_size: int
+    :return: one record of :data:`FIT_DTYPE` per curve
+    :rtype: numpy.ndarray
+    """
+    if model not in MODELS:
+        raise ValueError("model has to be one of {}".format(', '.join(sorted(MODELS))))
+    exponent = MODELS[model]
+    factor = contact_factor(model, radius=radius, half_angle=half_angle, poisson=poisson)
+
+    force = np.atleast_2d(np.asarray(force, dtype=np.float64))
+    position = np.atleast_2d(np.asarray(position, dtype=np.float64))
+    if force.shape != position.shape:
+        raise ValueError("force and position have to be of the same shape")
+    curves = force.shape[0]
+    mask = ~(np.isnan(force) | np.isnan(position))
+
+    # all curves are scaled to the unit square, which keeps the normal equations well conditioned
+    with np.errstate(invalid='ignore'):
+        x_min = np.nanmin(np.where(mask, position, np.nan), axis=1)
+        x_scale = np.nanmax(np.where(mask, position, np.nan), axis=1) - x_min
+        y_scale = np.nanmax(np.where(mask, np.abs(force), np.nan), axis=1)
+    x_scale = np.where(x_scale > 0, x_scale, 1.0)
+    y_scale = np.where(y_scale > 0, y_scale, 1.0)
+    x = np.where(mask, (position - x_min[:, None]) / x_scale[:, None], 0.0)
+    y = np.where(mask, force / y_scale[:, None], 0.0)
+
+    def normalize(fits):
+        return np.column_stack([fits['modulus'] * factor * x_scale ** exponent / y_scale,
+                                (fits['contact'] - x_min) / x_scale, fits['offset'] / y_scale])
+
+    if initial is not None:
+        start = normalize(initial)
+    else:
+        start = _initial_guess(x, y, mask, exponent)
+
+    # checked up front, also when the fit runs serially
+    executor_class = pool_class(executor)
+
+    blocks = [slice(begin, begin + chunk_size) for begin in range(0, curves, chunk_size)]
+    arguments = [(x[block], y[block], mask[block], exponent, start[block], max_iter, tol) for block in blocks]
+    if workers is None or workers <= 1 or len(blocks) == 1:
+        outcomes = [_fit_block(*argument) for argument in arguments]
+    else:
+        with executor_class(max_workers=workers) as pool:
+            outcomes = list(pool.map(_fit_block, *zip(*arguments)))
+    params, cost, iterations, converged = (np.concatenate(parts) for parts in zip(*outcomes))
+
+    centered = np.where(mask, y - (y.sum(axis=1) / np.maximum(mask.sum(axis=1), 1))[:, None], 0.0)
+    total = (centered * centered).sum(axis=1)
+
+    if warm_start and curves > 1:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            failed = ~converged | (1 - cost / total < min_r_squared)
+        neighbors = _neighbors(curves, shape)
+        donors = np.where((neighbors >= 0) & ~failed[np.maximum(neighbors, 0)], neighbors, -1)
+        retry = np.flatnonzero(failed & (donors >= 0).any(axis=1))
+        if len(retry):
+            # neighbor parameters in real units, then scaled to each curve
+            real = np.column_stack([params[:, 0] * y_scale / x_scale ** exponent,
+                                    params[:, 1] * x_scale + x_min, params[:, 2] * y_scale])
+            candidates = np.where((donors[retry] >= 0)[..., None], real[np.maximum(donors[retry], 0)], np.nan)
+            guess = np.nanmedian(candidates, axis=1)
+            guess = np.column_stack([guess[:, 0] * x_scale[retry] ** exponent / y_scale[retry],
+                                     (guess[:, 1] - x_min[retry]) / x_scale[retry], guess[:, 2] / y_scale[retry]])
+            refit = _fit_block(x[retry], y[retry], mask[retry], exponent, guess, max_iter, tol)
+            better = refit[1] < cost[retry]
+            chosen = retry[better]
+            params[chosen], cost[chosen], converged[chosen] = refit[0][better], refit[1][better], refit[3][better]
+            iterations[retry] += refit[2]
+
+    results = np.empty(curves, dtype=FIT_DTYPE)
+    results['modulus'] = params[:, 0] * y_scale / x_scale ** exponent / factor
+    results['contact'] = params[:, 1] * x_scale + x_min
+    results['offset'] = params[:, 2] * y_scale
+    results['rss'] = cost * y_scale ** 2
+    results['rmse'] = np.sqrt(results['rss'] / np.maximum(mask.sum(axis=1), 1))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        results['r_squared'] = 1 - cost / total
+    results['iterations'] = iterations
+    results['converged'] = converged
+    return results
+
+
+def fit_samples(samples, segment='approach', **kwargs):
+    """
+    Stack one segment of many samples and fit it with :func:`fit_elasticity`, corrected for the deflection of
+    each sample's cantilever.
+
+    :param samples: loaded force files
+    :type samples: iterable of :class:`~JPKay.core.data_structures.CellHesion`
+    :param segment: segment name
+    :type segment: str
+    :param kwargs: passed on to :func:`fit_elasticity`
+    :return: one record of :data:`FIT_DTYPE` per sample
+    :rtype: numpy.ndarray
+    """
+    samples = list(samples)
+    force, height, lengths = stack_segment(samples, segment)
+    spring_constants = [sample.properties.conversion_factors['vDeflection']['force multiplier']
+                        for sample in samples]
+    return fit_elasticity(force, indentation_axis(force, height, np.array(spring_constants, dtype=np.float64)),
+                          **kwargs)
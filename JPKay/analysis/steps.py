@@ -0,0 +1,208 @@
+# coding=utf-8
+
+import numpy as np
+import pandas as pd
+
+from JPKay.analysis.adhesion import stack_segment
+
+
+def _design(window):
+    """Inverse normal matrix of a straight line plus a step in the middle of ``2 * window`` samples"""
+    local = np.arange(2 * window, dtype=np.float64)
+    design = np.column_stack([np.ones(2 * window), local, local >= window])
+    return np.linalg.inv(design.T @ design)
+
+
+def rolling_step_statistic(data, window):
+    """
+    Step height and its t statistic at each position of many curves at once.
+
+    At each position, a straight line with a step in the middle is fitted by least squares to the ``window``
+    samples left and the ``window`` samples right of it. A common slope keeps steady loading from passing for a
+    step. As all windows share the same design, the fit only needs window sums of the data, of the data times the
+    sample index and of the squared data, which come from cumulative sums. So the cost is linear in the number of
+    samples whatever the window.
+
+    :param data: stacked curves, shape (curves, samples), NaN padded at the end
+    :type data: numpy.ndarray
+    :param window: samples on each side
+    :type window: int
+    :return: step height and t statistic, NaN where the windows do not fit into the curve
+    :rtype: tuple
+    """
+    if window < 2:
+        raise ValueError("window has to be at least 2 samples")
+    data = np.atleast_2d(data)
+    curves, samples = data.shape
+    step = np.full((curves, samples), np.nan)
+    t = np.full((curves, samples), np.nan)
+    if samples < 2 * window:
+        return step, t
+
+    # centering keeps the cumulative sums small, which preserves precision of the window sums
+    valid = ~np.isnan(data)
+    centered = np.where(valid, data - np.nanmean(data, axis=1, keepdims=True), 0.0)
+    index = np.arange(samples, dtype=np.float64)
+
+    def window_sums(values):
+        cumulative = np.zeros((curves, samples + 1))
+        np.cumsum(values, axis=1, out=cumulative[:, 1:])
+        return cumulative[:, window:samples - window + 1] - cumulative[:, :samples - 2 * window + 1], \
+            cumulative[:, 2 * window:] - cumulative[:, window:samples - window + 1]
+
+    sum_left, sum_right = window_sums(centered)
+    squares_left, squares_right = window_sums(centered * centered)
+    moment_left, moment_right = window_sums(centered * index)
+    count_left, count_right = window_sums(valid)
+
+    # moments relative to the start of the windows
+    total = sum_left + sum_right
+    moment = moment_left + moment_right - index[:samples - 2 * window + 1] * total
+
+    inverse = _design(window)
+    fitted = [inverse[row, 0] * total + inverse[row, 1] * moment + inverse[row, 2] * sum_right for row in range(3)]
+    residual = squares_left + squares_right - (fitted[0] * total + fitted[1] * moment + fitted[2] * sum_right)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        statistic = fitted[2] / np.sqrt(np.maximum(residual, 0.0) / (2 * window - 3) * inverse[2, 2])
+
+    # windows reaching into the NaN padding
+    complete = count_left + count_right == 2 * window
+    middle = slice(window, samples - window + 1)
+    step[:, middle] = np.where(complete, fitted[2], np.nan)
+    t[:, middle] = np.where(complete, statistic, np.nan)
+    return step, t
+
+
+def _peaks(t, threshold, window):
+    """
+    Row and position of the largest ``|t|`` of every run of consecutive samples above ``threshold``. Runs next to a
+    stronger one within ``window`` samples are side lobes of the stronger step: with a step inside one of the
+    windows, the fitted line tilts and produces a weaker step of opposite sign.
+    """
+    magnitude = np.abs(np.nan_to_num(t, nan=0.0, posinf=np.inf, neginf=-np.inf))
+    above = magnitude >= threshold
+    rows, positions = np.nonzero(above)
+    if not len(rows):
+        return rows, positions
+
+    # a new run starts wherever the previous sample was below threshold or on another curve
+    starts = np.ones(len(rows), dtype=bool)
+    starts[1:] = (rows[1:] != rows[:-1]) | (positions[1:] != positions[:-1] + 1)
+    runs = np.cumsum(starts)
+
+    # largest magnitude first within each run
+    order = np.lexsort((-magnitude[rows, positions], runs))
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = runs[order][1:] != runs[order][:-1]
+    rows, positions = rows[order][first], positions[order][first]
+    strength = magnitude[rows, positions]
+
+    close = (rows[1:] == rows[:-1]) & (positions[1:] - positions[:-1] <= window)
+    keep = np.ones(len(rows), dtype=bool)
+    keep[1:] &= ~(close & (strength[:-1] > strength[1:]))
+    keep[:-1] &= ~(close & (strength[1:] > strength[:-1]))
+    return rows[keep], positions[keep]
+
+
+def detect_steps(force, height=None, window=50, threshold=6.0, sampling_rate=1.0, chunk_size=4):
+    """
+    Detect steps like rupture events in many force curves at once, with a rolling t-test of a step on a straight
+    line, see :func:`rolling_step_statistic`.
+
+    A step is reported at the largest ``|t|`` of every stretch exceeding ``threshold``. Its height is positive for
+    steps towards higher force, like bond ruptures on retract. The loading rate is the slope of a straight line
+    fitted to the force in the window before the step.
+
+    - **example usage**::
+
+        >>> force, height, lengths = stack_segment(samples, 'retract')
+        >>> steps = detect_steps(force, height, window=100, sampling_rate=5000)
+        >>> steps.groupby('curve').size()  # number of ruptures per curve
+
+    :param force: stacked forces, shape (curves, samples), NaN padded at the end
+    :type force: numpy.ndarray
+    :param height: stacked heights of the same shape, optional
+    :type height: numpy.ndarray
+    :param window: samples on each side of a step
+    :type window: int
+    :param threshold: minimal t statistic of a step
+    :type threshold: float
+    :param sampling_rate: samples per second, one value or one per curve
+    :type sampling_rate: float or numpy.ndarray
+    :param chunk_size: number of curves processed at once, bounds memory on long curves
+    :type chunk_size: int
+    :return: one row per step with curve, index, height, step, t and loading_rate
+    :rtype: pandas.DataFrame
+    """
+    force = np.atleast_2d(np.asarray(force, dtype=np.float64))
+    if height is not None:
+        height = np.atleast_2d(np.asarray(height, dtype=np.float64))
+        if height.shape != force.shape:
+            raise ValueError("force and height have to be of the same shape")
+    sampling_rate = np.broadcast_to(np.asarray(sampling_rate, dtype=np.float64), (force.shape[0],))
+
+    curves, positions, heights, statistics = [], [], [], []
+    for start in range(0, force.shape[0], chunk_size):
+        step, t = rolling_step_statistic(force[start:start + chunk_size], window)
+        rows, columns = _peaks(t, threshold, window)
+        curves.append(rows + start)
+        positions.append(columns)
+        heights.append(step[rows, columns])
+        statistics.append(t[rows, columns])
+    curves = np.concatenate(curves) if curves else np.empty(0, dtype=np.intp)
+    positions = np.concatenate(positions) if positions else np.empty(0, dtype=np.intp)
+    heights = np.concatenate(heights) if heights else np.empty(0)
+    statistics = np.concatenate(statistics) if statistics else np.empty(0)
+
+    # the window before each step only, steps are few compared to the samples
+    offsets = np.arange(window)
+    before = force[curves[:, None], positions[:, None] - window + offsets]
+    centered_time = offsets - (window - 1) / 2
+    slope = ((before - before.mean(axis=1, keepdims=True)) * centered_time).sum(axis=1) / \
+        (centered_time * centered_time).sum()
+
+    return pd.DataFrame({
+        'curve': curves,
+        'index': positions,
+        'height': height[curves, positions] if height is not None else np.full(len(curves), np.nan),
+        'step': heights,
+        't': statistics,
+        'loading_rate': slope * sampling_rate[curves],
+    })
+
+
+def segment_sampling_rate(properties, segment):
+    """
+    Sampling rate of a segment from its number of points and duration.
+
+    :param properties: properties of a force file
+    :type properties: :class:`~JPKay.core.data_structures.Properties`
+    :param segment: segment name
+    :type segment: str
+    :return: samples per second
+    :rtype: float
+    """
+    header = properties.segments[segment]
+    return float(header['force-segment-header.num-points']) / float(header['force-segment-header.duration'])
+
+
+def detect_sample_steps(samples, segment='retract', **kwargs):
+    """
+    Stack one segment of many samples and detect steps with :func:`detect_steps`, at the sampling rate of each
+    sample.
+
+    :param samples: loaded force files
+    :type samples: iterable of :class:`~JPKay.core.data_structures.CellHesion`
+    :param segment: segment name
+    :type segment: str
+    :param kwargs: passed on to :func:`detect_steps`
+    :return: one row per step, with the file it was found in
+    :rtype: pandas.DataFrame
+    """
+    samples = list(samples)
+    force, height, lengths = stack_segment(samples, segment)
+    kwargs.setdefault('sampling_rate', [segment_sampling_rate(sample.properties, segment) for sample in samples])
+    steps = detect_steps(force, height, **kwargs)
+    files = np.array([sample.file for sample in samples], dtype=object)
+    steps.insert(0, 'file', files[steps.curve.values])
+    return steps
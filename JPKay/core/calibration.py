@@ -0,0 +1,101 @@
+# coding=utf-8
+
+import numpy as np
+
+
+def affine_update(old, new):
+    """
+    Ratio and shift turning data converted with one scale and offset into data converted with another, so that
+    ``new_data = ratio * old_data + shift`` without going back to the encoded data. Works on scalars and arrays alike.
+
+    :param old: scale and offset the data was converted with
+    :type old: tuple
+    :param new: scale and offset to convert with instead
+    :type new: tuple
+    :return: ratio and shift
+    :rtype: tuple
+    """
+    old_scale, old_offset = np.asarray(old[0], dtype=np.float64), np.asarray(old[1], dtype=np.float64)
+    new_scale, new_offset = np.asarray(new[0], dtype=np.float64), np.asarray(new[1], dtype=np.float64)
+    ratio = new_scale / old_scale
+    return ratio, new_offset - old_offset * ratio
+
+
+def rescale_curves(curves, ratio, shift):
+    """
+    Apply an affine update in-place, to a single curve or to curves stacked along the first axis, e.g. by
+    :func:`~JPKay.analysis.adhesion.stack_segment`, with one ratio and shift per curve. NaN padding stays NaN.
+
+    :param curves: converted data, one curve per row
+    :type curves: numpy.ndarray
+    :param ratio: ratio of every curve, see :func:`affine_update`
+    :type ratio: numpy.ndarray
+    :param shift: shift of every curve
+    :type shift: numpy.ndarray
+    :return: ``curves``
+    :rtype: numpy.ndarray
+    """
+    ratio = np.asarray(ratio, dtype=np.float64)
+    shift = np.asarray(shift, dtype=np.float64)
+    if curves.ndim > 1 and ratio.ndim:
+        ratio = ratio.reshape(ratio.shape + (1,) * (curves.ndim - ratio.ndim))
+        shift = shift.reshape(shift.shape + (1,) * (curves.ndim - shift.ndim))
+    curves *= ratio
+    curves += shift
+    return curves
+
+
+def _per_sample(value, samples, name):
+    """Override of every sample, from a scalar, a sequence with one value per sample or a dictionary by file path"""
+    if value is None or np.isscalar(value):
+        return [value] * len(samples)
+    if isinstance(value, dict):
+        return [value.get(sample.file) for sample in samples]
+    value = list(value)
+    if len(value) != len(samples):
+        raise ValueError("{} has to be given once for all or once per sample".format(name))
+    return value
+
+
+def recalibrate_samples(samples, spring_constant=None, sensitivity=None, multipliers=None):
+    """
+    Recalibrate many loaded samples, see :func:`~JPKay.core.data_structures.CellHesion.recalibrate`. Everything
+    already converted is updated in-place, no force file is read again.
+
+    Overrides are given once for all samples, as a sequence with one value per sample, or as a dictionary by file
+    path, in which case samples not contained keep their calibration. The returned updates apply the same
+    recalibration to data derived from the samples before, e.g. stacked curves:
+
+    - **example usage**::
+
+        >>> force, height, lengths = stack_segment(samples, 'retract')
+        >>> updates = recalibrate_samples(samples, spring_constant={path: 0.021 for path in refitted})
+        >>> rescale_curves(force, *updates['force'])
+
+    :param samples: loaded force files
+    :type samples: list of :class:`~JPKay.core.data_structures.CellHesion`
+    :param spring_constant: spring constant in N/m
+    :type spring_constant: float, sequence or dict
+    :param sensitivity: sensitivity in m/V
+    :type sensitivity: float, sequence or dict
+    :param multipliers: further multipliers by (JPK channel, slot), see :func:`.Properties.recalibrate`
+    :type multipliers: dict, sequence or dict of dicts by file path
+    :return: ratio and shift of every sample by channel, e.g. force
+    :rtype: dict
+    """
+    samples = list(samples)
+    spring_constants = _per_sample(spring_constant, samples, 'spring_constant')
+    sensitivities = _per_sample(sensitivity, samples, 'sensitivity')
+    if multipliers is None or isinstance(multipliers, dict) and all(isinstance(key, tuple) for key in multipliers):
+        slot_multipliers = [multipliers] * len(samples)
+    else:
+        slot_multipliers = _per_sample(multipliers, samples, 'multipliers')
+
+    updates = {}
+    for index, sample in enumerate(samples):
+        for channel, update in sample.recalibrate(spring_constant=spring_constants[index],
+                                                  sensitivity=sensitivities[index],
+                                                  multipliers=slot_multipliers[index]).items():
+            ratios, shifts = updates.setdefault(channel, (np.ones(len(samples)), np.zeros(len(samples))))
+            ratios[index], shifts[index] = update
+    return updates
@@ -0,0 +1,150 @@
+# coding=utf-8
+
+import numpy as np
+from numpy.lib.mixins import NDArrayOperatorsMixin
+
+
+class ChannelArray(NDArrayOperatorsMixin):
+    """
+    Encoded channel data, converted to physical units only when read.
+
+    The raw buffer, e.g. the big-endian int32 view returned by :func:`.ForceArchive.read_data`, is kept as it is,
+    next to the :class:`.Properties` of its file. Indexing converts just the selected samples, conversion to a full
+    array happens on :func:`numpy.asarray` or any NumPy function, and nothing converted is kept. The data therefore
+    takes half the memory of float64, or a quarter for 16 bit encodings.
+
+    Scale and offset are looked up in :attr:`.Properties.affine` on every conversion, so after a recalibration of the
+    properties all arrays convert with the new factors without reading the file again.
+
+    - **Methods**
+
+    - convert: converted data of a selection, optionally into a preallocated output
+    - to_slot: same data converted to another calibration slot, e.g. volts
+    - to_numpy: converted data as array
+
+    - **attributes**
+
+        - raw: encoded data
+        - properties: properties of the file the data was read from
+        - channel: JPK channel name, e.g. vDeflection
+        - slot: calibration slot the data is converted to, e.g. force
+        - unit: unit of the converted data, e.g. N
+        - coefficients: current scale and offset of the conversion
+
+    - **example usage**::
+
+        >>> force = sample.load_channel_array('retract', 'force')
+        >>> force.unit, force.nbytes
+        ('N', 4000)
+        >>> force[:10]  # only ten samples are converted
+        >>> np.min(force.to_slot('volts'))
+        >>> adhesion = -np.min(force)  # converted once, not kept
+    """
+
+    def __init__(self, raw, properties, channel, slot=None):
+        if not isinstance(raw, np.ndarray):
+            raise ValueError("raw data has to be numpy array")
+        self.raw = raw
+        self.properties = properties
+        self.channel = channel
+        self.slot = slot or properties.default_slots[channel]
+        # fail early on an unknown channel or slot
+        properties.affine_coefficients(channel, self.slot)
+
+    def __repr__(self):
+        return "ChannelArray({} as {} [{}], {} samples of {})".format(
+            self.channel, self.slot, self.unit, len(self), self.raw.dtype)
+
+    def __len__(self):
+        return len(self.raw)
+
+    @property
+    def shape(self):
+        return self.raw.shape
+
+    @property
+    def ndim(self):
+        return self.raw.ndim
+
+    @property
+    def size(self):
+        return self.raw.size
+
+    @property
+    def dtype(self):
+        """Dtype of the converted data"""
+        return np.dtype(np.float64)
+
+    @property
+    def nbytes(self):
+        """Memory taken by the encoded data"""
+        return self.raw.nbytes
+
+    @property
+    def unit(self):
+        """Unit of the converted data"""
+        unit = self.properties.slot_units.get(self.channel, {}).get(self.slot)
+        if unit is None and self.slot == self.properties.default_slots.get(self.channel):
+            unit = self.properties.units.get(self.channel)
+        return unit
+
+    @property
+    def coefficients(self):
+        """Current scale and offset converting the encoded data, see :func:`.Properties.affine_coefficients`"""
+        return self.properties.affine_coefficients(self.channel, self.slot)
+
+    def convert(self, key=slice(None), out=None, dtype=np.float64):
+        """
+        Convert a selection of the data.
+
+        :param key: anything NumPy can index with, e.g. a slice or a boolean mask
+        :param out: optional preallocated output with the shape of the selection
+        :type out: numpy.ndarray
+        :param dtype: float dtype of the output, if not given as ``out``
+        :type dtype: numpy.dtype
+        :return: converted data, a scalar if ``key`` selects a single sample
+        :rtype: numpy.ndarray
+        """
+        raw = self.raw[key]
+        if not isinstance(raw, np.ndarray):
+            scale, offset = self.coefficients
+            return np.dtype(dtype).type(raw * scale + offset)
+        return self.properties.convert_data(self.channel, raw, slot=self.slot, out=out, dtype=dtype)
+
+    def __getitem__(self, key):
+        return self.convert(key)
+
+    def __iter__(self):
+        return iter(self.convert())
+
+    def __array__(self, dtype=None):
+        return self.convert(dtype=dtype or np.float64)
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        # convert, then compute on plain arrays, so that e.g. force * 1e12 or force < 0 work as for an array
+        inputs = tuple(item.convert() if isinstance(item, ChannelArray) else item for item in inputs)
+        if any(isinstance(item, ChannelArray) for item in kwargs.get('out', ())):
+            return NotImplemented
+        return getattr(ufunc, method)(*inputs, **kwargs)
+
+    def to_numpy(self, dtype=np.float64):
+        """
+        Convert all data.
+
+        :param dtype: float dtype of the output
+        :type dtype: numpy.dtype
+        :return: converted data
+        :rtype: numpy.ndarray
+        """
+        return self.convert(dtype=dtype)
+
+    def to_slot(self, slot):
+        """
+        The same encoded data, converted to another calibration slot.
+
+        :param slot: calibration slot, e.g. volts, distance, force, nominal or calibrated
+        :type slot: str
+        :return: array sharing the encoded data
+        :rtype: ChannelArray
+        """
+        return ChannelArray(self.raw, self.properties, self.channel, slot)
@@ -1,42 +1,246 @@
 # coding=utf-8
 
+import hashlib
+import io
 import os
 import re
-from zipfile import ZipFile
-import dateutil.parser as parser
-import pytz
-from struct import unpack
+import struct
+import threading
+from collections import OrderedDict
+from zipfile import ZipFile, ZIP_STORED
 import numpy as np
 import pandas as pd
 
+from JPKay.core.calibration import affine_update, rescale_curves
+from JPKay.core.channel_array import ChannelArray
+from JPKay.core.encoding import decode
+from JPKay.core.java_properties import parse_properties, parse_timestamp
+from JPKay.utils.profiling import count, profiled, recording, stage
+
+
+# local file header of a zip member, followed by its file name and extra field
+_LOCAL_FILE_HEADER = struct.Struct('<4s2B4HL2L2H')
+
+
+class _ClosedZipFile:
+    """Stand-in for the zip file of an unpickled :class:`.ForceArchive`, which behaves like a closed one"""
+
+    @staticmethod
+    def close():
+        pass
+
+    def __getattr__(self, item):
+        raise ValueError("Attempt to use ZIP archive that was already closed")
+
 
 class ForceArchive:
     """
     Object to handle reading contents of a jpk-force zipped file.
 
+    The archive is opened once and serves as a session for everything reading from the same file: the central
+    directory and the bytes of every member read so far are cached, so handing one instance to :class:`.Properties`
+    and :class:`.CellHesion` avoids re-opening the zip file. Use it as a context manager or call :func:`close` to
+    release the file handle.
+
+    If the whole file was already read into memory, e.g. from high-latency storage, hand its bytes in as
+    ``content``. The archive then works on these bytes only, ``file_path`` just names it.
+
     - **Methods**
 
     - ls: list archive contents
     - read_properties: read utf-8 string decoded content of a property file, one property per list entry
     - read_data: read encoded raw data, must be converted to appropriate physical quantity!
+    - close: close the underlying file handle
+    - reopen: open a closed archive again
+    - release: close the archive and drop all bytes held in memory
+
+    - **example usage**::
+
+        >>> with ForceArchive(r"path/to/jpk-force-file") as archive:
+        ...     props = Properties(archive=archive)
+        ...     sample = CellHesion(archive=archive)
     """
 
     # noinspection SpellCheckingInspection
-    def __init__(self, file_path):
-        self._zip_file = ZipFile(file_path)
-        if not self.read_properties('header.properties')['jpk-data-file'] == 'spm-forcefile':
-            raise ValueError("not a valid spm-forcefile!")
+    @profiled('archive.open')
+    def __init__(self, file_path, cache=True, file_types=('spm-forcefile',), content=None):
+        self.file_path = file_path
+        self._content = content
+        self._zip_file = ZipFile(file_path if content is None else io.BytesIO(content))
+        self._cache = cache
+        self._members = {}
+        self._map = None
         self.contents = self.ls()
+        if self.read_properties('header.properties')['jpk-data-file'] not in file_types:
+            self.close()
+            raise ValueError("not a valid {}!".format(" or ".join(file_types)))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """
+        Close the underlying zip file. Members already read stay available from the cache, reading any other member
+        opens the file again.
+        """
+        self._zip_file.close()
+        self._map = None
+
+    @property
+    def closed(self):
+        """True if the archive was closed, or pickled closed"""
+        return not isinstance(self._zip_file, ZipFile) or self._zip_file.fp is None
+
+    def reopen(self):
+        """Open a closed archive again, e.g. one returned from a worker process, to read further members"""
+        if self.closed:
+            self._zip_file = ZipFile(self.file_path if self._content is None else io.BytesIO(self._content))
+            self._map = None
+
+    def _opened(self):
+        """The zip file, opened again on first access after the archive was closed, e.g. by pickling"""
+        if self.closed:
+            self.reopen()
+        return self._zip_file
+
+    def clear_cache(self):
+        """Drop the cached bytes of all members read so far"""
+        self._members.clear()
+
+    def release(self):
+        """
+        Close the archive and drop all bytes held in memory, the cached members as well as the ``content`` it was
+        created from. Reading any member afterwards opens the file at ``file_path``.
+        """
+        self.close()
+        self.clear_cache()
+        self._content = None
+
+    def __getstate__(self):
+        # an archive is pickled without its member cache, e.g. to return it from a worker process, and closed unless
+        # it works on content still open, which travels along so that lazy samples can decode later
+        state = self.__dict__.copy()
+        state['_zip_file'] = None
+        state['_members'] = {}
+        state['_map'] = None
+        if self.closed:
+            state['_content'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._zip_file = _ClosedZipFile() if self._content is None else ZipFile(io.BytesIO(self._content))
 
     def ls(self):
         """List all files contained in this force-archive"""
         return self._zip_file.infolist()
 
+    def read(self, content_path):
+        """
+        Reads the raw bytes of a file inside the force-archive, served from the member cache if already read.
+
+        :param content_path: internal path to the force-archive file
+        :type content_path: str
+        :return: file content
+        :rtype: bytes
+        """
+        try:
+            content = self._members[content_path]
+        except KeyError:
+            with stage('archive.read'):
+                zip_file = self._opened()
+                content = zip_file.read(content_path)
+                if recording():
+                    info = zip_file.getinfo(content_path)
+                    count(bytes_read=info.compress_size,
+                          bytes_decompressed=0 if info.compress_type == ZIP_STORED else info.file_size)
+            if self._cache:
+                self._members[content_path] = content
+            return content
+
+        # cached by read_buffer
+        if isinstance(content, np.ndarray):
+            return content.tobytes()
+        return content
+
+    def read_buffer(self, content_path, chunk_size=2 ** 20):
+        """
+        Reads the raw content of a file inside the force-archive into a numpy byte buffer, without an intermediate
+        copy. Members stored uncompressed are memory-mapped straight from the archive file, or viewed in the
+        ``content`` the archive was created from. Compressed members are decompressed chunk by chunk into a
+        preallocated buffer.
+
+        :param content_path: internal path to the force-archive file
+        :type content_path: str
+        :param chunk_size: number of bytes decompressed at once
+        :type chunk_size: int
+        :return: file content
+        :rtype: numpy.ndarray
+        """
+        try:
+            return self._members[content_path]
+        except KeyError:
+            pass
+
+        with stage('archive.read'):
+            zip_file = self._opened()
+            info = zip_file.getinfo(content_path)
+            offset = self._data_offset(info)
+            if offset is not None and self._content is not None:
+                buffer = np.frombuffer(self._content, dtype=np.uint8, count=info.file_size, offset=offset)
+            elif offset is not None:
+                # mapped bytes count as read, they are paged in on first access
+                buffer = self._mapped()[offset:offset + info.file_size]
+                count(bytes_read=info.file_size)
+            else:
+                buffer = np.empty(info.file_size, dtype=np.uint8)
+                with zip_file.open(info) as member:
+                    position = 0
+                    for chunk in iter(lambda: member.read(chunk_size), b''):
+                        buffer[position:position + len(chunk)] = np.frombuffer(chunk, dtype=np.uint8)
+                        position += len(chunk)
+                count(bytes_read=info.compress_size, bytes_decompressed=info.file_size)
+
+        if self._cache:
+            self._members[content_path] = buffer
+        return buffer
+
+    def _mapped(self):
+        """
+        The whole archive file, memory-mapped once per session through the handle of the zip file, so that the file
+        is not opened again. None if the archive can not be mapped, e.g. for file-like objects.
+        """
+        if self._map is None:
+            try:
+                # the zip file's lock guards the position of its handle, which mapping moves
+                with self._zip_file._lock:
+                    self._map = np.memmap(self._zip_file.fp, dtype=np.uint8, mode='r')
+            except (AttributeError, OSError, ValueError):
+                self._map = False
+        return self._map if self._map is not False else None
+
+    def _data_offset(self, info):
+        """Offset of a member's data inside the archive file, None if the member can not be used without copy"""
+        if info.compress_type != ZIP_STORED or info.flag_bits & 0x1 or info.file_size == 0:
+            return None
+
+        # the local file header may differ from the central directory in its extra field
+        source = self._content if self._content is not None else self._mapped()
+        if source is None:
+            return None
+        header = _LOCAL_FILE_HEADER.unpack_from(source, info.header_offset)
+        file_name_length, extra_field_length = header[-2:]
+        return info.header_offset + _LOCAL_FILE_HEADER.size + file_name_length + extra_field_length
+
     def read_properties(self, content_path):
         """
         Reads a property file form the force-archive.
 
-        The contents of the property file are elements of a list. Each entry is already decoded to utf-8.
+        The file is parsed with :func:`JPKay.core.java_properties.parse_properties`, the measurement date-time from
+        its header is stored under the key ``timestamp``.
 
         :param content_path: internal path to the force-archive file
         :type content_path: str
@@ -48,31 +252,37 @@ class ForceArchive:
             raise ValueError("this content path is not a property file")
 
         try:
-            with self._zip_file.open(content_path) as file:
-                content = [line.decode('utf-8') for line in file.read().splitlines()]
+            content = self.read(content_path).decode('utf-8')
 
-            # parse prop dictionary (without header date)
-            props = {}
-            for line in content[1:]:
-                key, value = line.split("=")
-                props[key] = value
+            with stage('properties.parse'):
+                # parse prop dictionary (without header date)
+                props = parse_properties(content)
 
-            # parse measurement date-time
-            fmt = '%Y-%m-%d %H:%M:%S %Z%z'
-            utc = pytz.utc
-            props["timestamp"] = utc.localize(parser.parse(content[0][1:], dayfirst=True)).strftime(fmt)
+                # parse measurement date-time from the header comment
+                header = content.split('\n', 1)[0].rstrip()
+                if header.startswith('#'):
+                    props["timestamp"] = parse_timestamp(header)
 
             return props
 
         except IOError:
             print("can't read property file")
 
-    def read_data(self, content_path):
+    def read_data(self, content_path, encoding='signedinteger', dtype=None, column=False):
         """
         Reads the raw integer-encoded data of the specified data file inside a force-archive.
 
+        The data is read with :func:`read_buffer`, so members stored uncompressed are memory-mapped, and decoded with
+        :func:`JPKay.core.encoding.decode`, see there for details on ``dtype`` and ``column``.
+
         :param content_path: internal path to the force-archive file
         :type content_path: str
+        :param encoding: JPK encoder type of the channel, see :data:`JPKay.core.encoding.ENCODER_DTYPES`
+        :type encoding: str
+        :param dtype: optional output dtype, defaults to a zero-copy view in the on-disk encoding
+        :type dtype: numpy.dtype
+        :param column: return legacy ``(N, 1)`` shaped data
+        :type column: bool
         :return: raw data
         :rtype: numpy.ndarray
         """
@@ -81,20 +291,93 @@ class ForceArchive:
             raise ValueError("this content path is not a data file")
 
         try:
-            # read binary data
-            data = self._zip_file.read(content_path)
-
-            # decode using big-endian integer
-            result = []
-            for i in range(int(len(data) / 4)):
-                result.append(unpack('!i', data[i * 4:(i + 1) * 4]))
+            # read binary data, memory-mapped or decompressed without intermediate copies
+            data = self.read_buffer(content_path)
 
             # returning integer-encoded raw data vector
-            return np.array(result)
+            with stage('decode'):
+                return decode(data, encoding=encoding, dtype=dtype, column=column)
         except IOError:
             print("can't read data file")
 
 
+class SharedHeaderCache:
+    """
+    Process-wide LRU cache of parsed ``shared-data/header.properties`` files and everything derived from them, like
+    conversion factors.
+
+    All force files of one measurement session share the same shared header, so it is parsed only once per session.
+    Entries are keyed by the digest of the header's content, excluding its first line, which holds the time the file
+    was written. Use the module-level instance :data:`shared_headers`.
+
+    - **Methods**
+
+    - get: cached entry of a digest, None if not cached
+    - put: store an entry
+    - clear: remove all entries
+    """
+
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def digest(content):
+        """
+        Cache key of the raw content of a shared header.
+
+        :param content: raw content of the shared header
+        :type content: bytes
+        :return: digest
+        :rtype: str
+        """
+        return hashlib.sha1(content.partition(b'\n')[2]).hexdigest()
+
+    def get(self, digest):
+        """
+        Get a cached entry and mark it as recently used.
+
+        :param digest: digest of the shared header
+        :type digest: str
+        :return: cached entry, None if not cached
+        :rtype: dict
+        """
+        with self._lock:
+            try:
+                self._entries.move_to_end(digest)
+            except KeyError:
+                return None
+            return self._entries[digest]
+
+    def put(self, digest, entry):
+        """
+        Store an entry, evicting the least recently used one if the cache is full.
+
+        :param digest: digest of the shared header
+        :type digest: str
+        :param entry: parsed header and derived values
+        :type entry: dict
+        """
+        with self._lock:
+            self._entries[digest] = entry
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Remove all entries"""
+        with self._lock:
+            self._entries.clear()
+
+
+# cache shared by all Properties of this process
+shared_headers = SharedHeaderCache()
+
+
 class Properties:
     """
     Object to automatically extract and conveniently use relevant JPK force file header information.
@@ -106,6 +389,15 @@ class Properties:
         - vDeflection_channel_number: internal number of vDeflection channel raw data
         - conversion_factors: dictionary containing important information
         - units: dictionary containing channel units
+        - encoders: dictionary containing the encoder type of each channel's raw data
+        - affine: dictionary containing scale and offset from encoded data to each calibration slot of each channel
+        - slot_units: dictionary containing the unit of each calibration slot of each channel
+        - default_slots: dictionary containing the calibration slot each channel is converted to by default
+        - shared_digest: digest of the shared header, which is parsed once for all files sharing it
+
+    Either a file path or an already opened :class:`.ForceArchive` can be given. A file path is opened in a
+    short-lived archive session of its own, that is closed once all properties are extracted. For archives holding
+    many curves, like force maps, ``prefix`` selects the curve, e.g. ``index/0/``.
 
     - **example usage**::
 
@@ -117,14 +409,46 @@ class Properties:
         0.01529211140472191
     """
 
-    def __init__(self, file_path):
+    @profiled('properties')
+    def __init__(self, file_path=None, archive=None, prefix=''):
 
-        # parse file path to header.properties file
-        self.file_path = file_path
+        # use the given archive session or open one just for reading the properties
+        if archive is None:
+            if file_path is None:
+                raise ValueError("either file_path or archive has to be given")
+            self.archive = ForceArchive(file_path)
+        else:
+            self.archive = archive
+        self.file_path = self.archive.file_path
+        self.prefix = prefix
 
         # load the property file (you have to instantiate and load subsequently)
         self.general = self.load_general_props()
         self.segments = self.extract_segment_props()
+        self.extract_all()
+
+        # an archive opened by ourselves is not needed anymore
+        if archive is None:
+            self.archive.close()
+
+    def extract_all(self):
+        """
+        Extract everything derived from the general and segment properties.
+
+        Channel information is only contained in the shared header, so it is taken from :data:`shared_headers` if
+        another file with the same shared header was read before.
+        """
+        entry = shared_headers.get(self._shared_digest) if self._shared_digest else None
+        if entry is not None and "channel_numbers" in entry:
+            self.channel_numbers = dict(entry["channel_numbers"])
+            self.conversion_factors = {channel: dict(factors)
+                                       for channel, factors in entry["conversion_factors"].items()}
+            self.units = dict(entry["units"])
+            self.encoders = dict(entry["encoders"])
+            self.affine = {channel: dict(affine) for channel, affine in entry["affine"].items()}
+            self.slot_units = {channel: dict(units) for channel, units in entry["slot_units"].items()}
+            self.default_slots = dict(entry["default_slots"])
+            return
 
         # set vDeflection channel number, always extract freshly because channel numbering seems to be inconsistent
         self.channel_numbers = self.get_channel_numbers()
@@ -132,7 +456,49 @@ class Properties:
         # extract raw conversion factors and other specifications like units and the lik
         self.conversion_factors = self.extract_conversion_factors()
         self.units = {}
+        self.encoders = {}
         self.extract_specs()
+        self.extract_affine()
+
+        if entry is not None:
+            entry["channel_numbers"] = dict(self.channel_numbers)
+            entry["conversion_factors"] = {channel: dict(factors)
+                                           for channel, factors in self.conversion_factors.items()}
+            entry["units"] = dict(self.units)
+            entry["encoders"] = dict(self.encoders)
+            entry["affine"] = {channel: dict(affine) for channel, affine in self.affine.items()}
+            entry["slot_units"] = {channel: dict(units) for channel, units in self.slot_units.items()}
+            entry["default_slots"] = dict(self.default_slots)
+
+    def to_dict(self):
+        """
+        Export the parsed properties to a JSON-serializable dictionary, see :func:`from_dict`.
+
+        :return: file path, general and segment properties
+        :rtype: dict
+        """
+        return {"file_path": self.file_path, "prefix": self.prefix, "general": self.general, "segments": self.segments}
+
+    @classmethod
+    def from_dict(cls, props):
+        """
+        Restore properties exported by :func:`to_dict` without reading the force file again. Everything derived, like
+        conversion factors, is extracted anew.
+
+        :param props: exported properties
+        :type props: dict
+        :return: restored properties, not attached to any archive
+        :rtype: Properties
+        """
+        restored = cls.__new__(cls)
+        restored.archive = None
+        restored.file_path = props["file_path"]
+        restored.prefix = props.get("prefix", '')
+        restored.general = props["general"]
+        restored.segments = props["segments"]
+        restored._shared_digest = None
+        restored.extract_all()
+        return restored
 
     def load_general_props(self):
         """
@@ -144,13 +510,58 @@ class Properties:
         """
 
         # load general and shared header.properties file from zipfile
-        root = ForceArchive(self.file_path).read_properties('header.properties')
-        shared = ForceArchive(self.file_path).read_properties('shared-data/header.properties')
+        root = self.archive.read_properties('header.properties')
+        shared = self.load_shared_props()
         full = {}
         full.update(root)
         full.update(shared)
+
+        # curves of a multi-curve archive have a header of their own
+        if self.prefix:
+            full.update(self.archive.read_properties('{}header.properties'.format(self.prefix)))
         return full
 
+    def load_shared_props(self):
+        """
+        Loads the shared header.properties file, which is parsed only once for all files sharing it, see
+        :class:`.SharedHeaderCache`.
+
+        :return: props dictionary
+        :rtype: dict
+        """
+        content = self.archive.read('shared-data/header.properties')
+        self._shared_digest = shared_headers.digest(content)
+        shared = self.shared_props()
+
+        # the header date differs from file to file
+        header = content.partition(b'\n')[0].decode('utf-8').rstrip()
+        if header.startswith('#'):
+            shared["timestamp"] = parse_timestamp(header)
+        return shared
+
+    @property
+    def shared_digest(self):
+        """Digest of the shared header, see :func:`SharedHeaderCache.digest`, None if restored without the force file"""
+        return self._shared_digest
+
+    def shared_props(self):
+        """
+        Properties of the shared header alone, without timestamp. They are taken from :data:`shared_headers`, and
+        parsed from the archive only if no file sharing them was read before, or their entry was evicted meanwhile.
+
+        :return: props dictionary, empty if restored without the force file
+        :rtype: dict
+        """
+        entry = shared_headers.get(self._shared_digest) if self._shared_digest else None
+        if entry is None:
+            if self.archive is None:
+                return {}
+            props = self.archive.read_properties('shared-data/header.properties')
+            props.pop("timestamp", None)
+            entry = {"props": props}
+            shared_headers.put(self._shared_digest, entry)
+        return dict(entry["props"])
+
     # noinspection PyPep8Naming
     def get_channel_numbers(self):
         """
@@ -226,6 +637,12 @@ class Properties:
             self.channel_numbers["height"])
         self.units["height"] = self.general[height_unit]
 
+        # encoder type of each channel, needed to decode its raw data
+        for channel, number in self.channel_numbers.items():
+            if number is not None:
+                encoder_type = "lcd-info.{}.encoder.type".format(number)
+                self.encoders[channel] = self.general.get(encoder_type, "signedinteger")
+
     def extract_segment_props(self):
         """
         Extract properties for each data segment. Additionally, JPKs segment names are converted to a more useful
@@ -238,8 +655,8 @@ class Properties:
         props = {}
         num_segments = int(self.general['force-scan-series.force-segments.count'])
         for segment in range(num_segments):
-            segment_props = ForceArchive(self.file_path).read_properties(
-                'segments/{}/segment-header.properties'.format(segment))
+            segment_props = self.archive.read_properties(
+                '{}segments/{}/segment-header.properties'.format(self.prefix, segment))
             # noinspection SpellCheckingInspection
             name_jpk = segment_props['force-segment-header.name.name'].replace('-cellhesion200', '')
             normal_name = self.convert_segment_name(name_jpk)
@@ -250,6 +667,150 @@ class Properties:
 
         return props
 
+    @profiled('convert')
+    def convert_data(self, channel, data, slot=None, out=None, dtype=np.float64):
+        """
+        Convert specific data from specific channel from encoded integer format to physical quantity.
+
+        Each channel has it's own conversion factors and formulas, so the correct channel has to be provided. The
+        conversion chain is collapsed into a single scale and offset beforehand (see :attr:`affine`), so converting
+        is one multiplication and one addition, both done in-place on the output.
+
+        By default, vDeflection is converted to force in Newton (N) and height to the nominal height in Meter (m).
+        Other channels are converted to the default calibration slot of their header.
+
+        :param channel: data channel
+        :type channel: str
+        :param data: encoded data
+        :type data: numpy.ndarray
+        :param slot: calibration slot to convert to, e.g. volts, distance, force, nominal or calibrated
+        :type slot: str
+        :param out: optional preallocated output with the shape of ``data``
+        :type out: numpy.ndarray
+        :param dtype: float dtype of the output, if not given as ``out``
+        :type dtype: numpy.dtype
+        :return: converted data
+        :rtype: numpy.array
+        """
+        if not isinstance(data, np.ndarray):
+            raise ValueError("data has to be numpy array")
+
+        scale, offset = self.affine_coefficients(channel, slot)
+        if out is None:
+            out = np.empty(data.shape, dtype=dtype)
+        np.multiply(data, scale, out=out, casting='unsafe')
+        out += offset
+        return out
+
+    def affine_coefficients(self, channel, slot=None):
+        """
+        Scale and offset converting the encoded data of a channel to a calibration slot in one step.
+
+        :param channel: data channel
+        :type channel: str
+        :param slot: calibration slot, defaults to the one used by :func:`convert_data`
+        :type slot: str
+        :return: scale and offset
+        :rtype: tuple
+        """
+        if channel not in self.affine:
+            raise ValueError("not a valid channel")
+        if slot is None:
+            slot = self.default_slots[channel]
+        try:
+            return self.affine[channel][slot]
+        except KeyError:
+            raise ValueError("channel {} has no calibration slot {}".format(channel, slot))
+
+    # noinspection SpellCheckingInspection
+    def extract_affine(self):
+        """
+        Collapses the conversion chain of every channel into one scale and offset per calibration slot. Each slot is
+        linear in the slot it is based on (``base-calibration-slot``), down to the encoder scaling of the raw data.
+        Also extracts the unit of each slot and the default slot of each channel.
+        """
+        self.affine = {}
+        self.slot_units = {}
+        self.default_slots = {}
+        for channel, number in self.channel_numbers.items():
+            if number is None:
+                continue
+            lcd_info = "lcd-info.{}.".format(number)
+            conversion = "{}conversion-set.conversion.".format(lcd_info)
+
+            # encoded data scaled to the base slot
+            base = self.general.get("{}conversion-set.conversions.base".format(lcd_info), "volts")
+            affine = {base: (float(self.general.get("{}encoder.scaling.multiplier".format(lcd_info), 1.0)),
+                             float(self.general.get("{}encoder.scaling.offset".format(lcd_info), 0.0)))}
+            units = {base: self.general.get("{}encoder.scaling.unit.unit".format(lcd_info))}
+
+            slots = self.general.get("{}conversion-set.conversions.list".format(lcd_info), "").split()
+            defined = [slot for slot in slots
+                       if self.general.get("{}{}.defined".format(conversion, slot)) == "true" and
+                       "{}{}.scaling.multiplier".format(conversion, slot) in self.general]
+
+            # resolve slots based on slots already resolved, until nothing changes anymore
+            unresolved = [slot for slot in defined if slot not in affine]
+            while unresolved:
+                resolved = []
+                for slot in unresolved:
+                    slot_base = self.general.get("{}{}.base-calibration-slot".format(conversion, slot), base)
+                    if slot_base not in affine:
+                        continue
+                    base_scale, base_offset = affine[slot_base]
+                    multiplier = float(self.general["{}{}.scaling.multiplier".format(conversion, slot)])
+                    offset = float(self.general["{}{}.scaling.offset".format(conversion, slot)])
+                    affine[slot] = (multiplier * base_scale, multiplier * base_offset + offset)
+                    units[slot] = self.general.get("{}{}.scaling.unit.unit".format(conversion, slot))
+                    resolved.append(slot)
+                if not resolved:
+                    break
+                unresolved = [slot for slot in unresolved if slot not in resolved]
+
+            self.affine[channel] = affine
+            self.slot_units[channel] = units
+            default = self.general.get("{}conversion-set.conversions.default".format(lcd_info), base)
+            self.default_slots[channel] = default if default in affine else base
+
+        # force and nominal height, as always converted by JPKay
+        if "force" in self.affine.get("vDeflection", {}):
+            self.default_slots["vDeflection"] = "force"
+        if "nominal" in self.affine.get("height", {}):
+            self.default_slots["height"] = "nominal"
+
+    def recalibrate(self, spring_constant=None, sensitivity=None, multipliers=None):
+        """
+        Override calibration values of the header, e.g. a spring constant determined after the measurement, and
+        re-derive :attr:`conversion_factors` and :attr:`affine` from them. Only the properties in memory change, the
+        force file is not touched. The overrides are kept in :attr:`general`, so they are exported by :func:`to_dict`.
+
+        :param spring_constant: spring constant in N/m, the multiplier of the force slot of vDeflection
+        :type spring_constant: float
+        :param sensitivity: sensitivity in m/V, the multiplier of the distance slot of vDeflection
+        :type sensitivity: float
+        :param multipliers: further multipliers by (JPK channel, slot), e.g. {('height', 'nominal'): -1.5e-5}
+        :type multipliers: dict
+        """
+        overrides = dict(multipliers or {})
+        if spring_constant is not None:
+            overrides[("vDeflection", "force")] = spring_constant
+        if sensitivity is not None:
+            overrides[("vDeflection", "distance")] = sensitivity
+        if not overrides:
+            return
+
+        keys = {}
+        for (channel, slot), multiplier in overrides.items():
+            number = self.channel_numbers.get(channel)
+            key = "lcd-info.{}.conversion-set.conversion.{}.scaling.multiplier".format(number, slot)
+            if number is None or key not in self.general:
+                raise ValueError("channel {} has no calibration slot {}".format(channel, slot))
+            keys[key] = repr(float(multiplier))
+        self.general.update(keys)
+
+        self.conversion_factors = self.extract_conversion_factors()
+        self.extract_affine()
+
     @staticmethod
     def convert_segment_name(jpk_name):
         """Convert JPKs segment names to useful ones"""
@@ -265,6 +826,52 @@ class Properties:
         return real_name
 
 
+class Segment:
+    """
+    Lazily loaded data segment of a :class:`.CellHesion` force file.
+
+    The force and height channel are only decoded and converted on first access, then memoized by the parent
+    :class:`.CellHesion`. Obtain instances via :func:`CellHesion.segment`.
+
+    - **attributes**
+
+        - name: segment name, one of approach, contact, retract, pause
+        - properties: segment properties, see :attr:`Properties.segments`
+        - force: force signal in Newton (N)
+        - height: height signal in Meter (m)
+
+    For the encoded data, converted only when read, see :func:`array`.
+    """
+
+    def __init__(self, sample, name):
+        self._sample = sample
+        self.name = name
+        self.properties = sample.properties.segments[name]
+
+    @property
+    def force(self):
+        """Force signal of this segment in Newton (N)"""
+        return self._sample.load_channel(self.name, 'force')
+
+    @property
+    def height(self):
+        """Height signal of this segment in Meter (m)"""
+        return self._sample.load_channel(self.name, 'height')
+
+    def array(self, channel='force', slot=None):
+        """
+        Encoded data of a channel of this segment, see :func:`CellHesion.load_channel_array`.
+
+        :param channel: channel, either force or height, or any JPK channel name like hDeflection
+        :type channel: str
+        :param slot: calibration slot to convert to
+        :type slot: str
+        :return: lazily converted data
+        :rtype: ChannelArray
+        """
+        return self._sample.load_channel_array(self.name, channel, slot)
+
+
 class CellHesion:
     # noinspection SpellCheckingInspection
     """
@@ -275,10 +882,20 @@ class CellHesion:
 
         The following attributes are available:
 
-        - archive: an instance of :class:`.ForceArchive`
+        - archive: an instance of :class:`.ForceArchive`, shared with :attr:`properties`
         - properties: an instance of :class:`.Properties`
         - data: :class:`pandas:pandas.DataFrame`
 
+        Instead of a file path, an already opened :class:`.ForceArchive` can be handed in. Its member cache is then
+        shared, so the archive is read only once. An archive opened from a file path is closed once all data is
+        loaded, and opened again if anything else is read later.
+
+        With ``lazy=True`` nothing is decoded on instantiation. :attr:`data` is then built on first access, and
+        :func:`segment` decodes only the requested segment and channel:
+
+        >>> sample = CellHesion(force_file=jpk_file, lazy=True)
+        >>> force = sample.segment('retract').force
+
         **Example Usage**
 
         >>> jpk_file = r'path/to/jpk-force/file'
@@ -290,20 +907,220 @@ class CellHesion:
         >>> plt.xlabel("height [µm]"); plt.ylabel("force [pN]")
 
         """
-    def __init__(self, force_file):
+    # maps the channel names used in the DataFrame to the JPK channels they are converted from
+    channels = {'force': 'vDeflection', 'height': 'height'}
+
+    def __init__(self, force_file=None, archive=None, lazy=False):
 
-        # parse and check file path
-        if os.path.isfile(force_file):
+        # parse and check file path, or use the given archive session
+        if archive is not None:
+            self.file = archive.file_path
+            self.archive = archive
+        elif force_file is not None and os.path.isfile(force_file):
             self.file = force_file
+            self.archive = ForceArchive(file_path=self.file)
         else:
             raise ValueError("file does not exist")
 
-        #
-        self.archive = ForceArchive(file_path=self.file)
-        self.properties = Properties(file_path=self.file)
+        try:
+            # properties are read from the same archive session
+            self.properties = Properties(archive=self.archive)
+
+            # converted channels loaded on demand, keyed by (segment, channel)
+            self._channels = {}
+
+            #
+            self._data = None
+            if not lazy:
+                self._data = self.load_data()
+        except Exception:
+            if archive is None:
+                self.archive.close()
+            raise
+
+        # everything is converted, release file handle and raw bytes of an archive opened by ourselves
+        if archive is None and not lazy:
+            self.archive.clear_cache()
+            self.archive.close()
+
+    @classmethod
+    def from_channels(cls, properties, channels):
+        """
+        Create an instance from already converted channels, e.g. restored from a cache, without any archive.
+
+        :param properties: properties of the force file
+        :type properties: Properties
+        :param channels: converted data keyed by (segment, channel), covering all segments
+        :type channels: dict
+        :return: lazy instance, whose data is built from ``channels`` on first access. Without an archive, encoded
+            data and thus :func:`load_channel_array` is not available.
+        :rtype: CellHesion
+        """
+        sample = cls.__new__(cls)
+        sample.file = properties.file_path
+        sample.archive = properties.archive
+        sample.properties = properties
+        sample._channels = dict(channels)
+        sample._data = None
+        return sample
+
+    @property
+    def data(self):
+        """Force and height data of all segments, see :func:`load_data`. Loaded on first access in lazy mode."""
+        if self._data is None:
+            self._data = self.load_data()
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        self._data = value
+
+    def segment(self, name):
+        """
+        Access a single data segment, whose channels are decoded only on demand.
 
-        #
-        self.data = self.load_data()
+        :param name: segment name, one of approach, contact, retract, pause
+        :type name: str
+        :return: data segment
+        :rtype: Segment
+        """
+        if name not in self.properties.segments:
+            raise ValueError("segment {} not contained in this file".format(name))
+        return Segment(self, name)
+
+    def load_channel(self, segment, channel):
+        """
+        Load a single converted channel of a segment. The result is memoized, so each channel is decoded only once.
+
+        :param segment: data segment to load
+        :type segment: str
+        :param channel: channel to load, either force or height
+        :type channel: str
+        :return: converted data
+        :rtype: numpy.ndarray
+        """
+        try:
+            return self._channels[(segment, channel)]
+        except KeyError:
+            pass
+
+        try:
+            jpk_channel = self.channels[channel]
+        except KeyError:
+            raise ValueError("not a valid channel")
+
+        converted = self.convert_data(jpk_channel, self.load_encoded_channel(segment, jpk_channel))
+        self._channels[(segment, channel)] = converted
+        return converted
+
+    def recalibrate(self, spring_constant=None, sensitivity=None, multipliers=None):
+        """
+        Override calibration values, see :func:`Properties.recalibrate`, and update everything already converted.
+
+        The data converted so far, :attr:`data` and the channels loaded by :func:`load_channel`, is updated in-place
+        by one multiplication and one addition, without reading the force file again. Channel arrays convert with the
+        new calibration anyway, see :class:`~JPKay.core.channel_array.ChannelArray`.
+
+        - **example usage**::
+
+            >>> sample = CellHesion(force_file=jpk_file)
+            >>> sample.recalibrate(spring_constant=0.021)
+            >>> sample.data.retract.force  # with the new spring constant
+
+        :param spring_constant: spring constant in N/m
+        :type spring_constant: float
+        :param sensitivity: sensitivity in m/V
+        :type sensitivity: float
+        :param multipliers: further multipliers by (JPK channel, slot)
+        :type multipliers: dict
+        :return: ratio and shift from the previous to the new converted data by channel, e.g. force, see
+            :func:`~JPKay.core.calibration.affine_update`
+        :rtype: dict
+        """
+        old = {channel: self.properties.affine_coefficients(jpk_channel)
+               for channel, jpk_channel in self.channels.items()}
+        self.properties.recalibrate(spring_constant=spring_constant, sensitivity=sensitivity, multipliers=multipliers)
+        updates = {channel: affine_update(old[channel], self.properties.affine_coefficients(jpk_channel))
+                   for channel, jpk_channel in self.channels.items()}
+
+        for key, data in self._channels.items():
+            ratio, shift = updates[key[1]]
+            if data.flags.writeable:
+                rescale_curves(data, ratio, shift)
+            else:
+                # e.g. memory-mapped from a cache
+                self._channels[key] = data * ratio + shift
+
+        if self._data is not None:
+            self._data = self._rescale_df(self._data, updates)
+        return updates
+
+    @staticmethod
+    def _rescale_df(frame, updates):
+        """Apply affine updates by channel to the force and height columns of a wide or long DataFrame"""
+        names = frame.columns.get_level_values(-1)
+        positions = [position for position, name in enumerate(names) if name in updates]
+        ratio = np.array([updates[names[position]][0] for position in positions], dtype=np.float64)
+        shift = np.array([updates[names[position]][1] for position in positions], dtype=np.float64)
+
+        # a wide frame is a single block, which is updated in-place as a whole
+        if len(positions) == frame.shape[1]:
+            values = frame.values
+            if values.flags.writeable and np.shares_memory(values, frame.iloc[:, 0].values):
+                values *= ratio
+                values += shift
+                return frame
+
+        frame = frame.copy()
+        for position, column_ratio, column_shift in zip(positions, ratio, shift):
+            frame.iloc[:, position] = frame.iloc[:, position].to_numpy() * column_ratio + column_shift
+        return frame
+
+    def load_channel_array(self, segment, channel, slot=None):
+        """
+        Load a single channel of a segment without converting it, see :class:`~JPKay.core.channel_array.ChannelArray`.
+        The encoded data takes half the memory of the converted one, and is converted with the current calibration
+        of :attr:`properties` whenever read.
+
+        :param segment: data segment to load
+        :type segment: str
+        :param channel: channel to load, either force or height, or any JPK channel name like hDeflection
+        :type channel: str
+        :param slot: calibration slot to convert to, defaults to force for vDeflection and nominal for height
+        :type slot: str
+        :return: lazily converted data
+        :rtype: ChannelArray
+        """
+        jpk_channel = self.channels.get(channel, channel)
+        if jpk_channel not in self.properties.encoders:
+            raise ValueError("not a valid channel")
+        return ChannelArray(self.load_encoded_channel(segment, jpk_channel), self.properties, jpk_channel, slot)
+
+    def _converted_channel(self, segment, channel):
+        """Converted channel, taken from the memoized ones if available but not memoized itself"""
+        try:
+            return self._channels[(segment, channel)]
+        except KeyError:
+            jpk_channel = self.channels[channel]
+            return self.convert_data(jpk_channel, self.load_encoded_channel(segment, jpk_channel))
+
+    def load_encoded_channel(self, segment, channel):
+        """
+        Loads the raw, encoded data of a single JPK channel of the specified segment.
+
+        :param segment: data segment to load
+        :type segment: str
+        :param channel: JPK channel name, e.g. vDeflection
+        :type channel: str
+        :return: encoded data
+        :rtype: numpy.ndarray
+        """
+        if self.archive is None:
+            raise ValueError("encoded data of {} is not available, only its converted force and height channels "
+                             "were restored".format(self.file))
+        segment_number = self.properties.segments[segment]['segment_number']
+        data_file = 'segments/{}/channels/{}.dat'.format(segment_number, channel)
+        return self.archive.read_data(data_file, encoding=self.properties.encoders[channel])
 
     # noinspection PyPep8Naming
     def load_encoded_data_segment(self, segment):
@@ -317,89 +1134,136 @@ class CellHesion:
         :return: vDeflection and height
         """
 
-        # get data locations
-        segment_number = self.properties.segments[segment]['segment_number']
-        vDeflection_file = 'segments/{}/channels/vDeflection.dat'.format(segment_number)
-        height_file = 'segments/{}/channels/height.dat'.format(segment_number)
-
         # load encoded data from archive
-        vDeflection = self.archive.read_data(vDeflection_file)
-        height = self.archive.read_data(height_file)
+        vDeflection = self.load_encoded_channel(segment, 'vDeflection')
+        height = self.load_encoded_channel(segment, 'height')
 
         return vDeflection, height
 
     # noinspection PyPep8Naming
-    def load_data(self):
+    @profiled('load_data')
+    def load_data(self, layout='wide', dtype=np.float64):
         """
-        Load converted data to DataFrame. See :func:`construct_df` for DataFrame structure.
+        Load converted data to DataFrame. See :func:`construct_df` for the structure of the default ``wide`` layout
+        and :func:`assemble_df` for the ``long`` layout.
 
+        Channels not loaded before are converted straight into the DataFrame's memory.
+
+        :param layout: either wide or long
+        :type layout: str
+        :param dtype: float dtype of the data
+        :type dtype: numpy.dtype
         :return: force/height data
         :rtype: pandas.DataFrame
         """
-        df = self.construct_df()
-
-        for segment in list(self.properties.segments.keys()):
-
-            # load raw data
-            vDeflection_raw, height_raw = self.load_encoded_data_segment(segment)
-
-            # convert data to normal physical units
-            vDeflection = self.convert_data('vDeflection', vDeflection_raw)
-            height = self.convert_data('height', height_raw)
+        channels = {}
+        affine = {}
+        for segment in self.properties.segments:
+            for channel, jpk_channel in self.channels.items():
+                # use channels already loaded, otherwise load raw data to be converted to normal physical units
+                key = (segment, channel)
+                if key in self._channels:
+                    channels[key] = self._channels[key]
+                else:
+                    channels[key] = self.load_encoded_channel(segment, jpk_channel)
+                    affine[key] = self.properties.affine_coefficients(jpk_channel)
+
+        return self.assemble_df(channels, layout=layout, dtype=dtype, affine=affine)
 
-            df.loc[:, (segment, 'force')] = pd.Series(vDeflection.squeeze())
-            df.loc[:, (segment, 'height')] = pd.Series(height.squeeze())
+    @staticmethod
+    @profiled('dataframe')
+    def assemble_df(channels, layout='wide', dtype=np.float64, affine=None):
+        """
+        Assemble channels into a DataFrame in one go, with a single allocation for all data.
+
+        The ``wide`` layout has the structure of :func:`construct_df`. Segments of unequal length are padded with NaN
+        to the length of the longest one, missing segments are all NaN. The ``long`` layout stacks all segments
+        without padding into the columns segment, index, force and height.
+
+        Channels with scale and offset given in ``affine`` are encoded ones, they are converted while being written
+        into the DataFrame's memory.
+
+        :param channels: converted or encoded data keyed by (segment, channel)
+        :type channels: dict
+        :param layout: either wide or long
+        :type layout: str
+        :param dtype: float dtype of the data
+        :type dtype: numpy.dtype
+        :param affine: scale and offset of encoded channels, keyed by (segment, channel)
+        :type affine: dict
+        :return: force/height data
+        :rtype: pandas.DataFrame
+        """
+        affine = affine or {}
+
+        def fill(target, key):
+            if key in affine:
+                scale, offset = affine[key]
+                np.multiply(channels[key], scale, out=target, casting='unsafe')
+                target += offset
+            else:
+                target[:] = channels[key]
+
+        segments = []
+        for segment, channel in channels:
+            if segment not in segments:
+                segments.append(segment)
+
+        if layout == 'wide':
+            columns = CellHesion.construct_df().columns
+            extra = [segment for segment in segments if segment not in columns.levels[0]]
+            if extra:
+                columns = columns.append(pd.MultiIndex.from_product([extra, ['force', 'height']],
+                                                                    names=columns.names))
+
+            # one contiguous block, allocated as the transposed frame so that pandas takes it over without a copy
+            length = max([len(data) for data in channels.values()], default=0)
+            block = np.empty((len(columns), length), dtype=dtype)
+            for position, key in enumerate(columns):
+                size = len(channels[key]) if key in channels else 0
+                if size:
+                    fill(block[position, :size], key)
+                block[position, size:] = np.nan
+            return pd.DataFrame(block.T, columns=columns, copy=False)
+
+        elif layout == 'long':
+            lengths = [len(channels[(segment, 'force')]) for segment in segments]
+            bounds = np.concatenate([[0], np.cumsum(lengths)]).astype(int)
+            force = np.empty(bounds[-1], dtype=dtype)
+            height = np.empty(bounds[-1], dtype=dtype)
+            for segment, start, stop in zip(segments, bounds[:-1], bounds[1:]):
+                fill(force[start:stop], (segment, 'force'))
+                fill(height[start:stop], (segment, 'height'))
+            return pd.DataFrame({
+                'segment': pd.Categorical.from_codes(np.repeat(np.arange(len(segments)), lengths),
+                                                     categories=segments),
+                'index': np.concatenate([np.arange(length) for length in lengths]),
+                'force': force,
+                'height': height,
+            }, copy=False)
 
-        return df
+        else:
+            raise ValueError("layout has to be either wide or long")
 
-    def convert_data(self, channel, data):
+    def convert_data(self, channel, data, slot=None, out=None, dtype=np.float64):
         """
-        Convert specific data from specific channel from encoded integer format to physical quantity.
-
-        Each channel has it's own conversion factors and formulas, so the correct channel has to be provided.
+        Convert specific data from specific channel from encoded integer format to physical quantity, see
+        :func:`Properties.convert_data`.
 
         :param channel: data channel
         :type channel: str
         :param data: encoded data
         :type data: numpy.ndarray
+        :param slot: calibration slot to convert to, defaults to force for vDeflection and nominal for height
+        :type slot: str
+        :param out: optional preallocated output with the shape of ``data``
+        :type out: numpy.ndarray
+        :param dtype: float dtype of the output, if not given as ``out``
+        :type dtype: numpy.dtype
         :return: converted data
         :rtype: numpy.array
         """
-        if not isinstance(data, np.ndarray):
-            raise ValueError("data has to be numpy array")
-
-        # convert vDeflection from encoded to distance to force with linear conversion factors
-        # the returned object is already a numpy ndarray in unit Newton (N)
-        if channel == 'vDeflection':
-
-            raw_m = self.properties.conversion_factors[channel]["raw multiplier"]
-            raw_n = self.properties.conversion_factors[channel]["raw offset"]
-
-            dist_m = self.properties.conversion_factors[channel]["distance multiplier"]
-            dist_n = self.properties.conversion_factors[channel]["distance offset"]
-
-            force_m = self.properties.conversion_factors[channel]["force multiplier"]
-            force_n = self.properties.conversion_factors[channel]["force offset"]
-
-            converted_data = ((raw_m * data + raw_n) * dist_m + dist_n) * force_m + force_n
-
-            return converted_data
-
-        # convert height from encoded to calibrated height
-        # the returned object is already a numpy ndarray in unit Meter (m)
-        elif channel == 'height':
-            raw_m = self.properties.conversion_factors[channel]["raw multiplier"]
-            raw_n = self.properties.conversion_factors[channel]["raw offset"]
-
-            cal_m = self.properties.conversion_factors[channel]["calibrated multiplier"]
-            cal_n = self.properties.conversion_factors[channel]["calibrated offset"]
-
-            converted_data = (raw_m * data + raw_n) * cal_m + cal_n
-
-            return converted_data
-
-        else:
-            raise ValueError("not a valid channel")
+        return self.properties.convert_data(channel, data, slot=slot, out=out, dtype=dtype)
 
     @staticmethod
     def construct_df():
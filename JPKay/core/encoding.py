@@ -0,0 +1,66 @@
+# coding=utf-8
+
+import numpy as np
+
+
+# JPK channel encodings (``lcd-info.<n>.encoder.type``) and their on-disk big-endian numpy dtypes
+ENCODER_DTYPES = {
+    "signedinteger": np.dtype(">i4"),
+    "unsignedinteger": np.dtype(">u4"),
+    "signedshort": np.dtype(">i2"),
+    "unsignedshort": np.dtype(">u2"),
+    "signedlong": np.dtype(">i8"),
+    "float": np.dtype(">f4"),
+    "double": np.dtype(">f8"),
+}
+
+
+def encoder_dtype(encoding):
+    """
+    Look up the big-endian numpy dtype of a JPK channel encoding.
+
+    The ``-limited`` variants written by some instruments share the storage layout of their base encoding.
+
+    :param encoding: JPK encoder type, e.g. ``signedinteger``
+    :type encoding: str
+    :return: big-endian dtype
+    :rtype: numpy.dtype
+    """
+    try:
+        return ENCODER_DTYPES[encoding.replace("-limited", "")]
+    except KeyError:
+        raise ValueError("unknown channel encoding: {}".format(encoding))
+
+
+def decode(buffer, encoding="signedinteger", dtype=None, column=False):
+    """
+    Decode the raw content of a channel data file.
+
+    Without ``dtype`` the result is a read-only view on ``buffer`` (no copy is made). Passing ``dtype`` casts the
+    decoded samples into a new, native byte order array.
+
+    :param buffer: raw content of a ``.dat`` file
+    :type buffer: bytes
+    :param encoding: JPK encoder type of the channel
+    :type encoding: str
+    :param dtype: optional output dtype
+    :type dtype: numpy.dtype
+    :param column: return legacy ``(N, 1)`` shaped array instead of a flat one
+    :type column: bool
+    :return: decoded data
+    :rtype: numpy.ndarray
+    """
+    source = encoder_dtype(encoding)
+    count = len(buffer) // source.itemsize
+    data = np.frombuffer(buffer, dtype=source, count=count)
+
+    if dtype is not None:
+        data = data.astype(dtype)
+    else:
+        # writable buffers, e.g. cached decompressed members, must not be changed through the view
+        data.setflags(write=False)
+
+    if column:
+        data = data.reshape(-1, 1)
+
+    return data
@@ -0,0 +1,177 @@
+# coding=utf-8
+
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from JPKay.core.data_structures import CellHesion, ForceArchive, Properties
+from JPKay.core.encoding import encoder_dtype
+
+
+# jpk-data-file types of archives holding one curve per pixel
+FORCE_MAP_TYPES = ('spm-forcemap', 'spm-quantitative-image-data-file')
+
+_INDEX_HEADER = re.compile(r'^index/(\d+)/header\.properties$')
+
+
+class ForceMap:
+    """
+    Random and vectorized access to the curves of a JPK force map or QI archive (``.jpk-force-map``,
+    ``.jpk-qi-data``).
+
+    The archive is indexed once on instantiation. All curves share the conversion factors and segment layout of
+    the first curve, so single curves are decoded straight from the archive without building a
+    :class:`~JPKay.core.data_structures.CellHesion` for each of them. Curves are numbered row by row, curve ``n`` is
+    pixel ``(i, j) = (n % ilength, n // ilength)``.
+
+    **Attributes**
+
+    - archive: an instance of :class:`~JPKay.core.data_structures.ForceArchive`
+    - properties: :class:`~JPKay.core.data_structures.Properties` of the first curve
+    - shape: grid shape as (jlength, ilength)
+    - indices: sorted indices of all curves contained in the archive
+
+    **Example Usage**
+
+    >>> force_map = ForceMap(r'path/to/jpk-force-map/file')
+    >>> force_map.curve(3, 5).retract.force.plot()
+    >>> forces = force_map.channel_array('retract', 'force')  # shape (jlength, ilength, samples)
+    """
+
+    def __init__(self, file_path, workers=None):
+        self.file = file_path
+        self.workers = workers
+
+        # channel data is read once per pixel at most, so it is not cached
+        self.archive = ForceArchive(file_path, cache=False, file_types=FORCE_MAP_TYPES)
+        self._infos = {info.filename: info for info in self.archive.contents}
+
+        indices = []
+        for name in self._infos:
+            match = _INDEX_HEADER.match(name)
+            if match:
+                indices.append(int(match.group(1)))
+        if not indices:
+            raise ValueError("force map does not contain any curves")
+        self.indices = sorted(indices)
+
+        self.properties = Properties(archive=self.archive, prefix='index/{}/'.format(self.indices[0]))
+        self.shape = (self._grid_length('jlength'), self._grid_length('ilength'))
+
+    def _grid_length(self, axis):
+        """Grid length along i or j, the key prefix depends on the kind of map"""
+        suffix = 'position-pattern.grid.{}'.format(axis)
+        for key, value in self.properties.general.items():
+            if key.endswith(suffix):
+                return int(value)
+        raise ValueError("force map has no grid {}".format(axis))
+
+    def index(self, i, j):
+        """
+        Index of the curve at pixel (i, j).
+
+        :param i: pixel along the fast axis
+        :type i: int
+        :param j: pixel along the slow axis
+        :type j: int
+        :return: curve index
+        :rtype: int
+        """
+        if not (0 <= i < self.shape[1] and 0 <= j < self.shape[0]):
+            raise ValueError("pixel ({}, {}) outside of the {}x{} grid".format(i, j, self.shape[1], self.shape[0]))
+        return j * self.shape[1] + i
+
+    def _data_file(self, index, segment, jpk_channel):
+        if segment not in self.properties.segments:
+            raise ValueError("no segment {} in this force map".format(segment))
+        segment_number = self.properties.segments[segment]['segment_number']
+        return 'index/{}/segments/{}/channels/{}.dat'.format(index, segment_number, jpk_channel)
+
+    def _load(self, index, segment, channel, out=None):
+        jpk_channel = CellHesion.channels[channel]
+        data_file = self._data_file(index, segment, jpk_channel)
+        if data_file not in self._infos:
+            raise ValueError("no {} data of segment {} at curve {}".format(channel, segment, index))
+        raw = self.archive.read_data(data_file, encoding=self.properties.encoders[jpk_channel])
+        return self.properties.convert_data(jpk_channel, raw, out=out)
+
+    def load_channel(self, i, j, segment, channel):
+        """
+        Load a single converted channel of the curve at pixel (i, j).
+
+        :param i: pixel along the fast axis
+        :type i: int
+        :param j: pixel along the slow axis
+        :type j: int
+        :param segment: segment name, e.g. retract
+        :type segment: str
+        :param channel: either force or height
+        :type channel: str
+        :return: converted data
+        :rtype: numpy.ndarray
+        """
+        if channel not in CellHesion.channels:
+            raise ValueError("not a valid channel")
+        return self._load(self.index(i, j), segment, channel)
+
+    def curve(self, i, j, layout='wide'):
+        """
+        Load all segments of the curve at pixel (i, j) into a DataFrame, see
+        :func:`~JPKay.core.data_structures.CellHesion.assemble_df`.
+
+        :param i: pixel along the fast axis
+        :type i: int
+        :param j: pixel along the slow axis
+        :type j: int
+        :param layout: either wide or long
+        :type layout: str
+        :return: force/height data
+        :rtype: pandas.DataFrame
+        """
+        index = self.index(i, j)
+        channels = {(segment, channel): self._load(index, segment, channel)
+                    for segment in self.properties.segments for channel in CellHesion.channels}
+        return CellHesion.assemble_df(channels, layout=layout)
+
+    def channel_array(self, segment, channel='force', dtype=np.float64, workers=None):
+        """
+        Extract one channel of one segment over all pixels into a 3-D array of shape (jlength, ilength, samples).
+
+        Curves are decoded in parallel threads. Shorter curves are padded with NaN, missing pixels are all NaN.
+
+        :param segment: segment name, e.g. retract
+        :type segment: str
+        :param channel: either force or height
+        :type channel: str
+        :param dtype: float dtype of the result
+        :type dtype: numpy.dtype
+        :param workers: number of threads, defaults to the one given on instantiation
+        :type workers: int
+        :return: converted data of all pixels
+        :rtype: numpy.ndarray
+        """
+        if channel not in CellHesion.channels:
+            raise ValueError("not a valid channel")
+        jpk_channel = CellHesion.channels[channel]
+        itemsize = encoder_dtype(self.properties.encoders[jpk_channel]).itemsize
+
+        # the zip directory already knows the length of every curve, so the result is allocated once
+        lengths = {}
+        for index in self.indices:
+            info = self._infos.get(self._data_file(index, segment, jpk_channel))
+            if info is not None:
+                lengths[index] = info.file_size // itemsize
+        outside = [index for index in lengths if index >= self.shape[0] * self.shape[1]]
+        if outside:
+            raise ValueError("curve {} outside of the {}x{} grid".format(outside[0], self.shape[1], self.shape[0]))
+        result = np.full(self.shape + (max(lengths.values(), default=0),), np.nan, dtype=dtype)
+
+        def extract(index):
+            j, i = divmod(index, self.shape[1])
+            self._load(index, segment, channel, out=result[j, i, :lengths[index]])
+
+        with ThreadPoolExecutor(max_workers=workers or self.workers) as pool:
+            list(pool.map(extract, lengths))
+
+        return result
@@ -0,0 +1,149 @@
+# coding=utf-8
+
+import re
+from functools import lru_cache
+from itertools import repeat
+
+import dateutil.parser as parser
+import pytz
+
+
+# key-value pair of a logical line, the key ends at the first unescaped whitespace, ``=`` or ``:``
+_PAIR = re.compile(r'[ \t\f]*((?:[^\s=:\\]|\\.)+)[ \t\f]*[=:]?[ \t\f]*(.*)', re.S)
+
+# whitespace between separator and value, which is not part of the value
+_PADDED_VALUE = re.compile(r'=[ \t\f]')
+
+# a backslash at the end of a line, possibly a line continuation
+_LINE_END_ESCAPE = re.compile(r'\\[\r\n]')
+
+# a line ending with an odd number of backslashes continues on the next line, whose leading whitespace is dropped
+_CONTINUATION = re.compile(r'(?<!\\)((?:\\\\)*)\\(?:\r\n|\r|\n)[ \t\f]*')
+
+_ESCAPE = re.compile(r'\\(?:u([0-9a-fA-F]{4})|(.))', re.S)
+_SPECIAL_ESCAPE = re.compile(r'\\[\\tnrfu]')
+_ESCAPES = {'t': '\t', 'n': '\n', 'r': '\r', 'f': '\f'}
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S %Z%z'
+
+# parse_timestamp always localizes to UTC, parsers like pandas cannot handle %Z and %z in one format
+UTC_TIMESTAMP_FORMAT = TIMESTAMP_FORMAT.replace('%Z', 'UTC')
+
+
+def _unescape_match(match):
+    if match.group(1):
+        return chr(int(match.group(1), 16))
+    return _ESCAPES.get(match.group(2), match.group(2))
+
+
+def unescape(text):
+    """
+    Resolve java-properties escape sequences like ``\\:``, ``\\=``, ``\\t`` or ``\\u00b5``.
+
+    :param text: escaped key or value
+    :type text: str
+    :return: unescaped text
+    :rtype: str
+    """
+    if '\\' not in text:
+        return text
+    if not _SPECIAL_ESCAPE.search(text):
+        # escaped characters that simply stand for themselves, like ``\:``
+        return text.replace('\\', '')
+    return _ESCAPE.sub(_unescape_match, text)
+
+
+def _parse_line(line):
+    """Parse a single logical line, None for comments and blank lines"""
+    stripped = line.lstrip(' \t\f')
+    if not stripped or stripped[0] in '#!':
+        return None
+    key, value = _PAIR.match(stripped).groups()
+    return unescape(key), unescape(value)
+
+
+def _parse_plain(text):
+    """
+    Parse plain ``key=value`` lines, which is what JPK writes almost exclusively, in a single partition of every line.
+    Returns None if anything needs the full parser of :func:`parse_properties`.
+    """
+    if _PADDED_VALUE.search(text):
+        return None
+
+    # skip the comment header
+    lines = text.splitlines()
+    start = 0
+    while start < len(lines) and lines[start][:1] in ('#', '!'):
+        start += 1
+
+    props = {key: value for key, _, value in map(str.partition, lines[start:], repeat('='))}
+
+    # blank lines and keys with whitespace, colons, escapes or comment characters hint at lines that are no plain
+    # key-value pairs, only the keys are scanned for them
+    keys = ''.join(props)
+    if '' in props or ' ' in keys or '\t' in keys or '\f' in keys or ':' in keys or '\\' in keys or \
+            '#' in keys or '!' in keys:
+        return None
+
+    # only a few values are escaped, like the time stamps of segment headers
+    if '\\' in text:
+        for key in [key for key, value in props.items() if '\\' in value]:
+            value = props[key]
+            if value.endswith('\\'):
+                # possibly continued on the next line
+                return None
+            props[key] = unescape(value)
+
+    return props
+
+
+def parse_properties(text):
+    """
+    Parse the content of a java-properties file.
+
+    Values may contain any number of ``=`` or ``:``, escape sequences and line continuations are resolved.
+    Comments, including the timestamp header written by JPK, are skipped, see :func:`parse_timestamp` for that.
+
+    :param text: content of the properties file
+    :type text: str
+    :return: properties
+    :rtype: dict
+    """
+    props = _parse_plain(text)
+    if props is not None:
+        return props
+
+    if '\\' in text and _LINE_END_ESCAPE.search(text):
+        text = _CONTINUATION.sub(r'\1', text)
+
+    props = {}
+    for line in text.splitlines():
+        key, sep, value = line.partition('=')
+
+        # lines with a plain key only need their value unescaped, the rest is handed to the full parser
+        if sep and key[:1] not in '#! \t\f' and value[:1] not in ' \t\f' and \
+                ':' not in key and ' ' not in key and '\t' not in key and '\\' not in key:
+            props[key] = unescape(value) if '\\' in value else value
+            continue
+
+        pair = _parse_line(line)
+        if pair is not None:
+            props[pair[0]] = pair[1]
+
+    return props
+
+
+@lru_cache(maxsize=256)
+def parse_timestamp(header):
+    """
+    Parse the measurement date-time from the comment header of a JPK properties file, e.g.
+    ``#Thu Dec 11 18:19:11 CET 2014``.
+
+    All properties files of one archive share the same header, so results are memoized.
+
+    :param header: first line of the properties file
+    :type header: str
+    :return: timestamp formatted as :data:`TIMESTAMP_FORMAT`
+    :rtype: str
+    """
+    return pytz.utc.localize(parser.parse(header.lstrip('#!'), dayfirst=True)).strftime(TIMESTAMP_FORMAT)
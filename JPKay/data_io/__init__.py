@@ -0,0 +1,9 @@
+# coding=utf-8
+
+from JPKay.data_io.aio import iter_cellhesion_async, load_cellhesion_async, load_many_async
+from JPKay.data_io.batch import LoadResult, iter_many, load_many
+from JPKay.data_io.cache import CurveCache
+from JPKay.data_io.catalog import read_metadata, scan_metadata
+from JPKay.data_io.export import ExperimentStore, export_experiment
+from JPKay.data_io.index import IndexUpdate, MetadataIndex
+from JPKay.data_io.stream import find_force_files, iter_force_files
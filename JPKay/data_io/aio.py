@@ -0,0 +1,143 @@
+# coding=utf-8
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from JPKay.core.data_structures import CellHesion, ForceArchive
+from JPKay.data_io.batch import LoadResult
+
+
+def read_file(path):
+    """
+    Read a whole file in one go. On high-latency storage, a single sequential read is much faster than the many small
+    reads of opening a zip archive in place.
+
+    :param path: path of the file
+    :type path: str
+    :return: file content
+    :rtype: bytes
+    """
+    with open(path, 'rb') as file:
+        return file.read()
+
+
+def _parse(path, content, lazy):
+    """Build a CellHesion from the bytes of a force file, CPU-bound"""
+    archive = ForceArchive(path, content=content)
+    sample = CellHesion(archive=archive, lazy=lazy)
+    # everything is converted, drop the content and the raw channel bytes; lazy samples decode later and keep them
+    if not lazy:
+        archive.release()
+    return sample
+
+
+async def load_cellhesion_async(path, lazy=False, reader=read_file, executor=None, io_executor=None):
+    """
+    Load a force file without blocking the event loop.
+
+    The file is read by ``reader`` in ``io_executor``, then parsed, decoded and converted in ``executor``, both
+    default to the event loop's thread pool. A process pool as ``executor`` takes decoding off the interpreter lock.
+
+    - **example usage**::
+
+        >>> sample = await load_cellhesion_async(r"path/on/nfs/to/jpk-force-file")
+
+    :param path: path of the force file
+    :type path: str
+    :param lazy: defer decoding of the channels, see :class:`~JPKay.core.data_structures.CellHesion`
+    :type lazy: bool
+    :param reader: callable returning the content of a path
+    :type reader: callable
+    :param executor: executor parsing and decoding the content
+    :type executor: concurrent.futures.Executor
+    :param io_executor: executor running ``reader``
+    :type io_executor: concurrent.futures.Executor
+    :return: loaded sample
+    :rtype: CellHesion
+    """
+    loop = asyncio.get_running_loop()
+    content = await loop.run_in_executor(io_executor, reader, path)
+    return await loop.run_in_executor(executor, _parse, path, content, lazy)
+
+
+async def _load_result(index, path, **kwargs):
+    try:
+        return index, LoadResult(path, await load_cellhesion_async(path, **kwargs), None)
+    except Exception as error:
+        return index, LoadResult(path, None, error)
+
+
+async def iter_cellhesion_async(paths, concurrency=8, **kwargs):
+    """
+    Load many force files concurrently, yielding each one as soon as it is loaded.
+
+    At most ``concurrency`` files are read or decoded at a time, so reads overlap while memory stays bounded. Unless
+    an ``io_executor`` is given, files are read by a thread pool of ``concurrency`` threads. A file failing to load
+    does not stop the iteration, its :class:`~JPKay.data_io.batch.LoadResult` carries the error instead.
+
+    - **example usage**::
+
+        >>> async for result in iter_cellhesion_async(paths, concurrency=32):
+        ...     if result.ok:
+        ...         print(result.path, result.data.data.retract.force.min())
+
+    :param paths: paths of the force files
+    :type paths: iterable
+    :param concurrency: maximum number of files in flight
+    :type concurrency: int
+    :param kwargs: passed on to :func:`load_cellhesion_async`
+    :return: one result per path, in the order of completion
+    :rtype: async generator of LoadResult
+    """
+    async for _, result in _iter_indexed(paths, concurrency, **kwargs):
+        yield result
+
+
+async def _iter_indexed(paths, concurrency, **kwargs):
+    """Results of :func:`iter_cellhesion_async` along with the position of their path"""
+    if concurrency < 1:
+        raise ValueError("concurrency has to be at least 1")
+
+    paths = enumerate(paths)
+    pending = set()
+    own_executor = None
+    if kwargs.get('io_executor') is None:
+        # the default executor of the event loop has too few threads to keep many slow reads in flight
+        own_executor = kwargs['io_executor'] = ThreadPoolExecutor(max_workers=concurrency)
+    try:
+        while True:
+            for index, path in paths:
+                pending.add(asyncio.ensure_future(_load_result(index, path, **kwargs)))
+                if len(pending) >= concurrency:
+                    break
+            if not pending:
+                return
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        # the consumer may stop early
+        for task in pending:
+            task.cancel()
+        if own_executor is not None:
+            own_executor.shutdown(wait=False)
+
+
+async def load_many_async(paths, concurrency=8, **kwargs):
+    """
+    Load many force files concurrently, see :func:`iter_cellhesion_async`.
+
+    :param paths: paths of the force files
+    :type paths: iterable
+    :param concurrency: maximum number of files in flight
+    :type concurrency: int
+    :param kwargs: passed on to :func:`load_cellhesion_async`
+    :return: one result per path, in the order of ``paths``
+    :rtype: list of LoadResult
+    """
+    paths = list(paths)
+    # by position, the same path may be given more than once
+    results = [None] * len(paths)
+    async for index, result in _iter_indexed(paths, concurrency, **kwargs):
+        results[index] = result
+    return results
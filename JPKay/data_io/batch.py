@@ -0,0 +1,137 @@
+# coding=utf-8
+
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from JPKay.core.data_structures import CellHesion
+
+
+class LoadResult(namedtuple('LoadResult', ['path', 'data', 'error'])):
+    """
+    Outcome of loading a single file in :func:`load_many`.
+
+    - **attributes**
+
+        - path: path of the loaded file
+        - data: whatever the loader returned, None if loading failed
+        - error: the exception raised while loading, None on success
+    """
+
+    __slots__ = ()
+
+    @property
+    def ok(self):
+        """True if the file was loaded without error"""
+        return self.error is None
+
+
+def _load(loader, path):
+    """Load a single file in a worker, catching any error so that the batch carries on"""
+    try:
+        data = loader(path)
+    except Exception as error:
+        return LoadResult(path, None, error)
+
+    # release the file handle of a fully loaded CellHesion, which does not need it anymore, lazy ones decode later
+    if isinstance(data, CellHesion) and data._data is not None:
+        data.archive.close()
+    return LoadResult(path, data, None)
+
+
+def pool_class(executor):
+    """
+    Executor class of an executor name, shared by all functions reading files in parallel.
+
+    :param executor: either process or thread
+    :type executor: str
+    :return: executor class
+    :rtype: type
+    """
+    if executor == 'process':
+        return ProcessPoolExecutor
+    if executor == 'thread':
+        return ThreadPoolExecutor
+    raise ValueError("executor has to be either process or thread")
+
+
+def iter_many(paths, workers=None, executor='process', loader=CellHesion, progress=None):
+    """
+    Load and convert many force files in parallel, yielding each result as soon as it completes, see
+    :func:`load_many`. Stopping the iteration early cancels the files not started yet.
+
+    - **example usage**::
+
+        >>> for result in iter_many(glob.glob("experiment/*.jpk-force"), workers=8):
+        ...     if result.ok:
+        ...         print(result.path, result.data.data.retract.force.min())
+
+    :param paths: paths of the force files
+    :type paths: iterable
+    :param workers: number of workers, defaults to the executor's default
+    :type workers: int
+    :param executor: either process or thread
+    :type executor: str
+    :param loader: callable loading a single path, has to be picklable for process workers
+    :type loader: callable
+    :param progress: optional callable ``progress(done, total)`` invoked after each file
+    :type progress: callable
+    :return: one result per path, in the order of completion
+    :rtype: iterator of LoadResult
+    """
+    # checked here, as the generator only runs on first iteration
+    executor_class = pool_class(executor)
+    return _iter_completed(executor_class(max_workers=workers), loader, list(paths), progress)
+
+
+def _iter_completed(pool, loader, paths, progress):
+    try:
+        futures = [pool.submit(_load, loader, path) for path in paths]
+        for done, future in enumerate(as_completed(futures), start=1):
+            if progress is not None:
+                progress(done, len(paths))
+            yield future.result()
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def load_many(paths, workers=None, executor='process', ordered=True, loader=CellHesion, progress=None):
+    """
+    Load and convert many force files in parallel.
+
+    A file failing to load does not abort the batch, its :class:`LoadResult` carries the error instead. Lazy samples
+    decode later, those returned from worker processes open their file again on first access.
+
+    - **example usage**::
+
+        >>> results = load_many(glob.glob("experiment/*.jpk-force"), workers=8)
+        >>> samples = [result.data for result in results if result.ok]
+        >>> failed = {result.path: result.error for result in results if not result.ok}
+
+    :param paths: paths of the force files
+    :type paths: iterable
+    :param workers: number of workers, defaults to the executor's default
+    :type workers: int
+    :param executor: either process or thread
+    :type executor: str
+    :param ordered: return a list in the order of ``paths``, otherwise an iterator yielding results as they
+        complete, see :func:`iter_many`
+    :type ordered: bool
+    :param loader: callable loading a single path, has to be picklable for process workers
+    :type loader: callable
+    :param progress: optional callable ``progress(done, total)`` invoked after each file
+    :type progress: callable
+    :return: one result per path
+    :rtype: list or iterator of LoadResult
+    """
+    if not ordered:
+        return iter_many(paths, workers=workers, executor=executor, loader=loader, progress=progress)
+
+    paths = list(paths)
+    results = [None] * len(paths)
+    with pool_class(executor)(max_workers=workers) as pool:
+        futures = {pool.submit(_load, loader, path): index for index, path in enumerate(paths)}
+        for done, future in enumerate(as_completed(futures), start=1):
+            results[futures[future]] = future.result()
+            if progress is not None:
+                progress(done, len(paths))
+    return results
@@ -0,0 +1,221 @@
+# coding=utf-8
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from JPKay.core.data_structures import CellHesion, ForceArchive, Properties
+
+
+class CurveCache:
+    """
+    Persistent on-disk cache of converted force and height curves.
+
+    On first load, the converted channels of every segment are written column by column to ``.npy`` files next to
+    the parsed :class:`~JPKay.core.data_structures.Properties`. Later loads memory-map these columns instead of
+    decompressing and decoding the force file again.
+
+    Entries are keyed by the absolute path of the force file, its size and modification time and, optionally, a
+    hash of its content. If the cache grows beyond ``max_bytes``, the least recently used entries are evicted.
+
+    - **Methods**
+
+    - load: load a force file from the cache, decoding and storing it on a miss
+    - get: load a force file from the cache only
+    - store: write a loaded force file to the cache
+    - invalidate: remove the cached entries of a force file
+    - clear: remove all cached entries
+
+    - **example usage**::
+
+        >>> cache = CurveCache("path/to/cache", max_bytes=10 * 2**30)
+        >>> sample = cache.load(r"path/to/jpk-force-file")
+        >>> force = sample.segment('retract').force  # memory-mapped from the cache
+    """
+
+    properties_file = 'properties.json'
+    staging_prefix = '.staging-'
+
+    def __init__(self, directory, max_bytes=None, content_hash=False):
+        self.directory = os.path.abspath(os.path.expanduser(directory))
+        self.max_bytes = max_bytes
+        self.content_hash = content_hash
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def _path_key(path):
+        return hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()
+
+    def _version_key(self, path):
+        stat = os.stat(path)
+        key = hashlib.sha1("{}:{}".format(stat.st_size, stat.st_mtime_ns).encode('utf-8'))
+        if self.content_hash:
+            with open(path, 'rb') as file:
+                for block in iter(lambda: file.read(2 ** 20), b''):
+                    key.update(block)
+        return key.hexdigest()
+
+    def entry_directory(self, path):
+        """
+        Directory of the cache entry of the current version of a force file.
+
+        :param path: path of the force file
+        :type path: str
+        :return: entry directory
+        :rtype: str
+        """
+        return os.path.join(self.directory, self._path_key(path), self._version_key(path))
+
+    def get(self, path):
+        """
+        Load a force file from the cache.
+
+        :param path: path of the force file
+        :type path: str
+        :return: lazy sample with memory-mapped channels, None if not cached
+        :rtype: CellHesion
+        """
+        entry = self.entry_directory(path)
+        properties_path = os.path.join(entry, self.properties_file)
+        if not os.path.isfile(properties_path):
+            return None
+
+        with open(properties_path) as infile:
+            properties = Properties.from_dict(json.load(infile))
+
+        channels = {}
+        for segment in properties.segments:
+            for channel in CellHesion.channels:
+                column = os.path.join(entry, "{}.{}.npy".format(segment, channel))
+                channels[(segment, channel)] = np.load(column, mmap_mode='r')
+
+        # mark entry as recently used
+        os.utime(properties_path)
+        return CellHesion.from_channels(properties, channels)
+
+    def store(self, sample):
+        """
+        Write the converted channels and properties of a force file to the cache.
+
+        :param sample: loaded force file
+        :type sample: CellHesion
+        :return: entry directory
+        :rtype: str
+        """
+        entry = self.entry_directory(sample.file)
+        parent = os.path.dirname(entry)
+        os.makedirs(parent, exist_ok=True)
+
+        # write to a temporary directory first and rename it into place, so that readers never see a half-written
+        # entry, and concurrent writers of the same file never remove each other's files
+        staging = tempfile.mkdtemp(prefix=self.staging_prefix, dir=parent)
+        try:
+            self._write_entry(staging, sample)
+            with open(os.path.join(staging, self.properties_file), 'w') as outfile:
+                json.dump(sample.properties.to_dict(), outfile)
+            os.replace(staging, entry)
+        except OSError:
+            # another writer put the same version into place first
+            shutil.rmtree(staging, ignore_errors=True)
+            if not os.path.isfile(os.path.join(entry, self.properties_file)):
+                raise
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        # older versions of the same file are outdated
+        for name in os.listdir(parent):
+            if name != os.path.basename(entry) and not name.startswith(self.staging_prefix):
+                shutil.rmtree(os.path.join(parent, name), ignore_errors=True)
+
+        if self.max_bytes is not None:
+            self.evict(self.max_bytes)
+        return entry
+
+    def _write_entry(self, directory, sample):
+        """Write the converted channels of a sample into the directory of a new entry, extended by subclasses"""
+        for segment in sample.properties.segments:
+            for channel in sample.channels:
+                column = os.path.join(directory, "{}.{}.npy".format(segment, channel))
+                np.save(column, np.asarray(sample.load_channel(segment, channel)))
+
+    def load(self, path):
+        """
+        Load a force file from the cache, or decode it and store it in the cache on a miss.
+
+        :param path: path of the force file
+        :type path: str
+        :return: lazy sample
+        :rtype: CellHesion
+        """
+        sample = self.get(path)
+        if sample is None:
+            with ForceArchive(path) as archive:
+                self.store(CellHesion(archive=archive, lazy=True))
+            sample = self.get(path)
+        return sample
+
+    def entries(self):
+        """
+        List all cache entries.
+
+        :return: entry directory, size in bytes and time of last use, least recently used first
+        :rtype: list
+        """
+        entries = []
+        for path_key in os.listdir(self.directory):
+            parent = os.path.join(self.directory, path_key)
+            if not os.path.isdir(parent):
+                continue
+            for version_key in os.listdir(parent):
+                if version_key.startswith(self.staging_prefix):
+                    continue
+                entry = os.path.join(parent, version_key)
+                properties_path = os.path.join(entry, self.properties_file)
+                if not os.path.isfile(properties_path):
+                    continue
+                size = sum(os.path.getsize(os.path.join(entry, name)) for name in os.listdir(entry))
+                entries.append((entry, size, os.path.getmtime(properties_path)))
+        return sorted(entries, key=lambda item: item[2])
+
+    def size(self):
+        """Total size of all cache entries in bytes"""
+        return sum(size for entry, size, used in self.entries())
+
+    def evict(self, max_bytes):
+        """
+        Remove least recently used entries until the cache fits into ``max_bytes``.
+
+        :param max_bytes: size limit in bytes
+        :type max_bytes: int
+        """
+        entries = self.entries()
+        total = sum(size for entry, size, used in entries)
+        for entry, size, used in entries:
+            if total <= max_bytes:
+                break
+            shutil.rmtree(entry)
+            total -= size
+
+            # drop the directory of the force file along with its last entry
+            parent = os.path.dirname(entry)
+            if not os.listdir(parent):
+                os.rmdir(parent)
+
+    def invalidate(self, path):
+        """
+        Remove all cached versions of a force file.
+
+        :param path: path of the force file
+        :type path: str
+        """
+        shutil.rmtree(os.path.join(self.directory, self._path_key(path)), ignore_errors=True)
+
+    def clear(self):
+        """Remove all cache entries"""
+        for name in os.listdir(self.directory):
+            shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
@@ -0,0 +1,164 @@
+# coding=utf-8
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from JPKay.core.data_structures import ForceArchive, Properties
+from JPKay.core.java_properties import UTC_TIMESTAMP_FORMAT
+from JPKay.data_io.batch import pool_class
+
+
+_SETTINGS = 'force-scan-series.header.force-settings.'
+
+
+def _float(value):
+    """Float of a property value, NaN if missing or malformed"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def read_metadata(path):
+    """
+    Read the metadata of a single force file from its property files only, no channel data is read.
+
+    :param path: path of the force file
+    :type path: str
+    :return: one catalog row, see :func:`scan_metadata`
+    :rtype: dict
+    """
+    with ForceArchive(path) as archive:
+        return metadata_row(path, Properties(archive=archive))
+
+
+def metadata_row(path, props):
+    """
+    Catalog row of already read properties, for readers that parse the properties anyway.
+
+    :param path: path of the force file
+    :type path: str
+    :param props: properties of the force file
+    :type props: JPKay.core.data_structures.Properties
+    :return: one catalog row, see :func:`scan_metadata`
+    :rtype: dict
+    """
+    general = props.general
+
+    row = {
+        'path': path,
+        'error': None,
+        'timestamp': general.get('timestamp'),
+        'instrument': general.get('force-scan-series.description.instrument'),
+        'segments': ','.join(props.segments),
+        'num_segments': len(props.segments),
+        'duration': sum(_float(segment.get('force-segment-header.duration')) for segment in props.segments.values()),
+        'setpoint': _float(general.get(_SETTINGS + 'setpoint')),
+        'relative_setpoint': _float(general.get(_SETTINGS + 'relative-setpoint')),
+        'relative_z_start': _float(general.get(_SETTINGS + 'relative-z-start')),
+        'relative_z_end': _float(general.get(_SETTINGS + 'relative-z-end')),
+        'spring_constant': float(props.conversion_factors['vDeflection']['force multiplier']),
+        'sensitivity': float(props.conversion_factors['vDeflection']['distance multiplier']),
+    }
+    for name, segment in props.segments.items():
+        row['{}_duration'.format(name)] = _float(segment.get('force-segment-header.duration'))
+        row['{}_points'.format(name)] = _float(segment.get('force-segment-header.num-points'))
+    return row
+
+
+def _scan(path):
+    """Read the metadata of a single file in a worker, a file failing to read yields a row with its error"""
+    try:
+        return read_metadata(path)
+    except Exception as error:
+        return {'path': path, 'error': '{}: {}'.format(type(error).__name__, error)}
+
+
+def catalog_columns(rows):
+    """
+    Catalog columns of rows, the fixed columns first, then the per-segment columns in order of appearance.
+
+    :param rows: catalog rows or tables, only their keys are used
+    :type rows: iterable of dict
+    :return: column names
+    :rtype: list
+    """
+    columns = ['path', 'error', 'timestamp', 'instrument', 'segments', 'num_segments', 'duration', 'setpoint',
+               'relative_setpoint', 'relative_z_start', 'relative_z_end', 'spring_constant', 'sensitivity']
+    known = set(columns)
+    for row in rows:
+        for column in row:
+            if column not in known:
+                known.add(column)
+                columns.append(column)
+    return columns
+
+
+def scan_metadata(paths, workers=None, executor='process', chunk_size=64):
+    """
+    Catalog many force files from their headers only.
+
+    Just ``header.properties``, ``shared-data/header.properties`` and the segment headers are read, the channel data
+    is skipped entirely, so a file costs a few kilobytes of I/O however long its curves are. Files are scanned in
+    parallel, shared headers are parsed once per worker, see :class:`~JPKay.core.data_structures.SharedHeaderCache`.
+    A file failing to read does not abort the scan, its row only carries the error.
+
+    The table has one row per path, in the order of ``paths``, with the columns
+
+        - path
+        - error: message of the error raised while reading, None if the file was read
+        - timestamp: measurement date-time in UTC
+        - instrument: instrument serial and type
+        - segments: comma-separated segment names
+        - num_segments: number of segments
+        - duration: total duration of all segments in seconds
+        - setpoint, relative_setpoint, relative_z_start, relative_z_end: force settings, NaN if not used
+        - spring_constant: force multiplier of vDeflection in N/m
+        - sensitivity: distance multiplier of vDeflection in m/V
+        - <segment>_duration, <segment>_points: duration in seconds and number of samples of every segment name
+          found, NaN for files without this segment
+
+    - **example usage**::
+
+        >>> catalog = scan_metadata(find_force_files("experiment"), workers=8)
+        >>> catalog[catalog.error.isnull()].groupby('instrument').spring_constant.describe()
+
+    :param paths: paths of the force files
+    :type paths: iterable
+    :param workers: number of workers, defaults to the number of CPUs
+    :type workers: int
+    :param executor: either process or thread
+    :type executor: str
+    :param chunk_size: paths handed to a process worker at once, amortizes the inter-process overhead
+    :type chunk_size: int
+    :return: catalog
+    :rtype: pandas.DataFrame
+    """
+    executor_class = pool_class(executor)
+
+    paths = list(paths)
+    with executor_class(max_workers=workers or os.cpu_count()) as pool:
+        rows = list(pool.map(_scan, paths, chunksize=chunk_size))
+
+    return compact_catalog(pd.DataFrame.from_records(rows, columns=catalog_columns(rows)))
+
+
+def compact_catalog(catalog):
+    """
+    Convert the columns of a catalog to compact dtypes in place: parsed UTC timestamps, categorical instruments and
+    segments and int16 segment counts.
+
+    :param catalog: catalog with the columns of :func:`catalog_columns`
+    :type catalog: pandas.DataFrame
+    :return: the same catalog
+    :rtype: pandas.DataFrame
+    """
+    catalog['timestamp'] = pd.to_datetime(catalog['timestamp'], format=UTC_TIMESTAMP_FORMAT, utc=True, errors='coerce')
+    # few distinct values repeated over many files
+    for column in ('instrument', 'segments'):
+        catalog[column] = catalog[column].astype('category')
+    catalog['num_segments'] = catalog['num_segments'].fillna(0).astype(np.int16)
+    return catalog
+
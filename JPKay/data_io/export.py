@@ -0,0 +1,406 @@
+# coding=utf-8
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from JPKay.core.data_structures import CellHesion, ForceArchive
+from JPKay.data_io.catalog import catalog_columns, compact_catalog, metadata_row
+
+try:
+    import h5py
+except ImportError:
+    h5py = None
+
+try:
+    import zarr
+    from numcodecs import Blosc
+except ImportError:
+    zarr = None
+
+FORMATS = ('hdf5', 'zarr')
+
+# marks a store written by export_experiment, and the version of its layout
+STORE_TYPE = 'jpkay-experiment'
+STORE_VERSION = 1
+
+
+def store_format(path, fmt=None):
+    """
+    Format of an experiment store, guessed from its path unless given: zarr for a ``.zarr`` path, hdf5 otherwise.
+
+    :param path: path of the store
+    :type path: str
+    :param fmt: either hdf5 or zarr
+    :type fmt: str
+    :return: format
+    :rtype: str
+    """
+    if fmt is None:
+        fmt = 'zarr' if path.rstrip('/\\').endswith('.zarr') else 'hdf5'
+    if fmt not in FORMATS:
+        raise ValueError("format has to be one of {}".format(', '.join(FORMATS)))
+    if fmt == 'hdf5' and h5py is None:
+        raise ImportError("HDF5 stores require h5py, install it with: pip install h5py")
+    if fmt == 'zarr' and zarr is None:
+        raise ImportError("Zarr stores require zarr, install it with: pip install 'zarr<3'")
+    return fmt
+
+
+class _Column:
+    """
+    Growable, chunked and compressed 1D dataset. Appends are buffered and written in whole chunks, as appending to a
+    partially filled chunk recompresses it.
+    """
+
+    def __init__(self, root, fmt, name, dtype, chunk_size, compression):
+        self.chunk_size = chunk_size
+        self.dtype = np.dtype(dtype)
+        if fmt == 'hdf5':
+            self.dataset = root.create_dataset(name, shape=(0,), maxshape=(None,), dtype=self.dtype,
+                                               chunks=(chunk_size,), compression='gzip', compression_opts=compression,
+                                               shuffle=True)
+        else:
+            self.dataset = root.create_dataset(name, shape=(0,), dtype=self.dtype, chunks=(chunk_size,),
+                                               compressor=Blosc(cname='zstd', clevel=compression,
+                                                                shuffle=Blosc.SHUFFLE))
+        self._fmt = fmt
+        self._buffer = []
+        self._buffered = 0
+
+    def append(self, data):
+        self._buffer.append(np.asarray(data, dtype=self.dtype))
+        self._buffered += len(data)
+        if self._buffered >= self.chunk_size:
+            self.flush(whole_chunks=True)
+
+    def flush(self, whole_chunks=False):
+        if not self._buffered:
+            return
+        data = np.concatenate(self._buffer)
+        size = len(data) - len(data) % self.chunk_size if whole_chunks else len(data)
+        self._write(data[:size])
+        self._buffer = [data[size:]]
+        self._buffered = len(data) - size
+
+    def _write(self, data):
+        if self._fmt == 'hdf5':
+            start = self.dataset.shape[0]
+            self.dataset.resize((start + len(data),))
+            self.dataset[start:] = data
+        else:
+            self.dataset.append(data)
+
+
+def _open(path, fmt, mode):
+    if fmt == 'hdf5':
+        return h5py.File(path, mode)
+    return zarr.open_group(path, mode=mode)
+
+
+def _encode_strings(values):
+    """Fixed-width utf-8 bytes, readable by any HDF5 or Zarr reader"""
+    encoded = [b'' if value is None or value != value else str(value).encode('utf-8') for value in values]
+    return np.array(encoded, dtype='S{}'.format(max([len(value) for value in encoded] + [1])))
+
+
+def _decode_strings(values):
+    return [value.decode('utf-8') or None for value in values]
+
+
+def export_experiment(paths, path, fmt=None, channels=None, chunk_size=2 ** 16, compression=4, progress=None):
+    """
+    Export many force files into one chunked and compressed HDF5 or Zarr store, see :class:`ExperimentStore`.
+
+    The encoded channels are stored as they are, e.g. as int32, and not converted. The scale and offset of each curve
+    are stored next to them (see :func:`~JPKay.core.data_structures.Properties.affine_coefficients`), so that readers
+    convert only the curves they read. All curves of a segment and channel are concatenated into a single dataset,
+    with an offset array locating each curve, which keeps chunks full and compression effective even for short
+    curves. Per-file metadata, the columns of :func:`~JPKay.data_io.catalog.scan_metadata`, are stored as a table.
+
+    Layout of the store::
+
+        files/path                              path of every exported file, curve n is the n-th file
+        metadata/<column>                       catalog table, one entry per file
+        segments/<segment>/offsets              start of curve n at offsets[n], its end at offsets[n + 1]
+        segments/<segment>/<channel>/raw        encoded data of all curves
+        segments/<segment>/<channel>/scale      scale of every curve, NaN if it lacks the segment
+        segments/<segment>/<channel>/offset     offset of every curve
+
+    A file failing to load is skipped, the export carries on.
+
+    - **example usage**::
+
+        >>> failed = export_experiment(find_force_files("experiment"), "experiment.h5")
+        >>> with ExperimentStore("experiment.h5") as store:
+        ...     forces = store.load('retract', 'force', slice(0, 1000))
+
+    :param paths: paths of the force files
+    :type paths: iterable
+    :param path: path of the store, an existing store is overwritten
+    :type path: str
+    :param fmt: either hdf5 or zarr, guessed from ``path`` if not given, see :func:`store_format`
+    :type fmt: str
+    :param channels: JPK channels to export, defaults to those of :attr:`CellHesion.channels`
+    :type channels: list
+    :param chunk_size: samples per chunk
+    :type chunk_size: int
+    :param compression: compression level, of gzip for hdf5 and of zstd for zarr
+    :type compression: int
+    :param progress: optional callable ``progress(done, total)`` invoked after each file
+    :type progress: callable
+    :return: error of every skipped file
+    :rtype: dict
+    """
+    fmt = store_format(path, fmt)
+    channels = list(channels or CellHesion.channels.values())
+    paths = list(paths)
+
+    failed = {}
+    rows = []
+    columns = {}
+    # per segment: curve number, length and per channel scale and offset of all curves containing it
+    segments = {}
+    units = {}
+    root = _open(path, fmt, 'w')
+    try:
+        for done, force_file in enumerate(paths, start=1):
+            try:
+                with ForceArchive(force_file) as archive:
+                    sample = CellHesion(archive=archive, lazy=True)
+                    props = sample.properties
+                    encoded = {(segment, channel): sample.load_encoded_channel(segment, channel)
+                               for segment in props.segments for channel in channels}
+                    coefficients = {channel: props.affine_coefficients(channel) for channel in channels}
+                    for (segment, channel), data in encoded.items():
+                        column = columns.get((segment, channel))
+                        if column is not None and not np.can_cast(data.dtype, column.dtype):
+                            raise ValueError("{} is encoded as {}, previous files as {}".format(
+                                channel, data.dtype, column.dtype))
+                    row = metadata_row(force_file, props)
+            except Exception as error:
+                failed[force_file] = error
+            else:
+                curve = len(rows)
+                rows.append(row)
+                for (segment, channel), data in encoded.items():
+                    key = (segment, channel)
+                    if key not in columns:
+                        columns[key] = _Column(root, fmt, 'segments/{}/{}/raw'.format(segment, channel),
+                                               data.dtype.newbyteorder('='), chunk_size, compression)
+                        slot = props.default_slots[channel]
+                        units[key] = (slot, props.slot_units[channel].get(slot) or '')
+                    columns[key].append(data)
+
+                for segment in props.segments:
+                    entry = segments.setdefault(segment, {'curves': [], 'lengths': [], 'scale': {}, 'offset': {}})
+                    entry['curves'].append(curve)
+                    entry['lengths'].append(len(encoded[(segment, channels[0])]))
+                    for channel in channels:
+                        entry['scale'].setdefault(channel, []).append(coefficients[channel][0])
+                        entry['offset'].setdefault(channel, []).append(coefficients[channel][1])
+
+            if progress is not None:
+                progress(done, len(paths))
+
+        for column in columns.values():
+            column.flush()
+        _write_tables(root, rows, segments, channels, units)
+    finally:
+        if fmt == 'hdf5':
+            root.close()
+    return failed
+
+
+def _write_tables(root, rows, segments, channels, units):
+    """Write everything but the channel data, once all files are exported"""
+    total = len(rows)
+    root.attrs['type'] = STORE_TYPE
+    root.attrs['version'] = STORE_VERSION
+    root.attrs['curves'] = total
+    root.attrs['channels'] = channels
+
+    root.create_dataset('files/path', data=_encode_strings([row['path'] for row in rows]))
+    table = pd.DataFrame.from_records(rows, columns=catalog_columns(rows)).drop(columns=['path', 'error'])
+    for name in table.columns:
+        values = table[name]
+        data = _encode_strings(values) if values.dtype == object else values.to_numpy()
+        root.create_dataset('metadata/{}'.format(name), data=data)
+
+    for segment, entry in segments.items():
+        curves = np.asarray(entry['curves'], dtype=np.int64)
+        lengths = np.zeros(total, dtype=np.int64)
+        lengths[curves] = entry['lengths']
+        root.create_dataset('segments/{}/offsets'.format(segment),
+                            data=np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64))
+        for channel in channels:
+            group = 'segments/{}/{}/'.format(segment, channel)
+            for name in ('scale', 'offset'):
+                coefficients = np.full(total, np.nan)
+                coefficients[curves] = entry[name][channel]
+                root.create_dataset(group + name, data=coefficients)
+            slot, unit = units[(segment, channel)]
+            root[group + 'raw'].attrs['slot'] = slot
+            root[group + 'raw'].attrs['unit'] = unit
+
+
+class ExperimentStore:
+    """
+    Reader of an experiment store written by :func:`export_experiment`.
+
+    Only the offsets, scales and offsets of a segment are read when it is first accessed, channel data only of the
+    curves actually read, and it is converted to physical units on read. The force files are not needed anymore.
+
+    - **Methods**
+
+    - load: converted data of one or many curves
+    - raw: encoded data of one or many curves
+    - close: close the store
+
+    - **attributes**
+
+        - paths: paths of the exported force files, the n-th file is curve n
+        - segments: names of the segments contained in any file
+        - channels: exported JPK channels
+        - metadata: per-file metadata as DataFrame, see :func:`~JPKay.data_io.catalog.scan_metadata`
+
+    - **example usage**::
+
+        >>> with ExperimentStore("experiment.h5") as store:
+        ...     adhesive = store.metadata.relative_setpoint > 0.4
+        ...     forces = store.load('retract', 'force', np.flatnonzero(adhesive))
+    """
+
+    def __init__(self, path, fmt=None):
+        self.path = path
+        self.fmt = store_format(path, fmt)
+        if self.fmt == 'zarr' and not os.path.exists(path) or self.fmt == 'hdf5' and not os.path.isfile(path):
+            raise ValueError("store {} does not exist".format(path))
+        self._root = _open(path, self.fmt, 'r')
+        if self._root.attrs.get('type') != STORE_TYPE:
+            self.close()
+            raise ValueError("{} is not an experiment store".format(path))
+        self.channels = list(self._root.attrs['channels'])
+        self.segments = list(self._root['segments']) if 'segments' in self._root else []
+        self.paths = _decode_strings(self._root['files/path'][:])
+        self._metadata = None
+        self._coefficients = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        return len(self.paths)
+
+    def close(self):
+        """Close the store"""
+        if self.fmt == 'hdf5':
+            self._root.close()
+
+    @property
+    def metadata(self):
+        """Per-file metadata, one row per curve"""
+        if self._metadata is None:
+            group = self._root['metadata']
+            table = {'path': self.paths}
+            for name in group:
+                values = group[name][:]
+                table[name] = _decode_strings(values) if values.dtype.kind == 'S' else values
+            columns = [column for column in catalog_columns([table]) if column != 'error']
+            self._metadata = compact_catalog(pd.DataFrame(table, columns=columns))
+        return self._metadata
+
+    def _channel(self, channel):
+        """JPK channel name of a channel, which may also be given by its DataFrame name, e.g. force"""
+        channel = CellHesion.channels.get(channel, channel)
+        if channel not in self.channels:
+            raise ValueError("channel {} not exported, use one of {}".format(channel, ', '.join(self.channels)))
+        return channel
+
+    def _segment(self, segment, channel):
+        """Offsets, scales and offsets of all curves of a segment and channel, read once"""
+        key = (segment, channel)
+        if key not in self._coefficients:
+            if segment not in self.segments:
+                raise ValueError("segment {} not contained in this store".format(segment))
+            group = 'segments/{}/'.format(segment)
+            self._coefficients[key] = (self._root[group + 'offsets'][:],
+                                       self._root['{}{}/scale'.format(group, channel)][:],
+                                       self._root['{}{}/offset'.format(group, channel)][:])
+        return self._coefficients[key]
+
+    def _read(self, segment, channel, curves, convert):
+        channel = self._channel(channel)
+        offsets, scales, shifts = self._segment(segment, channel)
+        dataset = self._root['segments/{}/{}/raw'.format(segment, channel)]
+        single = isinstance(curves, (int, np.integer))
+        indices = np.arange(len(self))[curves]
+        if single:
+            indices = np.array([indices])
+
+        starts, ends = offsets[indices], offsets[indices + 1]
+        needed = int(np.sum(ends - starts))
+        results = []
+        if len(indices) and needed:
+            first, last = int(starts.min()), int(ends.max())
+            # one read of the spanned range is faster than one read per curve, unless the curves are scattered
+            span = dataset[first:last] if last - first <= 2 * needed else None
+            for index, start, end in zip(indices, starts, ends):
+                data = span[start - first:end - first] if span is not None else dataset[start:end]
+                if convert:
+                    out = np.empty(data.shape, dtype=np.float64)
+                    np.multiply(data, scales[index], out=out, casting='unsafe')
+                    out += shifts[index]
+                    data = out
+                results.append(data)
+        else:
+            empty = np.empty(0, dtype=np.float64 if convert else dataset.dtype)
+            results = [empty for _ in indices]
+        return results[0] if single else results
+
+    def load(self, segment, channel='force', curves=slice(None)):
+        """
+        Converted data of one or many curves.
+
+        :param segment: segment name
+        :type segment: str
+        :param channel: channel, either by its DataFrame name like force or its JPK name like vDeflection
+        :type channel: str
+        :param curves: curve number, or a slice, list or array of curve numbers
+        :return: data of a single curve, or a list with the data of every curve, empty for curves lacking the segment
+        :rtype: numpy.ndarray or list
+        """
+        return self._read(segment, channel, curves, True)
+
+    def raw(self, segment, channel='force', curves=slice(None)):
+        """
+        Encoded data of one or many curves, see :func:`load`.
+
+        :return: data of a single curve, or a list with the data of every curve
+        :rtype: numpy.ndarray or list
+        """
+        return self._read(segment, channel, curves, False)
+
+    def coefficients(self, segment, channel='force'):
+        """
+        Scale and offset of every curve, converting its encoded data to the unit of :func:`unit`.
+
+        :return: scales and offsets
+        :rtype: tuple of numpy.ndarray
+        """
+        _, scales, shifts = self._segment(segment, self._channel(channel))
+        return scales, shifts
+
+    def unit(self, segment, channel='force'):
+        """
+        Calibration slot and unit of the converted data of a channel.
+
+        :return: slot and unit, e.g. (force, N)
+        :rtype: tuple
+        """
+        attrs = self._root['segments/{}/{}/raw'.format(segment, self._channel(channel))].attrs
+        return attrs['slot'], attrs['unit']
@@ -0,0 +1,443 @@
+# coding=utf-8
+
+import json
+import os
+import sqlite3
+from collections import namedtuple
+
+import pandas as pd
+
+from JPKay.core.data_structures import CellHesion, ForceArchive, Properties
+from JPKay.core.java_properties import UTC_TIMESTAMP_FORMAT
+from JPKay.data_io.batch import pool_class
+from JPKay.data_io.stream import find_force_files
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS shared (
+    digest TEXT PRIMARY KEY,
+    properties TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    timestamp REAL,
+    instrument TEXT,
+    num_segments INTEGER,
+    setpoint REAL,
+    relative_setpoint REAL,
+    spring_constant REAL,
+    sensitivity REAL,
+    shared_digest TEXT REFERENCES shared (digest),
+    general TEXT NOT NULL,
+    conversion_factors TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS segments (
+    file_id INTEGER NOT NULL REFERENCES files (id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    number INTEGER NOT NULL,
+    duration REAL,
+    points INTEGER,
+    speed REAL,
+    z_start REAL,
+    z_end REAL,
+    properties TEXT NOT NULL,
+    PRIMARY KEY (file_id, name)
+);
+CREATE INDEX IF NOT EXISTS files_timestamp ON files (timestamp);
+CREATE INDEX IF NOT EXISTS files_setpoint ON files (setpoint, relative_setpoint);
+CREATE INDEX IF NOT EXISTS segments_speed ON segments (name, speed);
+"""
+
+_SCHEMA_VERSION = 1
+
+# columns that can be filtered on in MetadataIndex.query
+FILE_COLUMNS = ('path', 'size', 'timestamp', 'instrument', 'num_segments', 'setpoint', 'relative_setpoint',
+                'spring_constant', 'sensitivity')
+SEGMENT_COLUMNS = ('duration', 'points', 'speed', 'z_start', 'z_end')
+
+_SETTINGS = 'force-scan-series.header.force-settings.'
+_SEGMENT_SETTINGS = 'force-segment-header.settings.segment-settings.'
+
+
+class IndexUpdate(namedtuple('IndexUpdate', ['added', 'updated', 'unchanged', 'removed', 'failed'])):
+    """
+    Outcome of :func:`MetadataIndex.update`.
+
+    - **attributes**
+
+        - added: number of files indexed for the first time
+        - updated: number of files indexed again, as they changed since
+        - unchanged: number of files skipped, as they did not change
+        - removed: number of files removed from the index, as they do not exist anymore
+        - failed: dictionary of the error raised by each file failing to read
+    """
+
+    __slots__ = ()
+
+
+def _float(value):
+    """Float of a property value, None if missing or malformed"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _timestamp(value):
+    """Seconds since the epoch of a timestamp given as string, datetime or number"""
+    if value is None or isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str) and value.endswith('+0000') and 'UTC' in value:
+        timestamp = pd.to_datetime(value, format=UTC_TIMESTAMP_FORMAT)
+    else:
+        timestamp = pd.Timestamp(value)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.tz_localize('UTC')
+    return timestamp.timestamp()
+
+
+def _segment_row(number, props):
+    """Query columns of a single segment"""
+    z_start = _float(props.get(_SEGMENT_SETTINGS + 'z-start'))
+    z_end = _float(props.get(_SEGMENT_SETTINGS + 'z-end'))
+    duration = _float(props.get(_SEGMENT_SETTINGS + 'duration'))
+    speed = None
+    if z_start is not None and z_end is not None and duration:
+        speed = abs(z_end - z_start) / duration
+    points = _float(props.get('force-segment-header.num-points'))
+    return {'number': number, 'duration': _float(props.get('force-segment-header.duration')),
+            'points': None if points is None else int(points), 'speed': speed, 'z_start': z_start, 'z_end': z_end}
+
+
+def _read_entry(path):
+    """
+    Read the properties of a single file in a worker. The shared header is split off the general properties, so it
+    is stored only once for all files sharing it.
+    """
+    try:
+        with ForceArchive(path) as archive:
+            props = Properties(archive=archive)
+    except Exception as error:
+        return path, None, error
+
+    shared = props.shared_props()
+    general = {key: value for key, value in props.general.items() if key not in shared or shared[key] != value}
+    factors = {channel: {name: float(factor) for name, factor in channel_factors.items()}
+               for channel, channel_factors in props.conversion_factors.items()}
+    entry = {
+        'timestamp': _timestamp(props.general.get('timestamp')),
+        'instrument': props.general.get('force-scan-series.description.instrument'),
+        'num_segments': len(props.segments),
+        'setpoint': _float(props.general.get(_SETTINGS + 'setpoint')),
+        'relative_setpoint': _float(props.general.get(_SETTINGS + 'relative-setpoint')),
+        'spring_constant': factors['vDeflection']['force multiplier'],
+        'sensitivity': factors['vDeflection']['distance multiplier'],
+        'shared_digest': props.shared_digest,
+        'shared': shared,
+        'general': general,
+        'conversion_factors': factors,
+        'segments': {name: (_segment_row(int(segment['segment_number']), segment), segment)
+                     for name, segment in props.segments.items()},
+    }
+    return path, entry, None
+
+
+class MetadataIndex:
+    """
+    Persistent SQLite index of the properties of many force files.
+
+    The output of :class:`~JPKay.core.data_structures.Properties` is stored per file: general and segment properties,
+    conversion factors and timestamp. Frequently filtered values, like setpoints, timestamp, spring constant and the
+    pulling speed of each segment, get indexed columns of their own. Shared headers are stored once for all files
+    sharing them.
+
+    :func:`update` reads only files that are new or whose size or modification time changed since they were indexed,
+    so keeping the index of a growing experiment folder current costs a ``stat`` per file. Queries never touch the
+    force files.
+
+    - **Methods**
+
+    - update: index new and changed files, forget deleted ones
+    - query: paths of the files matching some filters
+    - load: lazy :class:`~JPKay.core.data_structures.CellHesion` of the files matching some filters
+    - properties: :class:`~JPKay.core.data_structures.Properties` of an indexed file, restored without reading it
+    - remove: forget files
+    - to_frame: query columns of all indexed files as DataFrame
+    - close: close the database
+
+    - **example usage**::
+
+        >>> with MetadataIndex("experiment.sqlite") as index:
+        ...     index.update("path/to/experiment")
+        ...     paths = index.query(relative_setpoint=(0.4, 0.5), speed=(None, 10e-6), segment='retract',
+        ...                         timestamp=('2014-12-01', '2014-12-31'))
+        ...     for sample in index.load(instrument='JPK00542-CellHesion-200'):
+        ...         print(sample.segment('retract').force.min())
+    """
+
+    def __init__(self, database):
+        self.database = database
+        self.connection = sqlite3.connect(database)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        if version not in (0, _SCHEMA_VERSION):
+            self.connection.close()
+            raise ValueError("index {} has an unsupported schema version {}".format(database, version))
+        with self.connection:
+            self.connection.executescript(_SCHEMA)
+            self.connection.execute("PRAGMA user_version = {}".format(_SCHEMA_VERSION))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    def __contains__(self, path):
+        row = self.connection.execute("SELECT 1 FROM files WHERE path = ?", (os.path.abspath(path),)).fetchone()
+        return row is not None
+
+    def close(self):
+        """Close the database"""
+        self.connection.close()
+
+    def update(self, paths, pattern='*.jpk-force', workers=None, executor='process', prune=True):
+        """
+        Index new and changed force files.
+
+        :param paths: directory to walk, or an iterable of file paths
+        :type paths: str
+        :param pattern: shell-style file name pattern if walking a directory
+        :type pattern: str
+        :param workers: number of workers reading files, defaults to the number of CPUs
+        :type workers: int
+        :param executor: either process or thread
+        :type executor: str
+        :param prune: forget indexed files that do not exist anymore, only those below a walked directory
+        :type prune: bool
+        :return: numbers of added, updated, unchanged and removed files and errors of failed files
+        :rtype: IndexUpdate
+        """
+        executor_class = pool_class(executor)
+
+        root = None
+        if isinstance(paths, str):
+            root = os.path.abspath(paths)
+            paths = find_force_files(root, pattern)
+
+        indexed = {path: (size, mtime) for path, size, mtime in
+                   self.connection.execute("SELECT path, size, mtime_ns FROM files")}
+        changed = []
+        unchanged = 0
+        failed = {}
+        for path in paths:
+            path = os.path.abspath(path)
+            try:
+                stat = os.stat(path)
+            except OSError as error:
+                failed[path] = error
+                continue
+            version = (stat.st_size, stat.st_mtime_ns)
+            if indexed.get(path) == version:
+                unchanged += 1
+            else:
+                changed.append((path, version))
+
+        added = updated = 0
+        if changed:
+            versions = dict(changed)
+            with executor_class(max_workers=workers or os.cpu_count()) as pool:
+                entries = pool.map(_read_entry, [path for path, _ in changed], chunksize=64)
+                with self.connection:
+                    for path, entry, error in entries:
+                        if error is not None:
+                            failed[path] = error
+                            continue
+                        if path in indexed:
+                            updated += 1
+                        else:
+                            added += 1
+                        self._store(path, versions[path], entry)
+
+        removed = 0
+        if prune and root is not None:
+            prefix = os.path.join(root, '')
+            missing = [path for path in indexed if path.startswith(prefix) and not os.path.exists(path)]
+            removed = self.remove(missing)
+        return IndexUpdate(added, updated, unchanged, removed, failed)
+
+    def _store(self, path, version, entry):
+        """Replace the rows of a single file, within the transaction of the caller"""
+        execute = self.connection.execute
+        execute("INSERT OR IGNORE INTO shared (digest, properties) VALUES (?, ?)",
+                (entry['shared_digest'], json.dumps(entry['shared'])))
+        execute("DELETE FROM files WHERE path = ?", (path,))
+        cursor = execute(
+            "INSERT INTO files (path, size, mtime_ns, timestamp, instrument, num_segments, setpoint, relative_setpoint,"
+            " spring_constant, sensitivity, shared_digest, general, conversion_factors)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (path, version[0], version[1], entry['timestamp'], entry['instrument'], entry['num_segments'],
+             entry['setpoint'], entry['relative_setpoint'], entry['spring_constant'], entry['sensitivity'],
+             entry['shared_digest'], json.dumps(entry['general']), json.dumps(entry['conversion_factors'])))
+        self.connection.executemany(
+            "INSERT INTO segments (file_id, name, number, duration, points, speed, z_start, z_end, properties)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [(cursor.lastrowid, name, row['number'], row['duration'], row['points'], row['speed'], row['z_start'],
+              row['z_end'], json.dumps(props)) for name, (row, props) in entry['segments'].items()])
+
+    def remove(self, paths):
+        """
+        Forget files, e.g. ones that were deleted.
+
+        :param paths: paths of the files
+        :type paths: iterable
+        :return: number of files removed from the index
+        :rtype: int
+        """
+        with self.connection:
+            cursor = self.connection.executemany("DELETE FROM files WHERE path = ?",
+                                                 [(os.path.abspath(path),) for path in paths])
+            self.connection.execute("DELETE FROM shared WHERE digest NOT IN"
+                                    " (SELECT shared_digest FROM files WHERE shared_digest IS NOT NULL)")
+        return max(cursor.rowcount, 0)
+
+    def query(self, segment=None, properties=None, **filters):
+        """
+        Paths of all indexed files matching every filter.
+
+        Filters are given as keyword arguments named after a column. A value matches equal values, a tuple
+        ``(low, high)`` an inclusive range with None for an open end, and a list any of its items. File columns are
+        path, size, timestamp, instrument, num_segments, setpoint, relative_setpoint, spring_constant and
+        sensitivity. Timestamps are given as strings, datetimes or seconds since the epoch, in UTC unless stated.
+        Segment columns are duration, points, speed (the pulling speed in m/s), z_start and z_end, and match if any
+        segment of a file matches, or the segment named ``segment``.
+
+        :param segment: segment name the segment filters apply to, or only keep files containing this segment
+        :type segment: str
+        :param properties: values of general properties by key, e.g. {'force-scan-series.header.force-settings.type':
+            'relative-force-settings'}
+        :type properties: dict
+        :param filters: filters by column
+        :return: paths, sorted
+        :rtype: list
+        """
+        sql, parameters = self._select(segment, properties, filters)
+        return [path for path, in self.connection.execute(sql, parameters)]
+
+    def _select(self, segment, properties, filters):
+        conditions = []
+        parameters = []
+        segment_conditions = []
+        segment_parameters = []
+        for column, value in filters.items():
+            if column in FILE_COLUMNS:
+                target, target_parameters, name = conditions, parameters, 'files.{}'.format(column)
+            elif column in SEGMENT_COLUMNS:
+                target, target_parameters, name = segment_conditions, segment_parameters, 'segments.{}'.format(column)
+            else:
+                raise ValueError("can not filter on {}, use one of {}".format(
+                    column, ', '.join(FILE_COLUMNS + SEGMENT_COLUMNS)))
+
+            convert = _timestamp if column == 'timestamp' else (os.path.abspath if column == 'path' else None)
+            condition, values = _condition(name, value, convert)
+            target.append(condition)
+            target_parameters.extend(values)
+
+        if segment is not None:
+            segment_conditions.append("segments.name = ?")
+            segment_parameters.append(segment)
+        if segment_conditions:
+            conditions.append("EXISTS (SELECT 1 FROM segments WHERE segments.file_id = files.id AND {})".format(
+                " AND ".join(segment_conditions)))
+            parameters.extend(segment_parameters)
+
+        for key, value in (properties or {}).items():
+            # general properties are stored without the shared header, which takes precedence, see Properties
+            path = '$."{}"'.format(key.replace('"', '\\"'))
+            conditions.append("COALESCE((SELECT json_extract(shared.properties, ?) FROM shared"
+                              " WHERE shared.digest = files.shared_digest), json_extract(files.general, ?)) = ?")
+            parameters.extend([path, path, value])
+
+        sql = "SELECT path FROM files"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        return sql + " ORDER BY path", parameters
+
+    def load(self, segment=None, properties=None, **filters):
+        """
+        Lazy samples of all indexed files matching every filter, see :func:`query`. Each file is opened only once it
+        is reached, and its channels are decoded only on access.
+
+        :return: samples, in order of their paths
+        :rtype: generator of CellHesion
+        """
+        for path in self.query(segment=segment, properties=properties, **filters):
+            yield CellHesion(force_file=path, lazy=True)
+
+    def properties(self, path):
+        """
+        Restore the properties of an indexed file without reading it.
+
+        :param path: path of the force file
+        :type path: str
+        :return: restored properties, not attached to any archive
+        :rtype: Properties
+        """
+        path = os.path.abspath(path)
+        row = self.connection.execute(
+            "SELECT files.id, files.general, shared.properties FROM files"
+            " LEFT JOIN shared ON shared.digest = files.shared_digest WHERE files.path = ?", (path,)).fetchone()
+        if row is None:
+            raise ValueError("{} is not indexed".format(path))
+        file_id, general, shared = row
+
+        props = json.loads(shared) if shared else {}
+        props.update(json.loads(general))
+        segments = {name: json.loads(segment_props) for name, segment_props in self.connection.execute(
+            "SELECT name, properties FROM segments WHERE file_id = ? ORDER BY number", (file_id,))}
+        return Properties.from_dict({"file_path": path, "general": props, "segments": segments})
+
+    def to_frame(self):
+        """
+        All query columns of all indexed files, one row per file and segment.
+
+        :return: table
+        :rtype: pandas.DataFrame
+        """
+        frame = pd.read_sql_query(
+            "SELECT files.path, files.size, files.timestamp, files.instrument, files.num_segments, files.setpoint,"
+            " files.relative_setpoint, files.spring_constant, files.sensitivity, segments.name AS segment,"
+            " segments.duration, segments.points, segments.speed, segments.z_start, segments.z_end"
+            " FROM files LEFT JOIN segments ON segments.file_id = files.id ORDER BY files.path, segments.number",
+            self.connection)
+        frame['timestamp'] = pd.to_datetime(frame['timestamp'], unit='s', utc=True)
+        return frame
+
+
+def _condition(column, value, convert=None):
+    """SQL condition and parameters matching a filter value, see :func:`MetadataIndex.query`"""
+    convert = convert or (lambda item: item)
+    if isinstance(value, tuple):
+        if len(value) != 2:
+            raise ValueError("a range has to be given as (low, high)")
+        low, high = value
+        conditions, parameters = [], []
+        if low is not None:
+            conditions.append("{} >= ?".format(column))
+            parameters.append(convert(low))
+        if high is not None:
+            conditions.append("{} <= ?".format(column))
+            parameters.append(convert(high))
+        return " AND ".join(conditions) or "1", parameters
+    if isinstance(value, (list, set, frozenset)):
+        values = [convert(item) for item in value]
+        return "{} IN ({})".format(column, ", ".join("?" * len(values))) if values else "0", values
+    if value is None:
+        return "{} IS NULL".format(column), []
+    return "{} = ?".format(column), [convert(value)]
@@ -0,0 +1,95 @@
+# coding=utf-8
+
+import fnmatch
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from JPKay.core.data_structures import CellHesion, ForceArchive
+
+
+def find_force_files(root, pattern='*.jpk-force'):
+    """
+    Walk a directory tree and yield all files matching ``pattern``, in sorted order.
+
+    :param root: directory to walk
+    :type root: str
+    :param pattern: shell-style file name pattern
+    :type pattern: str
+    :return: file paths
+    :rtype: generator
+    """
+    for directory, sub_directories, files in os.walk(root):
+        sub_directories.sort()
+        for name in sorted(fnmatch.filter(files, pattern)):
+            yield os.path.join(directory, name)
+
+
+def _read_ahead(path, segments):
+    """Open a force file in a background thread and decode the requested segments"""
+    archive = ForceArchive(path)
+    try:
+        sample = CellHesion(archive=archive, lazy=True)
+        names = [name for name in sample.properties.segments if segments is None or name in segments]
+        loaded = []
+        for name in names:
+            segment = sample.segment(name)
+            for channel in sample.channels:
+                sample.load_channel(name, channel)
+            loaded.append(segment)
+    finally:
+        # everything needed is decoded, or reading failed, release file handle and raw bytes
+        archive.close()
+        archive.clear_cache()
+    return path, loaded
+
+
+def iter_force_files(root, pattern='*.jpk-force', prefetch=4, segments=None):
+    """
+    Stream the data segments of all force files below a directory, one segment at a time.
+
+    At most ``prefetch`` files are read and decoded ahead on background threads, so memory stays bounded whatever
+    the number of files. Only the segments named in ``segments`` are decoded, the others are never read. The stream
+    stops at the first file failing to read, raising its error once all files before it are yielded; use
+    :func:`~JPKay.data_io.batch.iter_many` to carry on past broken files.
+
+    - **example usage**::
+
+        >>> for path, segment in iter_force_files("experiment", segments=['retract']):
+        ...     print(path, segment.force.min())
+
+    :param root: directory to walk, or an iterable of file paths
+    :type root: str
+    :param pattern: shell-style file name pattern
+    :type pattern: str
+    :param prefetch: number of files read ahead
+    :type prefetch: int
+    :param segments: names of the segments to load, all if None
+    :type segments: iterable
+    :return: file path and :class:`~JPKay.core.data_structures.Segment` with decoded force and height
+    :rtype: generator
+    """
+    if prefetch < 1:
+        raise ValueError("prefetch has to be at least 1")
+
+    paths = find_force_files(root, pattern) if isinstance(root, str) else iter(root)
+    segments = None if segments is None else set(segments)
+
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=prefetch) as pool:
+        try:
+            for path in paths:
+                pending.append(pool.submit(_read_ahead, path, segments))
+                if len(pending) >= prefetch:
+                    path, loaded = pending.popleft().result()
+                    for segment in loaded:
+                        yield path, segment
+
+            while pending:
+                path, loaded = pending.popleft().result()
+                for segment in loaded:
+                    yield path, segment
+        finally:
+            # the consumer may stop early, do not keep decoding files nobody asks for
+            for future in pending:
+                future.cancel()
@@ -0,0 +1,4 @@
+# coding=utf-8
+
+from JPKay.plot.decimation import DecimationCache, decimate, lttb_decimate, minmax_decimate
+from JPKay.plot.overlay import CurveOverlay, plot_curves
@@ -0,0 +1,309 @@
+# coding=utf-8
+
+import math
+from collections import OrderedDict
+
+import numpy as np
+
+METHODS = ('minmax', 'lttb')
+
+# samples decimated at once, bounding the temporary arrays of large stacks of curves
+BLOCK_SIZE = 2 ** 24
+
+
+def _as_curves(x, y):
+    """Curves as 2-D float arrays of shape (curves, samples), and whether a single curve was given"""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if x.shape != y.shape or y.ndim not in (1, 2):
+        raise ValueError("x and y have to be curves of the same shape, either (samples,) or (curves, samples)")
+    if y.ndim == 1:
+        return x[np.newaxis], y[np.newaxis], True
+    return x, y, False
+
+
+def _window(samples, start, stop):
+    stop = samples if stop is None else min(stop, samples)
+    start = max(start, 0)
+    return start, max(stop, start)
+
+
+def _result(x, y, single):
+    if single:
+        return x[0], y[0]
+    return x, y
+
+
+def _by_block(function, x, y, *args):
+    """Apply a decimation to blocks of curves of about :data:`BLOCK_SIZE` samples"""
+    rows = max(BLOCK_SIZE // max(y.shape[1], 1), 1)
+    if len(y) <= rows:
+        return function(x, y, *args)
+    blocks = [function(x[row:row + rows], y[row:row + rows], *args) for row in range(0, len(y), rows)]
+    return np.concatenate([x for x, _ in blocks]), np.concatenate([y for _, y in blocks])
+
+
+def minmax_decimate(x, y, buckets, start=0, stop=None):
+    """
+    Decimate curves by splitting the samples from ``start`` to ``stop`` into ``buckets`` buckets and keeping the
+    minimum and the maximum y of each bucket, in the order they were sampled. With one bucket per pixel column, the
+    rendered curve looks the same as the full one, spikes included.
+
+    Curves stacked by :func:`~JPKay.analysis.adhesion.stack_curves` are decimated all at once, NaN padding stays
+    NaN. If the window holds no more than two samples per bucket, it is returned as it is.
+
+    :param x: x of one curve, or of curves stacked along the first axis
+    :type x: numpy.ndarray
+    :param y: y of the curves, same shape as ``x``
+    :type y: numpy.ndarray
+    :param buckets: number of buckets, the result has twice as many samples
+    :type buckets: int
+    :param start: first sample of the window
+    :type start: int
+    :param stop: end of the window, exclusive, the end of the curves if not given
+    :type stop: int
+    :return: decimated x and y
+    :rtype: tuple
+    """
+    if buckets < 1:
+        raise ValueError("at least one bucket is required")
+    x, y, single = _as_curves(x, y)
+    start, stop = _window(y.shape[1], start, stop)
+    span = stop - start
+    if span <= 2 * buckets:
+        return _result(x[:, start:stop], y[:, start:stop], single)
+    return _result(*_by_block(_minmax, x[:, start:stop], y[:, start:stop], buckets), single)
+
+
+def _minmax(x, y, buckets):
+    curves, span = y.shape
+    width = -(-span // buckets)
+    buckets = -(-span // width)
+    if span < buckets * width:
+        x = np.concatenate([x, np.full((curves, buckets * width - span), np.nan)], axis=1)
+        y = np.concatenate([y, np.full((curves, buckets * width - span), np.nan)], axis=1)
+
+    missing = np.isnan(y)
+    low = np.where(missing, np.inf, y).reshape(curves, buckets, width).argmin(axis=2)
+    high = np.where(missing, -np.inf, y).reshape(curves, buckets, width).argmax(axis=2)
+    index = np.stack([np.minimum(low, high), np.maximum(low, high)], axis=2)
+    index += (np.arange(buckets) * width)[:, np.newaxis]
+    index = index.reshape(curves, 2 * buckets)
+    rows = np.arange(curves)[:, np.newaxis]
+    return x[rows, index], y[rows, index]
+
+
+def lttb_decimate(x, y, points, start=0, stop=None):
+    """
+    Decimate curves with the Largest-Triangle-Three-Buckets algorithm: first and last sample of the window are kept,
+    the samples in between are split into ``points - 2`` buckets, and of each bucket the sample spanning the largest
+    triangle with the sample kept before and the mean of the next bucket is kept. It keeps the visual shape of a curve
+    with fewer points than :func:`minmax_decimate`, but may smooth out single spikes.
+
+    Curves are decimated all at once, one bucket of all curves at a time. NaN padding stays NaN.
+
+    :param x: x of one curve, or of curves stacked along the first axis
+    :type x: numpy.ndarray
+    :param y: y of the curves, same shape as ``x``
+    :type y: numpy.ndarray
+    :param points: number of samples of the result, at least 3
+    :type points: int
+    :param start: first sample of the window
+    :type start: int
+    :param stop: end of the window, exclusive, the end of the curves if not given
+    :type stop: int
+    :return: decimated x and y
+    :rtype: tuple
+    """
+    if points < 3:
+        raise ValueError("LTTB keeps at least 3 points")
+    x, y, single = _as_curves(x, y)
+    start, stop = _window(y.shape[1], start, stop)
+    span = stop - start
+    if span <= points:
+        return _result(x[:, start:stop], y[:, start:stop], single)
+    return _result(*_by_block(_lttb, x[:, start:stop], y[:, start:stop], points), single)
+
+
+def _lttb(x, y, points):
+    curves, span = y.shape
+    # bucket b of the samples between first and last spans edges[b]:edges[b + 1], the last sample is a bucket of its own
+    edges = np.append(1 + (np.arange(points - 1) * (span - 2)) // (points - 2), span)
+    valid = ~(np.isnan(x) | np.isnan(y))
+    counts = np.add.reduceat(valid, edges[:-1], axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_x = np.add.reduceat(np.where(valid, x, 0.0), edges[:-1], axis=1) / counts
+        mean_y = np.add.reduceat(np.where(valid, y, 0.0), edges[:-1], axis=1) / counts
+
+    index = np.empty((curves, points), dtype=np.intp)
+    index[:, 0] = 0
+    index[:, -1] = span - 1
+    rows = np.arange(curves)
+    previous_x, previous_y = x[:, 0], y[:, 0]
+    for bucket in range(points - 2):
+        low, high = edges[bucket], edges[bucket + 1]
+        next_x, next_y = mean_x[:, bucket + 1, np.newaxis], mean_y[:, bucket + 1, np.newaxis]
+        anchor_x, anchor_y = previous_x[:, np.newaxis], previous_y[:, np.newaxis]
+        area = np.abs((anchor_x - next_x) * (y[:, low:high] - anchor_y) -
+                      (anchor_x - x[:, low:high]) * (next_y - anchor_y))
+        chosen = np.where(np.isnan(area), -1.0, area).argmax(axis=1) + low
+        index[:, bucket + 1] = chosen
+        previous_x, previous_y = x[rows, chosen], y[rows, chosen]
+
+    rows = rows[:, np.newaxis]
+    return x[rows, index], y[rows, index]
+
+
+def decimate(x, y, points, method='minmax', start=0, stop=None):
+    """
+    Decimate curves to about ``points`` samples, see :func:`minmax_decimate` and :func:`lttb_decimate`.
+
+    :param x: x of one curve, or of curves stacked along the first axis
+    :type x: numpy.ndarray
+    :param y: y of the curves, same shape as ``x``
+    :type y: numpy.ndarray
+    :param points: number of samples of the result
+    :type points: int
+    :param method: either minmax or lttb
+    :type method: str
+    :param start: first sample of the window
+    :type start: int
+    :param stop: end of the window, exclusive, the end of the curves if not given
+    :type stop: int
+    :return: decimated x and y
+    :rtype: tuple
+    """
+    if method == 'minmax':
+        return minmax_decimate(x, y, max(points // 2, 1), start=start, stop=stop)
+    if method == 'lttb':
+        return lttb_decimate(x, y, points, start=start, stop=stop)
+    raise ValueError("method has to be one of {}".format(', '.join(METHODS)))
+
+
+class DecimationCache:
+    """
+    Decimated data of stacked curves per zoom level, for interactive plots.
+
+    A view is given by its x range. The samples of all curves inside it are found from the x extent of every sample
+    position, computed once, so that a view costs time proportional to the number of sample positions, not to the
+    number of curves. Every zoom level splits the samples into tiles of a power of two in size, between half and all
+    of the samples in view, and each tile is decimated to ``points`` samples only once. A view is put together from
+    at most three tiles and cut to its range, so panning decimates only the tiles coming into view, zooming back
+    reuses whole levels, and a view costs time proportional to its output. Tiles are kept in a least recently used
+    cache.
+
+    - **Methods**
+
+    - get: decimated x and y of a view
+    - window: sample window covering a view
+    - clear: remove all cached tiles
+
+    - **attributes**
+
+        - x: stacked x of all curves
+        - y: stacked y of all curves
+        - method: decimation method, either minmax or lttb
+        - maxsize: maximum number of cached tiles
+        - x_limits: x range of all data
+        - y_limits: y range of all data
+        - hits: number of tiles served from the cache
+        - misses: number of tiles decimated
+
+    - **example usage**::
+
+        >>> force, height, lengths = stack_segment(samples, 'retract')
+        >>> cache = DecimationCache(height, force)
+        >>> x, y = cache.get(points=2000)  # whole curves
+        >>> x, y = cache.get((1e-6, 2e-6), points=2000)  # zoomed in, with more detail
+    """
+
+    def __init__(self, x, y, method='minmax', maxsize=256):
+        if method not in METHODS:
+            raise ValueError("method has to be one of {}".format(', '.join(METHODS)))
+        self.x, self.y, _ = _as_curves(x, y)
+        self.method = method
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._tiles = OrderedDict()
+        # fmin and fmax skip the NaN padding of shorter curves
+        self._x_min = np.fmin.reduce(self.x, axis=0, initial=np.inf)
+        self._x_max = np.fmax.reduce(self.x, axis=0, initial=-np.inf)
+        self.x_limits = self._limits(self._x_min, self._x_max)
+        self.y_limits = self._limits(self.y, self.y)
+
+    def __len__(self):
+        return len(self._tiles)
+
+    @staticmethod
+    def _limits(low, high):
+        low, high = np.fmin.reduce(low, axis=None, initial=np.inf), np.fmax.reduce(high, axis=None, initial=-np.inf)
+        if not low <= high:
+            return np.nan, np.nan
+        return float(low), float(high)
+
+    def window(self, x_range=None):
+        """
+        Sample window holding every sample of any curve inside an x range, plus one sample on each side, so that lines
+        leave the view instead of ending inside it.
+
+        :param x_range: lower and upper x of the view, all data if not given
+        :type x_range: tuple
+        :return: start and exclusive end of the window
+        :rtype: tuple
+        """
+        samples = len(self._x_min)
+        if x_range is None:
+            return 0, samples
+        low, high = sorted(x_range)
+        inside = np.flatnonzero((self._x_max >= low) & (self._x_min <= high))
+        if not len(inside):
+            return 0, 0
+        return max(inside[0] - 1, 0), min(inside[-1] + 2, samples)
+
+    def _tile(self, size, tile, points):
+        key = (size, tile, points)
+        try:
+            self._tiles.move_to_end(key)
+        except KeyError:
+            self.misses += 1
+            self._tiles[key] = decimate(self.x, self.y, points, method=self.method,
+                                        start=tile * size, stop=(tile + 1) * size)
+            while len(self._tiles) > self.maxsize:
+                self._tiles.popitem(last=False)
+        else:
+            self.hits += 1
+        return self._tiles[key]
+
+    def get(self, x_range=None, points=2000):
+        """
+        Decimated data of a view, with ``points`` to about twice as many samples per curve.
+
+        :param x_range: lower and upper x of the view, all data if not given
+        :type x_range: tuple
+        :param points: samples per curve to decimate the view to at least, e.g. twice the width of the axes in pixels
+        :type points: int
+        :return: decimated x and y, of shape (curves, samples)
+        :rtype: tuple
+        """
+        start, stop = self.window(x_range)
+        if start == stop:
+            return self.x[:, :0], self.y[:, :0]
+        # tiles of half the window or more, so that the window spans at most three of them
+        size = 2 ** max(int(math.ceil(math.log2(stop - start))) - 1, 0)
+        tiles = [self._tile(size, tile, points) for tile in range(start // size, -(-stop // size))]
+        x, y = np.concatenate([x for x, _ in tiles], axis=1), np.concatenate([y for _, y in tiles], axis=1)
+        if x_range is None:
+            return x, y
+        # drop what the tiles hold outside the view, again keeping one sample on each side
+        low, high = sorted(x_range)
+        inside = np.flatnonzero((np.fmax.reduce(x, axis=0, initial=-np.inf) >= low) &
+                                (np.fmin.reduce(x, axis=0, initial=np.inf) <= high))
+        if not len(inside):
+            return x[:, :0], y[:, :0]
+        first, last = max(inside[0] - 1, 0), inside[-1] + 2
+        return x[:, first:last], y[:, first:last]
+
+    def clear(self):
+        """Remove all cached tiles"""
+        self._tiles.clear()
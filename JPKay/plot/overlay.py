@@ -0,0 +1,165 @@
+# coding=utf-8
+
+import numpy as np
+
+from JPKay.analysis.adhesion import stack_segment
+from JPKay.plot.decimation import DecimationCache
+
+try:
+    from matplotlib.collections import LineCollection
+except ImportError:
+    LineCollection = None
+
+
+def _require_matplotlib():
+    if LineCollection is None:
+        raise ImportError("plotting requires matplotlib, install it with: pip install matplotlib")
+
+
+class CurveOverlay:
+    """
+    Overlay of many curves, drawn as a single :class:`matplotlib.collections.LineCollection` of decimated data.
+
+    Each curve is decimated to about two samples per pixel column of the axes before it reaches the renderer, see
+    :class:`~JPKay.plot.decimation.DecimationCache`. When the x limits of the axes change, e.g. by zooming or panning,
+    the visible range is decimated again, with detail growing as the view narrows, and cached per zoom level.
+
+    - **Methods**
+
+    - from_samples: overlay of one segment of many samples, in µm and pN
+    - segments: decimated curves of a view, as (curves, samples, 2) array
+    - draw: add the overlay to matplotlib axes
+    - remove: remove the overlay from its axes
+
+    - **attributes**
+
+        - cache: decimated data per zoom level
+        - points: samples per curve, derived from the width of the axes if not given
+        - collection: line collection, once drawn
+        - axes: axes drawn into
+
+    - **example usage**::
+
+        >>> overlay = CurveOverlay.from_samples(samples, 'retract')
+        >>> overlay.draw(ax, colors='k', alpha=0.05, linewidths=0.5)
+        >>> ax.set_xlabel("height [µm]"); ax.set_ylabel("force [pN]")
+    """
+
+    def __init__(self, x, y, method='minmax', points=None, maxsize=256):
+        self.cache = DecimationCache(x, y, method=method, maxsize=maxsize)
+        self.points = points
+        self.collection = None
+        self.axes = None
+        self._callback = None
+
+    @classmethod
+    def from_samples(cls, samples, segment='retract', x_scale=10 ** 6, y_scale=10 ** 12, **kwargs):
+        """
+        Overlay force over height of one segment of many samples, see
+        :func:`~JPKay.analysis.adhesion.stack_segment`.
+
+        :param samples: loaded force files
+        :type samples: iterable of :class:`~JPKay.core.data_structures.CellHesion`
+        :param segment: segment name
+        :type segment: str
+        :param x_scale: factor of the height, µm by default
+        :type x_scale: float
+        :param y_scale: factor of the force, pN by default
+        :type y_scale: float
+        :param kwargs: see :class:`CurveOverlay`
+        :return: overlay
+        :rtype: CurveOverlay
+        """
+        force, height, _ = stack_segment(samples, segment)
+        height *= x_scale
+        force *= y_scale
+        return cls(height, force, **kwargs)
+
+    def __len__(self):
+        return len(self.cache.y)
+
+    def _points(self, ax):
+        if self.points is not None:
+            return self.points
+        pixels = max(int(ax.bbox.width), 100) if ax is not None else 1000
+        return 2 * pixels if self.cache.method == 'minmax' else pixels
+
+    def segments(self, x_range=None, points=2000):
+        """
+        Decimated curves of a view, as taken by :meth:`matplotlib.collections.LineCollection.set_segments`.
+
+        :param x_range: lower and upper x of the view, all data if not given
+        :type x_range: tuple
+        :param points: samples per curve to decimate to
+        :type points: int
+        :return: curves of shape (curves, samples, 2), NaN padding is not drawn
+        :rtype: numpy.ndarray
+        """
+        x, y = self.cache.get(x_range, points=points)
+        return np.stack([x, y], axis=-1)
+
+    def draw(self, ax=None, autoscale=True, **kwargs):
+        """
+        Add the overlay to axes, and keep it decimated to their x limits.
+
+        :param ax: axes to draw into, the current axes if not given
+        :type ax: matplotlib.axes.Axes
+        :param autoscale: whether to scale the axes to all data
+        :type autoscale: bool
+        :param kwargs: properties of the line collection, e.g. colors, alpha or linewidths
+        :return: line collection
+        :rtype: matplotlib.collections.LineCollection
+        """
+        _require_matplotlib()
+        if ax is None:
+            import matplotlib.pyplot as plt
+            ax = plt.gca()
+        self.remove()
+        self.axes = ax
+        self.collection = LineCollection([], **kwargs)
+        ax.add_collection(self.collection, autolim=False)
+        if autoscale and not np.isnan(self.cache.x_limits[0]):
+            ax.update_datalim(list(zip(self.cache.x_limits, self.cache.y_limits)))
+            ax.autoscale_view()
+        self._update(ax)
+        self._callback = ax.callbacks.connect('xlim_changed', self._update)
+        return self.collection
+
+    def _update(self, ax):
+        self.collection.set_segments(self.segments(ax.get_xlim(), points=self._points(ax)))
+
+    def remove(self):
+        """Remove the overlay from its axes"""
+        if self.collection is None:
+            return
+        self.axes.callbacks.disconnect(self._callback)
+        self.collection.remove()
+        self.collection = self.axes = self._callback = None
+
+
+def plot_curves(x, y, ax=None, method='minmax', points=None, **kwargs):
+    """
+    Plot many curves, decimated to the resolution of the axes, see :class:`CurveOverlay`.
+
+    - **example usage**::
+
+        >>> force, height, lengths = stack_segment(samples, 'retract')
+        >>> overlay = plot_curves(height * 10**6, force * 10**12, colors='k', alpha=0.05)
+
+    :param x: x of the curves, stacked along the first axis
+    :type x: numpy.ndarray
+    :param y: y of the curves, same shape as ``x``
+    :type y: numpy.ndarray
+    :param ax: axes to draw into, the current axes if not given
+    :type ax: matplotlib.axes.Axes
+    :param method: decimation method, either minmax or lttb
+    :type method: str
+    :param points: samples per curve, derived from the width of the axes if not given
+    :type points: int
+    :param kwargs: properties of the line collection, e.g. colors, alpha or linewidths
+    :return: overlay
+    :rtype: CurveOverlay
+    """
+    overlay = CurveOverlay(x, y, method=method, points=points)
+    overlay.draw(ax, **kwargs)
+    return overlay
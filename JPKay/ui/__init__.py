@@ -0,0 +1,3 @@
+# coding=utf-8
+
+from JPKay.ui.pyramid import Pyramid, PyramidCache
@@ -0,0 +1,234 @@
+# coding=utf-8
+
+import os
+import tempfile
+
+import numpy as np
+
+from JPKay.data_io.cache import CurveCache
+
+
+def _reduce(low, high, group):
+    """Minimum of ``low`` and maximum of ``high`` over consecutive groups of samples, the last group may be shorter"""
+    whole = len(low) // group * group
+    lows = low[:whole].reshape(-1, group).min(axis=1)
+    highs = high[:whole].reshape(-1, group).max(axis=1)
+    if whole < len(low):
+        lows = np.append(lows, low[whole:].min())
+        highs = np.append(highs, high[whole:].max())
+    return lows, highs
+
+
+def _level_lengths(samples, factor):
+    """Number of buckets of every level of a pyramid over ``samples`` samples"""
+    lengths = []
+    while samples > 1:
+        samples = -(-samples // factor)
+        lengths.append(samples)
+    return lengths
+
+
+class Pyramid:
+    """
+    Min/max pyramid of a channel, for browsing long segments at any zoom level.
+
+    Level 1 holds minimum and maximum of every ``factor`` samples, each further level those of ``factor`` buckets of
+    the level below, down to a single bucket. Level 0 is the full-resolution data. All levels together take
+    ``2 / (factor - 1)`` times the memory of the data.
+
+    A view of a sample range is taken from the coarsest level with at least ``points`` buckets in range, and grouped
+    down to about ``points`` buckets, so it costs time proportional to its output, reading at most ``factor`` times
+    the requested points, however long the segment. The full-resolution data is only read once a view holds fewer than
+    ``points * factor`` samples. Buckets are aligned to the start of the segment, so panning does not change the
+    buckets in view.
+
+    - **Methods**
+
+    - build: build the pyramid of a channel
+    - save: write all levels into a single ``.npy`` file
+    - open: open a saved pyramid, memory-mapped
+    - view: minimum and maximum of a sample range, at the resolution of a viewport
+
+    - **attributes**
+
+        - data: full-resolution data
+        - levels: minimum and maximum of every bucket, one array of shape (buckets, 2) per level from level 1 on
+        - factor: samples of a bucket of level 1, and buckets of a level per bucket of the next
+
+    - **example usage**::
+
+        >>> pyramid = Pyramid.build(sample.segment('pause').force)
+        >>> index, low, high = pyramid.view(10**5, 9 * 10**5, points=1000)
+        >>> plt.fill_between(index, low, high)
+    """
+
+    def __init__(self, data, levels, factor=4):
+        self.data = data
+        self.levels = levels
+        self.factor = factor
+
+    def __len__(self):
+        return len(self.data)
+
+    @classmethod
+    def build(cls, data, factor=4):
+        """
+        Build the pyramid of a channel, in a single pass over the data.
+
+        :param data: full-resolution data of the channel
+        :type data: numpy.ndarray
+        :param factor: samples per bucket of level 1, and buckets per bucket of the next level
+        :type factor: int
+        :return: pyramid
+        :rtype: Pyramid
+        """
+        if factor < 2:
+            raise ValueError("factor has to be at least 2")
+        data = np.asarray(data)
+        if data.ndim != 1:
+            raise ValueError("pyramids are built of 1-D channels")
+        levels = []
+        low = high = data
+        while len(low) > 1:
+            low, high = _reduce(low, high, factor)
+            levels.append(np.column_stack([low, high]))
+        return cls(data, levels, factor)
+
+    def save(self, path):
+        """
+        Write all levels into a single ``.npy`` file, the full-resolution data is not included.
+
+        :param path: path of the file
+        :type path: str
+        """
+        np.save(path, np.concatenate(self.levels) if self.levels else np.empty((0, 2), dtype=self.data.dtype))
+
+    @classmethod
+    def open(cls, path, data, factor=4):
+        """
+        Open a pyramid written by :meth:`save`, memory-mapped.
+
+        :param path: path of the file
+        :type path: str
+        :param data: full-resolution data the pyramid was built of, e.g. memory-mapped as well
+        :type data: numpy.ndarray
+        :param factor: factor the pyramid was built with
+        :type factor: int
+        :return: pyramid
+        :rtype: Pyramid
+        """
+        packed = np.load(path, mmap_mode='r')
+        lengths = _level_lengths(len(data), factor)
+        if packed.shape != (sum(lengths), 2):
+            raise ValueError("{} is no pyramid of {} samples with factor {}".format(path, len(data), factor))
+        offsets = np.cumsum([0] + lengths)
+        levels = [packed[first:last] for first, last in zip(offsets[:-1], offsets[1:])]
+        return cls(data, levels, factor)
+
+    def view(self, start=0, stop=None, points=1000):
+        """
+        Minimum and maximum of a sample range, in about ``points`` buckets, or all samples if there are not more.
+
+        :param start: first sample of the viewport
+        :type start: int
+        :param stop: end of the viewport, exclusive, the end of the data if not given
+        :type stop: int
+        :param points: buckets in the viewport, e.g. its width in pixels
+        :type points: int
+        :return: first sample of every bucket, and minimum and maximum of every bucket
+        :rtype: tuple
+        """
+        if points < 1:
+            raise ValueError("at least one point is required")
+        samples = len(self.data)
+        stop = samples if stop is None else min(stop, samples)
+        start = min(max(start, 0), stop)
+
+        # coarsest level with at least as many buckets in view as points, level 0 being the data
+        level, size = 0, 1
+        while level < len(self.levels) and (stop - start) // (size * self.factor) >= points:
+            level += 1
+            size *= self.factor
+
+        first, last = start // size, -(-stop // size)
+        group = max(-(-(last - first) // points), 1)
+        first -= first % group
+        if level:
+            buckets = self.levels[level - 1][first:last]
+            low, high = buckets[:, 0], buckets[:, 1]
+        else:
+            low = high = self.data[first:last]
+        if group > 1:
+            low, high = _reduce(low, high, group)
+        index = (first + np.arange(len(low)) * group) * size
+        return index, np.asarray(low), np.asarray(high)
+
+
+class PyramidCache(CurveCache):
+    """
+    :class:`~JPKay.data_io.cache.CurveCache` that also builds and persists the :class:`Pyramid` of every channel and
+    segment when a force file is first loaded. Pyramids are memory-mapped from the cache, along with the channels,
+    so that browsing long pause or contact segments reads only the levels and the few full-resolution samples in
+    view.
+
+    - **Methods**
+
+    - pyramid: pyramid of a channel of a segment, loading the force file into the cache on a miss
+
+    - **example usage**::
+
+        >>> cache = PyramidCache("path/to/cache")
+        >>> path = r"path/to/jpk-force-file"
+        >>> pyramid = cache.pyramid(path, 'pause', 'force')  # built and stored on first load
+        >>> rate = segment_sampling_rate(cache.load(path).properties, 'pause')
+        >>> index, low, high = pyramid.view(int(10 * rate), int(20 * rate), points=800)  # from 10 to 20 s
+    """
+
+    def __init__(self, directory, max_bytes=None, content_hash=False, factor=4):
+        super().__init__(directory, max_bytes=max_bytes, content_hash=content_hash)
+        if factor < 2:
+            raise ValueError("factor has to be at least 2")
+        self.factor = factor
+
+    def _pyramid_file(self, directory, segment, channel):
+        return os.path.join(directory, "{}.{}.pyramid{}.npy".format(segment, channel, self.factor))
+
+    def _write_entry(self, directory, sample):
+        super()._write_entry(directory, sample)
+        for segment in sample.properties.segments:
+            for channel in sample.channels:
+                data = np.load(os.path.join(directory, "{}.{}.npy".format(segment, channel)), mmap_mode='r')
+                Pyramid.build(data, self.factor).save(self._pyramid_file(directory, segment, channel))
+
+    def pyramid(self, path, segment, channel='force'):
+        """
+        Pyramid of a channel of a segment, memory-mapped from the cache.
+
+        :param path: path of the force file
+        :type path: str
+        :param segment: segment name
+        :type segment: str
+        :param channel: either force or height
+        :type channel: str
+        :return: pyramid
+        :rtype: Pyramid
+        """
+        entry = self.entry_directory(path)
+        column = os.path.join(entry, "{}.{}.npy".format(segment, channel))
+        if not os.path.isfile(column):
+            self.load(path)
+            if not os.path.isfile(column):
+                raise ValueError("no channel {} in segment {} of {}".format(channel, segment, path))
+        data = np.load(column, mmap_mode='r')
+
+        pyramid_path = self._pyramid_file(entry, segment, channel)
+        if not os.path.isfile(pyramid_path):
+            # entries written by a plain CurveCache, or with another factor, get their pyramid now
+            descriptor, staging = tempfile.mkstemp(suffix='.npy', dir=entry)
+            os.close(descriptor)
+            Pyramid.build(data, self.factor).save(staging)
+            os.replace(staging, pyramid_path)
+
+        # mark entry as recently used
+        os.utime(os.path.join(entry, self.properties_file))
+        return Pyramid.open(pyramid_path, data, self.factor)
@@ -0,0 +1,268 @@
+# coding=utf-8
+
+import json
+import os
+import threading
+import time
+import tracemalloc
+from functools import wraps
+
+import pandas as pd
+
+
+# collectors currently recording, the hooks do nothing but check this list while it is empty
+_collectors = []
+_lock = threading.Lock()
+
+# stages open in each thread, innermost last
+_local = threading.local()
+
+
+class StageRecord:
+    """
+    Timing and counters of one run of a stage, see :class:`Profile`.
+
+    - **attributes**
+
+        - name: stage name, e.g. archive.read
+        - start: start time in seconds, from :func:`time.perf_counter`
+        - duration: wall time in seconds
+        - children: wall time of nested stages in seconds
+        - thread: identifier of the thread the stage ran in
+        - depth: number of enclosing stages
+        - bytes_read: bytes read from the archive file
+        - bytes_decompressed: bytes decompressed from the archive file
+        - allocated: net bytes allocated, only if traced
+    """
+
+    __slots__ = ('name', 'start', 'duration', 'children', 'thread', 'depth', 'bytes_read', 'bytes_decompressed',
+                 'allocated', '_memory')
+
+    def __init__(self, name, depth):
+        self.name = name
+        self.depth = depth
+        self.thread = threading.get_ident()
+        self.duration = 0.0
+        self.children = 0.0
+        self.bytes_read = 0
+        self.bytes_decompressed = 0
+        self.allocated = 0
+        self._memory = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+        self.start = time.perf_counter()
+
+    def __repr__(self):
+        return "StageRecord({!r}, {:.3e} s)".format(self.name, self.duration)
+
+
+class _Stage:
+    """Context manager recording one run of a stage for all active collectors"""
+
+    __slots__ = ('name', 'record')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        stack = getattr(_local, 'stack', None)
+        if stack is None:
+            stack = _local.stack = []
+        self.record = StageRecord(self.name, len(stack))
+        stack.append(self.record)
+        return self.record
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        record = self.record
+        record.duration = time.perf_counter() - record.start
+        if record._memory is not None and tracemalloc.is_tracing():
+            record.allocated = tracemalloc.get_traced_memory()[0] - record._memory
+
+        stack = _local.stack
+        stack.pop()
+        if stack:
+            stack[-1].children += record.duration
+        for collector in list(_collectors):
+            collector.add(record)
+
+
+class _NullStage:
+    """Context manager doing nothing, used while no collector is active"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return None
+
+
+_NULL_STAGE = _NullStage()
+
+
+def recording():
+    """True if any :class:`Profile` is active"""
+    return bool(_collectors)
+
+
+def stage(name):
+    """
+    Context manager recording a stage of the load pipeline in all active :class:`Profile` collectors, a shared
+    no-op if there are none.
+
+    :param name: stage name
+    :type name: str
+    :return: context manager
+    """
+    if not _collectors:
+        return _NULL_STAGE
+    return _Stage(name)
+
+
+def profiled(name):
+    """
+    Decorator recording every call of a function as stage ``name``, see :func:`stage`.
+
+    :param name: stage name
+    :type name: str
+    :return: decorator
+    """
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _collectors:
+                return function(*args, **kwargs)
+            with _Stage(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count(bytes_read=0, bytes_decompressed=0):
+    """
+    Add byte counts to the innermost stage open in the current thread.
+
+    :param bytes_read: bytes read from the archive file
+    :type bytes_read: int
+    :param bytes_decompressed: bytes decompressed from the archive file
+    :type bytes_decompressed: int
+    """
+    stack = getattr(_local, 'stack', None)
+    if _collectors and stack:
+        stack[-1].bytes_read += bytes_read
+        stack[-1].bytes_decompressed += bytes_decompressed
+
+
+class Profile:
+    """
+    Collector of per-stage timings of the load pipeline.
+
+    While the collector is active, :class:`~JPKay.core.data_structures.ForceArchive`,
+    :class:`~JPKay.core.data_structures.Properties` and :class:`~JPKay.core.data_structures.CellHesion` record wall
+    time, bytes read and bytes decompressed of their stages, from all threads of the process. Stages nest, e.g.
+    properties.parse within properties; the exclusive time of a stage excludes nested stages. Without an active
+    collector, the hooks cost a check of an empty list.
+
+    Stages are archive.open, archive.read, properties, properties.parse, decode, convert, load_data and dataframe.
+    As channels are converted while the DataFrame is built, conversion in :func:`CellHesion.load_data` counts as
+    dataframe.
+
+    - **Methods**
+
+    - summary: per-stage totals as DataFrame
+    - to_chrome_trace: export all records in the Chrome trace event format
+
+    - **attributes**
+
+        - records: list of :class:`StageRecord` in order of completion
+        - allocations: trace net allocations of each stage with :mod:`tracemalloc`, which slows down everything
+        - callback: optional callable invoked with every :class:`StageRecord`
+
+    - **example usage**::
+
+        >>> with Profile() as profile:
+        ...     samples = [CellHesion(path) for path in paths]
+        >>> print(profile.summary())
+        >>> profile.to_chrome_trace("load.json")  # open in chrome://tracing or ui.perfetto.dev
+    """
+
+    def __init__(self, allocations=False, callback=None):
+        self.allocations = allocations
+        self.callback = callback
+        self.records = []
+        self._started_tracing = False
+
+    def __enter__(self):
+        if self.allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        with _lock:
+            _collectors.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        with _lock:
+            _collectors.remove(self)
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def add(self, record):
+        """
+        Add the record of a finished stage.
+
+        :param record: finished stage
+        :type record: StageRecord
+        """
+        self.records.append(record)
+        if self.callback is not None:
+            self.callback(record)
+
+    def summary(self):
+        """
+        Per-stage totals, the stages taking the most time by themselves first.
+
+        :return: calls, total, exclusive (without nested stages), mean and max time in seconds, bytes read, bytes
+            decompressed and net bytes allocated of every stage
+        :rtype: pandas.DataFrame
+        """
+        frame = pd.DataFrame({
+            'stage': [record.name for record in self.records],
+            'duration': [record.duration for record in self.records],
+            'exclusive': [record.duration - record.children for record in self.records],
+            'bytes_read': [record.bytes_read for record in self.records],
+            'bytes_decompressed': [record.bytes_decompressed for record in self.records],
+            'allocated': [record.allocated for record in self.records],
+        })
+        summary = frame.groupby('stage').agg(
+            calls=('duration', 'size'), total=('duration', 'sum'), exclusive=('exclusive', 'sum'),
+            mean=('duration', 'mean'),
+            max=('duration', 'max'), bytes_read=('bytes_read', 'sum'),
+            bytes_decompressed=('bytes_decompressed', 'sum'), allocated=('allocated', 'sum'))
+        return summary.sort_values('exclusive', ascending=False)
+
+    def to_chrome_trace(self, path=None):
+        """
+        Export all records as complete events of the Chrome trace event format.
+
+        :param path: optional path of a JSON file to write
+        :type path: str
+        :return: trace
+        :rtype: dict
+        """
+        pid = os.getpid()
+        events = [{
+            'name': record.name,
+            'cat': record.name.split('.', 1)[0],
+            'ph': 'X',
+            'ts': record.start * 1e6,
+            'dur': record.duration * 1e6,
+            'pid': pid,
+            'tid': record.thread,
+            'args': {'bytes_read': record.bytes_read, 'bytes_decompressed': record.bytes_decompressed,
+                     'allocated': record.allocated},
+        } for record in self.records]
+        trace = {'traceEvents': sorted(events, key=lambda event: event['ts']), 'displayTimeUnit': 'ms'}
+        if path is not None:
+            with open(path, 'w') as outfile:
+                json.dump(trace, outfile)
+        return trace
@@ -0,0 +1,50 @@
+# coding=utf-8
+"""
+Benchmark of the batch adhesion analysis in :func:`JPKay.analysis.adhesion.analyze_adhesion` against analyzing one
+curve at a time.
+
+Run from the repository root::
+
+    PYTHONPATH=. python benchmarks/bench_adhesion.py
+"""
+
+import time
+
+import numpy as np
+
+from JPKay.analysis.adhesion import analyze_adhesion
+
+
+def synthetic_batch(curves, samples, seed=0):
+    """Retract curves with a pushing part, an adhesion well of random depth and noise on a tilted baseline"""
+    random = np.random.RandomState(seed)
+    height = np.tile(np.linspace(0, 10e-6, samples), (curves, 1))
+    force = np.where(height < 1e-6, 1e-9 * (1e-6 - height) / 1e-6, 0.0)
+    well = (height >= 1e-6) & (height < 4e-6)
+    depth = random.uniform(1e-10, 1e-9, (curves, 1))
+    force[well] = -(depth * np.interp(height, [1e-6, 2e-6, 4e-6], [0, 1, 0]))[well]
+    force += random.normal(0, 1e-12, force.shape) + 1e-6 * height
+    return force, height
+
+
+def main():
+    print("{:>8} {:>8} {:>14} {:>14} {:>10}".format("curves", "samples", "batch [s]", "per curve [s]", "speedup"))
+    for curves, samples in ((10 ** 3, 2000), (10 ** 4, 2000), (10 ** 4, 5000)):
+        force, height = synthetic_batch(curves, samples)
+
+        start = time.perf_counter()
+        analyze_adhesion(force, height)
+        batch = time.perf_counter() - start
+
+        # a per-curve loop over a tenth of the curves, extrapolated
+        subset = max(curves // 10, 1)
+        start = time.perf_counter()
+        for row in range(subset):
+            analyze_adhesion(force[row], height[row])
+        single = (time.perf_counter() - start) * curves / subset
+
+        print("{:>8} {:>8} {:>14.3f} {:>14.3f} {:>10.1f}".format(curves, samples, batch, single, single / batch))
+
+
+if __name__ == '__main__':
+    main()
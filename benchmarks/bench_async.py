@@ -0,0 +1,57 @@
+# coding=utf-8
+"""
+Benchmark of loading force files from high-latency storage with :mod:`JPKay.data_io.aio` against a sequential loop.
+Latency is simulated by a reader sleeping before every read, like a network file system with tens of milliseconds
+per request.
+
+Run from the repository root::
+
+    PYTHONPATH=. python benchmarks/bench_async.py
+"""
+
+import asyncio
+import os
+import tempfile
+import time
+
+from JPKay.core.data_structures import CellHesion, ForceArchive
+from JPKay.data_io.aio import load_many_async, read_file
+
+from synthetic import write_force_file
+
+
+class SlowReader:
+    """Reader adding ``latency`` seconds to every read"""
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def __call__(self, path):
+        time.sleep(self.latency)
+        return read_file(path)
+
+
+def main():
+    files, latency = 64, 0.03
+    reader = SlowReader(latency)
+    with tempfile.TemporaryDirectory() as directory:
+        paths = [write_force_file(os.path.join(directory, "{}.jpk-force".format(index)), samples=10 ** 4, seed=index)
+                 for index in range(files)]
+
+        start = time.perf_counter()
+        for path in paths:
+            CellHesion(archive=ForceArchive(path, content=reader(path)))
+        sequential = time.perf_counter() - start
+        print("{} files, {:.0f} ms latency per read".format(files, latency * 1000))
+        print("{:>12} {:>10} {:>10}".format("concurrency", "time [s]", "speedup"))
+        print("{:>12} {:>10.3f} {:>10}".format("sequential", sequential, 1))
+
+        for concurrency in (1, 4, 16, 64):
+            start = time.perf_counter()
+            asyncio.run(load_many_async(paths, concurrency=concurrency, reader=reader))
+            elapsed = time.perf_counter() - start
+            print("{:>12} {:>10.3f} {:>10.1f}".format(concurrency, elapsed, sequential / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+# coding=utf-8
+"""
+Benchmark of recalibrating 10^4 loaded curves with :func:`JPKay.core.calibration.recalibrate_samples`, against
+loading them again with the new calibration.
+
+Run from the repository root::
+
+    PYTHONPATH=. python benchmarks/bench_calibration.py
+"""
+
+import os
+import time
+import warnings
+
+import numpy as np
+
+from JPKay.analysis.adhesion import stack_segment
+from JPKay.core.calibration import recalibrate_samples, rescale_curves
+from JPKay.core.data_structures import CellHesion, Properties
+
+SAMPLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "tests", "data", "sample.jpk-force")
+
+
+def main():
+    # the time zone of the JPK headers is not known to dateutil, which warns on every file
+    warnings.filterwarnings('ignore', message='tzname')
+
+    curves = 10 ** 4
+    template = CellHesion(SAMPLE)
+    exported = template.properties.to_dict()
+    channels = {('retract', channel): template.load_channel('retract', channel) for channel in template.channels}
+
+    # loaded samples with the data of the sample file, each with properties of its own
+    samples = []
+    for _ in range(curves):
+        props = Properties.from_dict(dict(exported, general=dict(exported['general'])))
+        sample = CellHesion.from_channels(props, {key: data.copy() for key, data in channels.items()})
+        sample.data  # built from the channels
+        samples.append(sample)
+    force, _, _ = stack_segment(samples, 'retract')
+
+    spring_constants = np.random.RandomState(0).uniform(0.01, 0.03, curves)
+    start = time.perf_counter()
+    updates = recalibrate_samples(samples, spring_constant=spring_constants)
+    rescale_curves(force, *updates['force'])
+    elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(100):
+        reloaded = CellHesion(SAMPLE)
+        reloaded.recalibrate(spring_constant=0.02)
+    reload = (time.perf_counter() - start) * curves / 100
+
+    print("{} curves of {} samples".format(curves, len(channels[('retract', 'force')])))
+    print("{:<40} {:>8.3f} s".format("recalibrate samples and stacked block", elapsed))
+    print("{:<40} {:>8.3f} s (extrapolated)".format("load again", reload))
+
+
+if __name__ == '__main__':
+    main()
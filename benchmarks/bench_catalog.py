@@ -0,0 +1,49 @@
+# coding=utf-8
+"""
+Benchmark of cataloging force files with :func:`JPKay.data_io.catalog.scan_metadata` against loading every file
+with :class:`JPKay.core.data_structures.CellHesion`.
+
+Run from the repository root::
+
+    PYTHONPATH=. python benchmarks/bench_catalog.py
+"""
+
+import os
+import tempfile
+import time
+import warnings
+
+from JPKay.core.data_structures import CellHesion
+from JPKay.data_io.catalog import scan_metadata
+
+from synthetic import write_force_file
+
+
+def main():
+    # the time zone of the JPK headers is not known to dateutil, which warns on every file
+    warnings.filterwarnings('ignore', message='tzname')
+
+    print("{:>8} {:>8} {:>14} {:>14} {:>14}".format("files", "samples", "load [s]", "scan [s]", "files / s"))
+    with tempfile.TemporaryDirectory() as directory:
+        for files, samples in ((200, 10 ** 3), (200, 10 ** 5)):
+            paths = [write_force_file(os.path.join(directory, "{}-{}.jpk-force".format(samples, index)),
+                                      samples=samples, seed=index) for index in range(files)]
+
+            # a full load of a subset, extrapolated
+            subset = paths[:20]
+            start = time.perf_counter()
+            for path in subset:
+                CellHesion(path)
+            load = (time.perf_counter() - start) * files / len(subset)
+
+            start = time.perf_counter()
+            scan_metadata(paths, workers=1, executor='thread')
+            scan = time.perf_counter() - start
+            print("{:>8} {:>8} {:>14.3f} {:>14.3f} {:>14.0f}".format(files, samples, load, scan, files / scan))
+
+            for path in paths:
+                os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+# coding=utf-8
+"""
+Benchmark of the DataFrame assembly in :meth:`JPKay.core.data_structures.CellHesion.load_data` against the former
+per-column ``df.loc`` assignment, in time and peak memory.
+
+Run from the repository root::
+
+    PYTHONPATH=. python benchmarks/bench_dataframe.py
+"""
+
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from JPKay.core.data_structures import CellHesion
+
+
+def assemble_legacy(channels):
+    """The DataFrame assembly :meth:`JPKay.core.data_structures.CellHesion.load_data` used before"""
+    df = CellHesion.construct_df()
+    for (segment, channel), data in channels.items():
+        df.loc[:, (segment, channel)] = pd.Series(data.squeeze())
+    return df
+
+
+def measure(function, *args, **kwargs):
+    """Wall time and peak traced memory of a single call"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    function(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    print("{:>10} {:>14} {:>14} {:>14} {:>12} {:>12} {:>12}".format(
+        "samples", "legacy [s]", "wide [s]", "long [s]", "legacy [MB]", "wide [MB]", "long [MB]"))
+    for samples in (10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6):
+        channels = {(segment, channel): np.random.rand(samples)
+                    for segment in ('approach', 'contact', 'retract', 'pause') for channel in ('force', 'height')}
+
+        legacy = measure(assemble_legacy, channels)
+        wide = measure(CellHesion.assemble_df, channels)
+        long = measure(CellHesion.assemble_df, channels, layout='long')
+
+        print("{:>10} {:>14.3e} {:>14.3e} {:>14.3e} {:>12.1f} {:>12.1f} {:>12.1f}".format(
+            samples, legacy[0], wide[0], long[0], legacy[1] / 2 ** 20, wide[1] / 2 ** 20, long[1] / 2 ** 20))
+
+
+if __name__ == '__main__':
+    main()
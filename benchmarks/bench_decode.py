@@ -0,0 +1,40 @@
+# coding=utf-8
+"""
+Benchmark of the channel decoding against the former per-sample ``struct.unpack`` loop.
+
+Run from the repository root::
+
+    PYTHONPATH=. python benchmarks/bench_decode.py
+"""
+
+import timeit
+from struct import unpack
+
+import numpy as np
+
+from JPKay.core.encoding import decode
+
+
+def decode_loop(data):
+    """The decoding loop :meth:`JPKay.core.data_structures.ForceArchive.read_data` used before"""
+    result = []
+    for i in range(int(len(data) / 4)):
+        result.append(unpack('!i', data[i * 4:(i + 1) * 4]))
+    return np.array(result)
+
+
+def main():
+    print("{:>10} {:>12} {:>12} {:>12} {:>10}".format("samples", "loop [s]", "view [s]", "float64 [s]", "speedup"))
+    for samples in (10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6):
+        data = np.random.randint(-2 ** 31, 2 ** 31 - 1, samples, dtype=np.int32).astype('>i4').tobytes()
+        repeat = max(1, 10 ** 5 // samples)
+
+        loop = timeit.timeit(lambda: decode_loop(data), number=repeat) / repeat
+        view = timeit.timeit(lambda: decode(data), number=repeat * 10) / (repeat * 10)
+        cast = timeit.timeit(lambda: decode(data, dtype=np.float64), number=repeat * 10) / (repeat * 10)
+
+        print("{:>10} {:>12.3e} {:>12.3e} {:>12.3e} {:>10.0f}".format(samples, loop, view, cast, loop / cast))
+
+
+if __name__ == '__main__':
+    main()
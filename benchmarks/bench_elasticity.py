@@ -0,0 +1,61 @@
+# coding=utf-8
+"""
+Benchmark of the bulk elasticity fit in :func:`JPKay.analysis.elasticity.fit_elasticity` against fitting one curve
+at a time, and of warm starts on a force map.
+
+Run from the repository root::
+
+    PYTHONPATH=. python benchmarks/bench_elasticity.py
+"""
+
+import time
+
+import numpy as np
+
+from JPKay.analysis.elasticity import contact_factor, fit_elasticity
+
+
+def synthetic_batch(curves, samples, seed=0):
+    """Hertz approach curves of a 5 µm sphere with random moduli and contact points"""
+    random = np.random.RandomState(seed)
+    position = np.tile(np.linspace(0, 4e-6, samples), (curves, 1))
+    moduli = random.uniform(500, 5000, (curves, 1))
+    contact = random.uniform(2e-6, 3e-6, (curves, 1))
+    force = contact_factor('hertz', radius=5e-6) * moduli * np.maximum(position - contact, 0) ** 1.5
+    return force + random.normal(0, 1e-12, force.shape), position
+
+
+def main():
+    print("{:>8} {:>8} {:>10} {:>12} {:>16} {:>10}".format(
+        "curves", "samples", "workers", "bulk [s]", "per curve [s]", "speedup"))
+    for curves, samples, workers in ((10 ** 3, 500, None), (10 ** 4, 500, None), (10 ** 4, 500, 4)):
+        force, position = synthetic_batch(curves, samples)
+
+        start = time.perf_counter()
+        fit_elasticity(force, position, radius=5e-6, workers=workers)
+        bulk = time.perf_counter() - start
+
+        # one call per curve on a tenth of the curves, extrapolated
+        subset = curves // 10
+        start = time.perf_counter()
+        for row in range(subset):
+            fit_elasticity(force[row], position[row], radius=5e-6)
+        single = (time.perf_counter() - start) * curves / subset
+
+        print("{:>8} {:>8} {:>10} {:>12.3f} {:>16.3f} {:>10.1f}".format(
+            curves, samples, workers or 1, bulk, single, single / bulk))
+
+    # force map of 100 x 100 pixels refitted from its previous results, e.g. after a recalibration
+    force, position = synthetic_batch(10 ** 4, 500)
+    start = time.perf_counter()
+    first = fit_elasticity(force, position, radius=5e-6, shape=(100, 100))
+    cold = time.perf_counter() - start
+    start = time.perf_counter()
+    refit = fit_elasticity(force, position, radius=5e-6, shape=(100, 100), initial=first)
+    warm = time.perf_counter() - start
+    print("100 x 100 map: {:.3f} s and {:.1f} iterations per curve from closed-form guesses, {:.3f} s and {:.1f} "
+          "iterations from previous results".format(cold, first['iterations'].mean(), warm, refit['iterations'].mean()))
+
+
+if __name__ == '__main__':
+    main()
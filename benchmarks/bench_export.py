@@ -0,0 +1,64 @@
+# coding=utf-8
+"""
+Benchmark of :func:`JPKay.data_io.export.export_experiment`: size of the HDF5 and Zarr stores against the force
+files, and reading the retract force of many curves from a store against loading them from the force files.
+
+Run from the repository root::
+
+    PYTHONPATH=. python benchmarks/bench_export.py
+"""
+
+import os
+import tempfile
+import time
+import warnings
+
+from JPKay.core.data_structures import CellHesion
+from JPKay.data_io.export import ExperimentStore, export_experiment, h5py, zarr
+
+from synthetic import write_force_file
+
+
+def size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(directory, name))
+               for directory, _, names in os.walk(path) for name in names)
+
+
+def main():
+    # the time zone of the JPK headers is not known to dateutil, which warns on every file
+    warnings.filterwarnings('ignore', message='tzname')
+
+    files, samples = 500, 10 ** 4
+    with tempfile.TemporaryDirectory() as directory:
+        paths = [write_force_file(os.path.join(directory, "{}.jpk-force".format(index)), samples=samples, seed=index)
+                 for index in range(files)]
+        original = sum(size(path) for path in paths)
+
+        start = time.perf_counter()
+        for path in paths:
+            CellHesion(path, lazy=True).segment('retract').force
+        from_files = time.perf_counter() - start
+
+        print("{} files, {} samples per segment".format(files, samples))
+        print("{:<12} {:>10} {:>12} {:>12}".format("source", "size [MB]", "export [s]", "read [s]"))
+        print("{:<12} {:>10.1f} {:>12} {:>12.3f}".format("force files", original / 2 ** 20, '', from_files))
+        for name, extension, available in (('hdf5', 'h5', h5py), ('zarr', 'zarr', zarr)):
+            if available is None:
+                print("{:<12} not installed".format(name))
+                continue
+            store = os.path.join(directory, "experiment." + extension)
+            start = time.perf_counter()
+            export_experiment(paths, store)
+            export = time.perf_counter() - start
+
+            start = time.perf_counter()
+            with ExperimentStore(store) as opened:
+                opened.load('retract', 'force')
+            read = time.perf_counter() - start
+            print("{:<12} {:>10.1f} {:>12.3f} {:>12.3f}".format(name, size(store) / 2 ** 20, export, read))
+
+
+if __name__ == '__main__':
+    main()
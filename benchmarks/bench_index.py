@@ -0,0 +1,57 @@
+# coding=utf-8
+"""
+Benchmark of :class:`JPKay.data_io.index.MetadataIndex`: building the index, updating it when nothing changed, and
+filtered queries, against rescanning the headers of all files.
+
+Run from the repository root::
+
+    PYTHONPATH=. python benchmarks/bench_index.py
+"""
+
+import os
+import tempfile
+import time
+import warnings
+
+from JPKay.data_io.catalog import scan_metadata
+from JPKay.data_io.index import MetadataIndex
+
+from synthetic import write_force_file
+
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    # the time zone of the JPK headers is not known to dateutil, which warns on every file
+    warnings.filterwarnings('ignore', message='tzname')
+
+    files = 1000
+    with tempfile.TemporaryDirectory() as directory:
+        experiment = os.path.join(directory, "experiment")
+        os.makedirs(experiment)
+        for index in range(files):
+            write_force_file(os.path.join(experiment, "{:05d}.jpk-force".format(index)), samples=100, seed=index)
+
+        _, rescan = timed(scan_metadata, [os.path.join(experiment, name) for name in os.listdir(experiment)],
+                          workers=1, executor='thread')
+        with MetadataIndex(os.path.join(directory, "index.sqlite")) as index:
+            _, build = timed(index.update, experiment, workers=1)
+            _, refresh = timed(index.update, experiment, workers=1)
+            paths, query = timed(index.query, segment='retract', duration=(0, 1), relative_setpoint=(0.4, 0.5))
+            _, by_key = timed(index.query, properties={'force-scan-series.header.force-settings.type':
+                                                       'relative-force-settings'})
+
+    print("{} files".format(files))
+    print("{:<28} {:>10.3f} s".format("header rescan", rescan))
+    print("{:<28} {:>10.3f} s".format("index build", build))
+    print("{:<28} {:>10.3f} s".format("index update, unchanged", refresh))
+    print("{:<28} {:>10.3f} ms ({} files)".format("query by columns", query * 1000, len(paths)))
+    print("{:<28} {:>10.3f} ms".format("query by property key", by_key * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+# coding=utf-8
+"""
+Benchmark of overlaying 10^4 curves with :class:`JPKay.plot.overlay.CurveOverlay`: decimation of the whole view, of
+zoomed and panned views and of cached views, and rendering with matplotlib against one full-resolution line per
+curve. Rendering is skipped if matplotlib is not installed.
+
+Run from the repository root::
+
+    PYTHONPATH=. python benchmarks/bench_plot.py
+"""
+
+import time
+
+import numpy as np
+
+from JPKay.plot.decimation import DecimationCache
+
+try:
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+except ImportError:
+    plt = None
+
+
+def synthetic_curves(curves, samples, seed=0):
+    """Random walks over a common height axis, in µm and pN"""
+    random = np.random.RandomState(seed)
+    height = np.tile(np.linspace(0, 10, samples), (curves, 1))
+    force = random.normal(0, 1, (curves, samples)).cumsum(axis=1)
+    return height, force
+
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    function(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def main():
+    curves, samples, points = 10 ** 4, 8000, 1000
+    height, force = synthetic_curves(curves, samples)
+    print("{} curves of {} samples, decimated to {} points per view".format(curves, samples, points))
+
+    for method in ('minmax', 'lttb'):
+        cache = DecimationCache(height, force, method=method)
+        views = [("whole view", None), ("zoom", (4, 5)), ("pan", (4.5, 5.5)), ("zoom out", None)]
+        for name, view in views:
+            elapsed = timed(cache.get, view, points=points)
+            print("{:<7} {:<10} {:>8.3f} s".format(method, name, elapsed))
+
+    if plt is None:
+        print("matplotlib is not installed, rendering skipped")
+        return
+
+    from JPKay.plot.overlay import plot_curves
+    figure, ax = plt.subplots()
+    start = time.perf_counter()
+    overlay = plot_curves(height, force, ax, colors='k', alpha=0.02, linewidths=0.5)
+    figure.canvas.draw()
+    print("{:<18} {:>8.3f} s ({} samples per curve)".format(
+        "overlay", time.perf_counter() - start, len(overlay.collection.get_segments()[0])))
+    ax.set_xlim(4, 5)
+    print("{:<18} {:>8.3f} s".format("overlay zoomed", timed(figure.canvas.draw)))
+    plt.close(figure)
+
+    # one full-resolution line per curve for a hundredth of the curves, extrapolated
+    subset = curves // 100
+    figure, ax = plt.subplots()
+    start = time.perf_counter()
+    for row in range(subset):
+        ax.plot(height[row], force[row], color='k', alpha=0.02, linewidth=0.5)
+    figure.canvas.draw()
+    print("{:<18} {:>8.3f} s (extrapolated)".format("line per curve", (time.perf_counter() - start) * 100))
+    plt.close(figure)
+
+
+if __name__ == '__main__':
+    main()
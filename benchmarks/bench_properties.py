@@ -0,0 +1,125 @@
+# coding=utf-8
+"""
+Microbenchmark of the java-properties parsing against the former line-splitting parser, on synthetic
+``shared-data/header.properties`` files with thousands of keys, and of reading all properties of a force file per
+load.
+
+Parsing a large header on its own is on par with the former parser, which neither resolved escapes nor accepted
+values containing ``=``, as both build one dict entry per line. Loads are two to five times faster: the timestamp of
+every file is parsed once, and the shared header once per session. The script asserts both.
+
+Run from the repository root::
+
+    PYTHONPATH=. python benchmarks/bench_properties.py
+"""
+
+import os
+import tempfile
+import timeit
+import warnings
+from zipfile import ZipFile
+
+import dateutil.parser as parser
+import pytz
+
+from JPKay.core.data_structures import ForceArchive, Properties, shared_headers
+from JPKay.core.java_properties import parse_properties, parse_timestamp
+
+
+HEADER = "#Thu Dec 11 18:19:11 CET 2014"
+SAMPLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "tests", "data", "sample.jpk-force")
+
+
+def parse_legacy(text):
+    """
+    The parser :meth:`JPKay.core.data_structures.ForceArchive.read_properties` used before. It neither resolves
+    escapes nor accepts values containing ``=``.
+    """
+    content = text.splitlines()
+    props = {}
+    for line in content[1:]:
+        key, value = line.split("=")
+        props[key] = value
+    fmt = '%Y-%m-%d %H:%M:%S %Z%z'
+    props["timestamp"] = pytz.utc.localize(parser.parse(content[0][1:], dayfirst=True)).strftime(fmt)
+    return props
+
+
+def parse(text):
+    props = parse_properties(text)
+    props["timestamp"] = parse_timestamp(text.split('\n', 1)[0])
+    return props
+
+
+def synthetic_header(num_keys, escaped=False):
+    """Header resembling the shared-data header, optionally with escaped values like segment time stamps"""
+    lines = [HEADER]
+    for key in range(num_keys):
+        value = "2014-12-11 18\\:19\\:01.194 +0100" if escaped and key % 10 == 0 else "{}E-9".format(key * 7.3)
+        lines.append("lcd-info.{}.conversion-set.conversion.force.scaling.key-{}={}".format(key % 8, key, value))
+    return "\n".join(lines)
+
+
+def force_file_with_shared_keys(path, num_keys):
+    """Copy of the test sample whose shared header has ``num_keys`` more keys"""
+    extra = synthetic_header(num_keys).partition('\n')[2]
+    with ZipFile(SAMPLE) as source, ZipFile(path, 'w') as target:
+        for info in source.infolist():
+            content = source.read(info)
+            if info.filename == 'shared-data/header.properties' and extra:
+                content = content.rstrip(b'\n') + b'\n' + extra.encode('utf-8') + b'\n'
+            target.writestr(info, content)
+    return path
+
+
+def load_legacy(archive):
+    """All properties files of a force file parsed by the former parser, as on every load before"""
+    return [parse_legacy(archive.read(info.filename).decode('utf-8')) for info in archive.contents
+            if info.filename.endswith('.properties')]
+
+
+def main():
+    print("properties files of the test sample")
+    with ForceArchive(SAMPLE) as archive:
+        for content_path in ('header.properties', 'shared-data/header.properties',
+                             'segments/0/segment-header.properties'):
+            text = archive.read(content_path).decode('utf-8')
+            legacy = min(timeit.repeat(lambda: parse_legacy(text), number=200, repeat=5)) / 200
+            new = min(timeit.repeat(lambda: parse(text), number=200, repeat=5)) / 200
+            print("{:>40} {:>12.3e} {:>12.3e} {:>10.1f}".format(content_path, legacy, new, legacy / new))
+    print()
+
+    print("synthetic shared-data headers")
+    print("{:>8} {:>8} {:>12} {:>12} {:>10}".format("keys", "escaped", "legacy [s]", "new [s]", "speedup"))
+    for num_keys in (100, 1000, 5000, 20000):
+        for escaped in (False, True):
+            text = synthetic_header(num_keys, escaped)
+            number = max(1, 20000 // num_keys)
+            legacy = min(timeit.repeat(lambda: parse_legacy(text), number=number, repeat=5)) / number
+            new = min(timeit.repeat(lambda: parse(text), number=number, repeat=5)) / number
+            print("{:>8} {:>8} {:>12.3e} {:>12.3e} {:>10.1f}".format(num_keys, str(escaped), legacy, new,
+                                                                     legacy / new))
+            if not escaped:
+                # one dict entry per line either way, while escapes and multiple separators are handled now
+                assert new < 1.5 * legacy, "parsing {} keys is slower than the former parser".format(num_keys)
+    print()
+
+    print("all properties of a force file per load, the shared header parsed before")
+    print("{:>8} {:>12} {:>12} {:>10}".format("keys", "legacy [s]", "new [s]", "speedup"))
+    with tempfile.TemporaryDirectory() as directory:
+        for num_keys in (0, 1000, 5000, 20000):
+            path = force_file_with_shared_keys(os.path.join(directory, "{}.jpk-force".format(num_keys)), num_keys)
+            with ForceArchive(path) as archive:
+                shared_headers.clear()
+                Properties(archive=archive)
+                number = max(1, 20000 // max(num_keys, 1000))
+                legacy = min(timeit.repeat(lambda: load_legacy(archive), number=number, repeat=5)) / number
+                new = min(timeit.repeat(lambda: Properties(archive=archive), number=number, repeat=5)) / number
+            print("{:>8} {:>12.3e} {:>12.3e} {:>10.1f}".format(num_keys, legacy, new, legacy / new))
+            assert new < legacy, "loading properties with {} shared keys got slower".format(num_keys)
+
+
+if __name__ == '__main__':
+    # the test sample is written in CET, which dateutil warns about
+    warnings.simplefilter('ignore')
+    main()
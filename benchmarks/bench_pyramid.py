@@ -0,0 +1,65 @@
+# coding=utf-8
+"""
+Benchmark of browsing a force file with a segment of 10^7 samples through :class:`JPKay.ui.pyramid.PyramidCache`:
+first load including the pyramids, reopening from the cache, and viewports of any size against the min/max of the
+full-resolution samples in view.
+
+Run from the repository root::
+
+    PYTHONPATH=. python benchmarks/bench_pyramid.py
+"""
+
+import os
+import tempfile
+import time
+import warnings
+
+import numpy as np
+
+from JPKay.ui.pyramid import PyramidCache
+
+from synthetic import write_force_file
+
+
+def minmax_full(data, start, stop, points):
+    """Min/max of the full-resolution samples in view, bucketed as a viewer without pyramid would"""
+    view = np.asarray(data[start:stop])
+    width = -(-len(view) // points)
+    padded = np.pad(view, (0, width * points - len(view)), mode='edge').reshape(points, width)
+    return padded.min(axis=1), padded.max(axis=1)
+
+
+def main():
+    # the time zone of the JPK headers is not known to dateutil, which warns on every file
+    warnings.filterwarnings('ignore', message='tzname')
+
+    samples, points, repeats = 10 ** 7, 1000, 100
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "long.jpk-force")
+        write_force_file(path, samples=samples, segments=1, compression='stored')
+        cache = PyramidCache(os.path.join(directory, "cache"))
+
+        start = time.perf_counter()
+        pyramid = cache.pyramid(path, 'approach', 'force')
+        print("{} samples, viewport of {} points".format(samples, points))
+        print("{:<32} {:>10.3f} s".format("first load with pyramids", time.perf_counter() - start))
+        start = time.perf_counter()
+        pyramid = cache.pyramid(path, 'approach', 'force')
+        print("{:<32} {:>10.3f} ms".format("open from cache", (time.perf_counter() - start) * 1e3))
+
+        print("{:>12} {:>14} {:>14}".format("view", "pyramid [ms]", "full [ms]"))
+        for span in (10 ** 7, 10 ** 6, 10 ** 5, 10 ** 4):
+            offsets = np.random.RandomState(0).randint(0, samples - span + 1, repeats)
+            start = time.perf_counter()
+            for offset in offsets:
+                pyramid.view(offset, offset + span, points)
+            fast = (time.perf_counter() - start) / repeats
+            start = time.perf_counter()
+            for offset in offsets:
+                minmax_full(pyramid.data, offset, offset + span, points)
+            full = (time.perf_counter() - start) / repeats
+            print("{:>12} {:>14.3f} {:>14.3f}".format(span, fast * 1e3, full * 1e3))
+
+
+if __name__ == '__main__':
+    main()
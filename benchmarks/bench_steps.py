@@ -0,0 +1,57 @@
+# coding=utf-8
+"""
+Benchmark of the step detection in :func:`JPKay.analysis.steps.detect_steps` on curves of 10^6 samples, against
+window statistics computed from every window separately.
+
+Run from the repository root::
+
+    PYTHONPATH=. python benchmarks/bench_steps.py
+"""
+
+import time
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from JPKay.analysis.steps import detect_steps
+
+
+def synthetic_batch(curves, samples, seed=0):
+    """Loading ramps with a rupture every 10^5 samples and noise"""
+    random = np.random.RandomState(seed)
+    force = np.tile(np.arange(samples) * 1e-17, (curves, 1))
+    for position in range(10 ** 5, samples, 10 ** 5):
+        force[:, position:] += 1e-11
+    return force + random.normal(0, 1e-13, force.shape)
+
+
+def windowed_t_statistic(data, window):
+    """Two-sample t statistic from every pair of windows separately, the cost grows with the window"""
+    windows = sliding_window_view(data, window, axis=1)
+    mean = windows.mean(axis=2)
+    variance = windows.var(axis=2, ddof=1)
+    return (mean[:, window:] - mean[:, :-window]) / np.sqrt((variance[:, window:] + variance[:, :-window]) / window)
+
+
+def main():
+    samples = 10 ** 6
+    print("{:>8} {:>8} {:>8} {:>14} {:>16} {:>8}".format(
+        "curves", "samples", "window", "rolling [s]", "per window [s]", "steps"))
+    for curves, window in ((1, 50), (1, 500), (8, 50), (8, 500)):
+        force = synthetic_batch(curves, samples)
+
+        start = time.perf_counter()
+        steps = detect_steps(force, window=window)
+        rolling = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for row in range(curves):
+            windowed_t_statistic(force[row:row + 1], window)
+        windowed = time.perf_counter() - start
+
+        print("{:>8} {:>8} {:>8} {:>14.3f} {:>16.3f} {:>8}".format(
+            curves, samples, window, rolling, windowed, len(steps)))
+
+
+if __name__ == '__main__':
+    main()
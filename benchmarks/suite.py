@@ -0,0 +1,178 @@
+# coding=utf-8
+"""
+Benchmark suite of the loading pipeline, stage by stage, on synthetic force files (see :mod:`synthetic`).
+
+Each stage is timed on its own, with caches cleared before every run, and its peak memory is traced in a separate
+run. Results are saved as JSON and can be compared against an earlier run to catch regressions.
+
+Run from the repository root, with the checkout on the Python path like all scripts in this directory::
+
+    PYTHONPATH=. python benchmarks/suite.py --output before.json
+    PYTHONPATH=. python benchmarks/suite.py --samples 1000 100000 --compression stored deflated --compare before.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from JPKay.core.data_structures import CellHesion, ForceArchive, Properties, shared_headers
+from JPKay.core.java_properties import parse_timestamp
+
+from synthetic import write_force_file
+
+
+def cold(archive=None):
+    """Clear all caches, so that every run parses and decodes from scratch"""
+    shared_headers.clear()
+    parse_timestamp.cache_clear()
+    if archive is not None:
+        archive.clear_cache()
+
+
+def stages(path):
+    """
+    Stages of loading a force file as (name, setup, run). ``setup`` prepares everything a stage needs and is not
+    timed, ``run`` takes its result.
+    """
+    def archive():
+        result = ForceArchive(path)
+        cold(result)
+        return result
+
+    def encoded():
+        sample = CellHesion(archive=ForceArchive(path), lazy=True)
+        return sample, sample.load_encoded_channel('retract', 'vDeflection')
+
+    def sample():
+        result = CellHesion(archive=ForceArchive(path), lazy=True)
+        cold(result.archive)
+        return result
+
+    return [
+        ('ForceArchive.__init__', cold, lambda _: ForceArchive(path).close()),
+        ('ForceArchive.read_properties', archive,
+         lambda opened: opened.read_properties('shared-data/header.properties')),
+        # summed, so that members mapped from stored archives are paged in, not only viewed
+        ('ForceArchive.read_data', archive,
+         lambda opened: opened.read_data('segments/0/channels/vDeflection.dat').sum()),
+        ('Properties.__init__', archive, lambda opened: Properties(archive=opened)),
+        ('CellHesion.convert_data', encoded, lambda loaded: loaded[0].convert_data('vDeflection', loaded[1])),
+        ('CellHesion.load_data', sample, lambda loaded: loaded.load_data()),
+        ('CellHesion', cold, lambda _: CellHesion(path)),
+    ]
+
+
+def measure(setup, run, repeat, budget=0.2):
+    """
+    Median and best wall time over at least ``repeat`` runs, and peak traced memory of one more run. Fast stages
+    are repeated until they took ``budget`` seconds in total, which keeps their timings from being noise.
+    """
+    times = []
+    while len(times) < repeat or sum(times) < budget and len(times) < 1000:
+        prepared = setup()
+        start = time.perf_counter()
+        run(prepared)
+        times.append(time.perf_counter() - start)
+
+    prepared = setup()
+    tracemalloc.start()
+    run(prepared)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return float(np.median(times)), min(times), peak
+
+
+def run_suite(samples, segments, compressions, repeat, directory):
+    """Run all stages on a force file of every configuration"""
+    results = []
+    for compression in compressions:
+        for count in samples:
+            path = write_force_file(os.path.join(directory, "{}-{}.jpk-force".format(compression, count)),
+                                    samples=count, segments=segments, compression=compression)
+            for name, setup, run in stages(path):
+                median, best, peak = measure(setup, run, repeat)
+                results.append({'stage': name, 'samples': count, 'segments': segments, 'compression': compression,
+                                'median': median, 'min': best, 'peak_bytes': peak})
+                print("{:<30} {:>10} {:>9} {:>12.3e} {:>12.3e} {:>10.2f}".format(
+                    name, count, compression, median, best, peak / 2 ** 20))
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    Print the ratio of every best time to the baseline, which is less affected by other load on the machine than the
+    median.
+
+    :return: number of stages slower than ``threshold`` times the baseline
+    :rtype: int
+    """
+    def key(result):
+        return result['stage'], result['samples'], result['segments'], result['compression']
+
+    earlier = {key(result): result for result in baseline['results']}
+    regressions = 0
+    print("\n{:<30} {:>10} {:>9} {:>10} {:>10}".format("stage", "samples", "zip", "time", "memory"))
+    for result in results:
+        before = earlier.get(key(result))
+        if before is None:
+            continue
+        ratio = result['min'] / before['min']
+        memory = result['peak_bytes'] / max(before['peak_bytes'], 1)
+        flag = ''
+        if ratio > threshold:
+            flag = '  slower'
+            regressions += 1
+        print("{:<30} {:>10} {:>9} {:>10.2f} {:>10.2f}{}".format(
+            result['stage'], result['samples'], result['compression'], ratio, memory, flag))
+    return regressions
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--samples', type=int, nargs='+', default=[10 ** 3, 10 ** 5],
+                        help="samples per segment and channel")
+    parser.add_argument('--segments', type=int, default=4, help="segments per force file")
+    parser.add_argument('--compression', nargs='+', default=['deflated'], choices=['stored', 'deflated'])
+    parser.add_argument('--repeat', type=int, default=5, help="timed runs per stage")
+    parser.add_argument('--output', help="save results to this JSON file")
+    parser.add_argument('--compare', help="JSON file of an earlier run to compare against")
+    parser.add_argument('--threshold', type=float, default=1.2,
+                        help="ratio to the earlier best time counting as regression")
+    options = parser.parse_args(arguments)
+
+    # the time zone of the JPK headers is not known to dateutil, which warns on every file
+    warnings.filterwarnings('ignore', message='tzname')
+
+    print("{:<30} {:>10} {:>9} {:>12} {:>12} {:>10}".format(
+        "stage", "samples", "zip", "median [s]", "min [s]", "peak [MB]"))
+    with tempfile.TemporaryDirectory() as directory:
+        results = run_suite(options.samples, options.segments, options.compression, options.repeat, directory)
+
+    report = {
+        'meta': {'time': time.strftime('%Y-%m-%d %H:%M:%S'), 'python': platform.python_version(),
+                 'numpy': np.__version__, 'pandas': pd.__version__, 'machine': platform.platform(),
+                 'repeat': options.repeat},
+        'results': results,
+    }
+    if options.output:
+        with open(options.output, 'w') as outfile:
+            json.dump(report, outfile, indent=2)
+
+    if options.compare:
+        with open(options.compare) as infile:
+            regressions = compare(results, json.load(infile), options.threshold)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,91 @@
+# coding=utf-8
+"""
+Synthetic JPK force files of configurable size for benchmarks.
+
+The general and shared headers are taken from the sample file of the test suite, so calibrations and channel layout
+are those of a real CellHesion200 measurement. Segment headers and channel data are generated.
+"""
+
+import os
+import zipfile
+
+import numpy as np
+
+
+TEMPLATE = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "tests", "data", "sample.jpk-force")
+
+# JPK names of the segments of a CellHesion200 measurement, in order
+SEGMENT_NAMES = ('extend', 'pause-at-end', 'retract', 'pause-at-start')
+
+COMPRESSIONS = {'stored': zipfile.ZIP_STORED, 'deflated': zipfile.ZIP_DEFLATED}
+
+_SEGMENT_HEADER = """#Thu Dec 11 18:19:11 CET 2014
+force-segment-header.type=spm-force-segment-header
+force-segment-header.duration={duration}
+force-segment-header.num-points={samples}
+force-segment-header.time-stamp=2014-12-11 18\\:19\\:01.194 +0100
+force-segment-header.name.type=standard
+force-segment-header.name.name={name}-cellhesion200
+force-segment-header.force-scan-flags.data-segment=true
+force-segment-header.settings.style={name}
+channels.list=height vDeflection
+channel.height.lcd-info.*=0
+channel.height.data.file.name=channels/height.dat
+channel.height.data.file.format=raw
+channel.height.data.num-points={samples}
+channel.vDeflection.lcd-info.*=1
+channel.vDeflection.data.file.name=channels/vDeflection.dat
+channel.vDeflection.data.file.format=raw
+channel.vDeflection.data.num-points={samples}
+"""
+
+
+def segment_name(segment):
+    """JPK name of the n-th segment, segments beyond the usual four are numbered"""
+    return SEGMENT_NAMES[segment] if segment < len(SEGMENT_NAMES) else 'segment-{}'.format(segment)
+
+
+def write_force_file(path, samples=10 ** 4, segments=4, compression='deflated', sampling_rate=5000.0, seed=0):
+    """
+    Write a synthetic force file.
+
+    :param path: path of the new file
+    :type path: str
+    :param samples: samples per segment and channel
+    :type samples: int
+    :param segments: number of segments
+    :type segments: int
+    :param compression: compression of the zip members, either stored or deflated
+    :type compression: str
+    :param sampling_rate: samples per second, determines the segment durations
+    :type sampling_rate: float
+    :param seed: seed of the random channel data
+    :type seed: int
+    :return: path
+    :rtype: str
+    """
+    if compression not in COMPRESSIONS:
+        raise ValueError("compression has to be one of {}".format(', '.join(sorted(COMPRESSIONS))))
+    random = np.random.RandomState(seed)
+
+    with zipfile.ZipFile(TEMPLATE) as template:
+        header = template.read('header.properties').decode('utf-8')
+        shared = template.read('shared-data/header.properties')
+    header = '\n'.join('force-scan-series.force-segments.count={}'.format(segments)
+                       if line.startswith('force-scan-series.force-segments.count=') else line
+                       for line in header.splitlines()) + '\n'
+
+    with zipfile.ZipFile(path, 'w', compression=COMPRESSIONS[compression]) as archive:
+        archive.writestr('header.properties', header)
+        archive.writestr('shared-data/header.properties', shared)
+        for segment in range(segments):
+            prefix = 'segments/{}/'.format(segment)
+            archive.writestr(prefix + 'segment-header.properties', _SEGMENT_HEADER.format(
+                name=segment_name(segment), samples=samples, duration=samples / sampling_rate))
+
+            # a height ramp and a noisy deflection, realistic enough for the deflate ratio
+            height = np.linspace(-2 ** 30, 2 ** 30, samples) + random.normal(0, 2 ** 12, samples)
+            deflection = np.cumsum(random.normal(0, 2 ** 10, samples)) + random.normal(0, 2 ** 14, samples)
+            archive.writestr(prefix + 'channels/height.dat', height.astype('>i4').tobytes())
+            archive.writestr(prefix + 'channels/vDeflection.dat', deflection.astype('>i4').tobytes())
+    return path
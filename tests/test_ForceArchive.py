@@ -1,10 +1,15 @@
 # coding=utf-8
 
+import builtins
+import io
+import pickle
+
 import pytest
 
-from zipfile import ZipInfo
+from zipfile import ZipInfo, ZipFile, ZIP_STORED
 
-from numpy import ndarray
+from numpy import ndarray, memmap
+from numpy.testing import assert_array_equal
 from JPKay.core.data_structures import ForceArchive
 
 
@@ -35,4 +40,91 @@ class TestForceArchive:
         assert isinstance(sample.read_data('segments/0/channels/vDeflection.dat'), ndarray)
         with pytest.raises(ValueError):
             sample.read_data('false.file')
-        assert sample.read_data('segments/0/channels/vDeflection.dat').shape == (1000, 1)
+        assert sample.read_data('segments/0/channels/vDeflection.dat').shape == (1000,)
+        assert sample.read_data('segments/0/channels/vDeflection.dat', column=True).shape == (1000, 1)
+
+    def test_read_data_dtype(self, sample_force_file):
+        sample = ForceArchive(sample_force_file)
+        raw = sample.read_data('segments/0/channels/vDeflection.dat')
+        converted = sample.read_data('segments/0/channels/vDeflection.dat', dtype='float64')
+        assert raw[0] == -4454604
+        assert converted.dtype == 'float64'
+        assert converted[0] == -4454604.0
+
+    def test_member_cache(self, sample_force_file):
+        sample = ForceArchive(sample_force_file)
+        first = sample.read('segments/0/channels/vDeflection.dat')
+        assert sample.read('segments/0/channels/vDeflection.dat') is first
+        uncached = ForceArchive(sample_force_file, cache=False)
+        assert uncached.read('header.properties') is not uncached.read('header.properties')
+
+    def test_context_manager(self, sample_force_file):
+        with ForceArchive(sample_force_file) as sample:
+            sample.read_properties('header.properties')
+        # cached members stay readable after closing, everything else opens the file again
+        assert sample.read_properties('header.properties')['jpk-data-file'] == 'spm-forcefile'
+        assert sample.closed
+        assert sample.read('segments/0/channels/height.dat')
+        assert not sample.closed
+        sample.close()
+
+    def test_pickle(self, sample_force_file):
+        sample = ForceArchive(sample_force_file)
+        sample.read('segments/0/channels/height.dat')
+        restored = pickle.loads(pickle.dumps(sample))
+        assert restored.file_path == sample_force_file
+        assert restored.contents[0].filename == 'header.properties'
+        assert restored.closed
+        assert restored.read('segments/0/channels/height.dat') == sample.read('segments/0/channels/height.dat')
+        restored.close()
+
+    def test_read_buffer(self, sample_force_file, tmp_path):
+        # rewrite the sample with all members stored uncompressed
+        stored_file = str(tmp_path / "stored.jpk-force")
+        with ZipFile(sample_force_file) as source, ZipFile(stored_file, 'w', ZIP_STORED) as target:
+            for info in source.infolist():
+                target.writestr(info.filename, source.read(info), compress_type=ZIP_STORED)
+
+        compressed = ForceArchive(sample_force_file)
+        stored = ForceArchive(stored_file)
+        content_path = 'segments/0/channels/vDeflection.dat'
+
+        assert isinstance(stored.read_buffer(content_path), memmap)
+        assert not isinstance(compressed.read_buffer(content_path), memmap)
+        assert compressed.read_buffer(content_path, chunk_size=100).tobytes() == compressed.read(content_path)
+        assert stored.read_buffer(content_path).tobytes() == compressed.read(content_path)
+
+        data = stored.read_data(content_path)
+        assert isinstance(data.base, memmap)
+        assert_array_equal(data, compressed.read_data(content_path))
+        assert_array_equal(stored.read_data(content_path, dtype='float64'), data)
+
+        # views on the cached decompressed member are read-only, like those on the memory map
+        cached = compressed.read_data(content_path)
+        assert not cached.flags.writeable and not data.flags.writeable
+        with pytest.raises(ValueError):
+            cached[0] = 0
+
+    def test_single_open(self, sample_force_file, tmp_path, monkeypatch):
+        stored_file = str(tmp_path / "stored.jpk-force")
+        with ZipFile(sample_force_file) as source, ZipFile(stored_file, 'w', ZIP_STORED) as target:
+            for info in source.infolist():
+                target.writestr(info.filename, source.read(info), compress_type=ZIP_STORED)
+
+        # count every open of the archive file, through zipfile as well as through numpy
+        opened = []
+        original_open = io.open
+
+        def counting_open(file, *args, **kwargs):
+            if file == stored_file:
+                opened.append(file)
+            return original_open(file, *args, **kwargs)
+
+        monkeypatch.setattr(io, 'open', counting_open)
+        monkeypatch.setattr(builtins, 'open', counting_open)
+        archive = ForceArchive(stored_file)
+        members = [info.filename for info in archive.contents if info.filename.endswith('.dat')]
+        assert len(members) > 1
+        for content_path in members:
+            assert isinstance(archive.read_data(content_path).base, memmap)
+        assert len(opened) == 1
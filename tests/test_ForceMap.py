@@ -0,0 +1,92 @@
+# coding=utf-8
+
+from zipfile import ZipFile
+
+import pytest
+
+import numpy as np
+import numpy.testing as npt
+
+from JPKay.core.data_structures import CellHesion
+from JPKay.core.force_map import ForceMap
+
+
+@pytest.fixture(scope='module')
+def force_map_file(tmp_path_factory, sample_force_file):
+    """3x2 force map built from the sample curve, curve n holds the first 1000 - 100 * n samples, pixel (2, 1) is
+    missing"""
+    path = str(tmp_path_factory.mktemp("force_map") / "sample.jpk-force-map")
+    with ZipFile(sample_force_file) as source, ZipFile(path, 'w') as target:
+        header = source.read('header.properties').decode('utf-8')
+        header = header.replace('jpk-data-file=spm-forcefile', 'jpk-data-file=spm-forcemap')
+        header += 'force-scan-map.position-pattern.grid.ilength=3\nforce-scan-map.position-pattern.grid.jlength=2\n'
+        target.writestr('header.properties', header)
+        target.writestr('shared-data/header.properties', source.read('shared-data/header.properties'))
+
+        for index in range(5):
+            prefix = 'index/{}/'.format(index)
+            target.writestr(prefix + 'header.properties', '#Thu Dec 11 18:19:11 CET 2014\n'
+                                                          'force-scan-series.force-segments.count=1\n')
+            target.writestr(prefix + 'segments/0/segment-header.properties',
+                            source.read('segments/0/segment-header.properties'))
+            for channel in ('vDeflection', 'height'):
+                data = source.read('segments/0/channels/{}.dat'.format(channel))
+                target.writestr(prefix + 'segments/0/channels/{}.dat'.format(channel), data[:4 * (1000 - 100 * index)])
+    return path
+
+
+# noinspection PyShadowingNames
+class TestForceMap:
+
+    def test_index(self, force_map_file):
+        force_map = ForceMap(force_map_file)
+        assert force_map.shape == (2, 3)
+        assert force_map.indices == [0, 1, 2, 3, 4]
+        assert force_map.index(1, 1) == 4
+        with pytest.raises(ValueError):
+            force_map.index(3, 0)
+
+    def test_load_channel(self, force_map_file, sample_force_file):
+        force_map = ForceMap(force_map_file)
+        reference = CellHesion(sample_force_file).segment('retract').force
+        npt.assert_array_equal(force_map.load_channel(0, 0, 'retract', 'force'), reference)
+        npt.assert_array_equal(force_map.load_channel(1, 1, 'retract', 'force'), reference[:600])
+        with pytest.raises(ValueError):
+            force_map.load_channel(2, 1, 'retract', 'force')
+        with pytest.raises(ValueError, match="no segment pause"):
+            force_map.load_channel(0, 0, 'pause', 'force')
+        with pytest.raises(ValueError, match="no segment pause"):
+            force_map.channel_array('pause')
+
+    def test_curve(self, force_map_file):
+        force_map = ForceMap(force_map_file)
+        assert force_map.curve(1, 0).shape == (900, 8)
+        assert force_map.curve(1, 0, layout='long').shape == (900, 4)
+
+    def test_channel_array(self, force_map_file, sample_force_file):
+        force_map = ForceMap(force_map_file, workers=2)
+        reference = CellHesion(sample_force_file).segment('retract').height
+        heights = force_map.channel_array('retract', 'height')
+        assert heights.shape == (2, 3, 1000)
+        npt.assert_array_equal(heights[0, 0], reference)
+        npt.assert_array_equal(heights[1, 1, :600], reference[:600])
+        assert np.isnan(heights[1, 1, 600:]).all()
+        assert np.isnan(heights[1, 2]).all()
+        assert force_map.channel_array('retract', 'force', dtype=np.float32).dtype == np.float32
+
+    def test_curve_outside_grid(self, force_map_file, tmp_path):
+        # a 2x2 grid holds only four of the five curves
+        path = str(tmp_path / "small.jpk-force-map")
+        with ZipFile(force_map_file) as source, ZipFile(path, 'w') as target:
+            for info in source.infolist():
+                content = source.read(info)
+                if info.filename == 'header.properties':
+                    content = content.replace(b'grid.ilength=3', b'grid.ilength=2')
+                target.writestr(info, content)
+
+        with pytest.raises(ValueError, match="curve 4 outside of the 2x2 grid"):
+            ForceMap(path).channel_array('retract', 'force')
+
+    def test_not_a_force_map(self, sample_force_file):
+        with pytest.raises(ValueError):
+            ForceMap(sample_force_file)
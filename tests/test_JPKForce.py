@@ -1,5 +1,7 @@
 # coding=utf-8
 
+import os
+
 import pytest
 
 import numpy.testing as npt
@@ -7,7 +9,7 @@ from numpy import array
 import pandas.util.testing as pdt
 import pandas as pd
 
-from JPKay.core.data_structures import CellHesion
+from JPKay.core.data_structures import CellHesion, ForceArchive
 
 
 # noinspection PyShadowingNames,PyPep8Naming
@@ -20,8 +22,8 @@ class TestJpkForce:
 
         assert vDef[0] == -4454604
         assert height[0] == 468876141
-        assert vDef.shape == (1000, 1)
-        assert height.shape == (1000, 1)
+        assert vDef.shape == (1000,)
+        assert height.shape == (1000,)
 
     def test_load_data(self, sample_force_file):
         sample = CellHesion(sample_force_file)
@@ -32,7 +34,51 @@ class TestJpkForce:
         data = array([-2.98158446715e-11, 3.90831266155e-05])
         df = pd.DataFrame(columns=index)
         df.loc[0, 'retract'] = data
-        pdt.assert_almost_equal(sample.data.loc[0], df.loc[0])
+        pdt.assert_almost_equal(sample.data.loc[0], df.loc[0].astype('float64'))
+        assert (sample.data.dtypes == 'float64').all()
+
+    @pytest.mark.skipif(not os.path.isdir('/proc/self/fd'), reason="open file descriptors are listed in /proc")
+    def test_eager_releases_archive(self, sample_force_file):
+        before = len(os.listdir('/proc/self/fd'))
+        sample = CellHesion(sample_force_file)
+        assert len(os.listdir('/proc/self/fd')) == before
+        assert sample.archive.closed
+        assert not sample.archive._members
+
+        # the archive of a lazy sample stays open for decoding, one handed in is left to its owner
+        lazy = CellHesion(sample_force_file, lazy=True)
+        assert not lazy.archive.closed
+        with ForceArchive(sample_force_file) as archive:
+            CellHesion(archive=archive)
+            assert not archive.closed
+        lazy.archive.close()
+
+    def test_load_data_float32(self, sample_force_file):
+        sample = CellHesion(sample_force_file, lazy=True)
+        df = sample.load_data(dtype='float32')
+        assert (df.dtypes == 'float32').all()
+        npt.assert_allclose(df.retract.force.values, sample.data.retract.force.values, rtol=1e-6)
+
+    def test_load_data_long(self, sample_force_file):
+        sample = CellHesion(sample_force_file, lazy=True)
+        df = sample.load_data(layout='long')
+        assert list(df.columns) == ['segment', 'index', 'force', 'height']
+        assert df.shape == (1000, 4)
+        assert list(df.segment.cat.categories) == ['retract']
+        npt.assert_array_equal(df.force.values, sample.segment('retract').force)
+        with pytest.raises(ValueError):
+            sample.load_data(layout='tall')
+
+    def test_assemble_df_ragged(self):
+        channels = {('approach', 'force'): array([1., 2., 3.]), ('approach', 'height'): array([4., 5., 6.]),
+                    ('retract', 'force'): array([7.]), ('retract', 'height'): array([8.])}
+        wide = CellHesion.assemble_df(channels)
+        assert wide.shape == (3, 8)
+        assert wide.retract.force.isnull().sum() == 2
+        assert wide.pause.height.isnull().all()
+        long = CellHesion.assemble_df(channels, layout='long')
+        assert long.shape == (4, 4)
+        assert list(long['index']) == [0, 1, 2, 0]
 
     def test_convert_data(self, sample_force_file):
         sample = CellHesion(sample_force_file)
@@ -42,6 +88,23 @@ class TestJpkForce:
         npt.assert_almost_equal(conv_1, array(-2.98158446715e-11), decimal=20)
         npt.assert_almost_equal(conv_2, array(3.90831266155e-05), decimal=15)
 
+    def test_convert_data_slots(self, sample_force_file):
+        sample = CellHesion(sample_force_file)
+        raw = array([-4454604, 0], dtype='>i4')
+
+        out = array([0.0, 0.0])
+        assert sample.convert_data('vDeflection', raw, out=out) is out
+        npt.assert_almost_equal(out[0], -2.98158446715e-11, decimal=20)
+
+        single = sample.convert_data('vDeflection', raw, dtype='float32')
+        assert single.dtype == 'float32'
+        npt.assert_allclose(single, out, rtol=1e-6)
+
+        volts = sample.convert_data('vDeflection', raw, slot='volts')
+        npt.assert_allclose(volts, raw * 5.525411033343059e-09 - 0.0006075877326676198)
+        with pytest.raises(ValueError):
+            sample.convert_data('vDeflection', raw, slot='nominal')
+
     def test_construct_df(self, sample_force_file):
         sample = CellHesion(sample_force_file)
         df = sample.construct_df()
@@ -49,3 +112,30 @@ class TestJpkForce:
         iterable = [['approach', 'contact', 'retract', 'pause'], ['force', 'height']]
         index = pd.MultiIndex.from_product(iterable, names=['segment', 'channel'])
         pdt.assert_frame_equal(df, pd.DataFrame(columns=index))
+
+    def test_archive_session(self, sample_force_file):
+        with ForceArchive(sample_force_file) as archive:
+            sample = CellHesion(archive=archive)
+        assert sample.archive is archive
+        assert sample.properties.archive is archive
+        assert sample.file == sample_force_file
+        assert sample.data.shape == (1000, 8)
+        with pytest.raises(ValueError):
+            CellHesion()
+
+    def test_lazy(self, sample_force_file):
+        sample = CellHesion(sample_force_file, lazy=True)
+        assert sample._data is None
+
+        retract = sample.segment('retract')
+        npt.assert_almost_equal(retract.force[0], -2.98158446715e-11, decimal=20)
+        npt.assert_almost_equal(retract.height[0], 3.90831266155e-05, decimal=15)
+        assert list(sample._channels) == [('retract', 'force'), ('retract', 'height')]
+        assert retract.force is sample.segment('retract').force
+        assert sample._data is None
+
+        assert sample.data.shape == (1000, 8)
+        with pytest.raises(ValueError):
+            sample.segment('approach')
+        with pytest.raises(ValueError):
+            sample.load_channel('retract', 'vDeflection')
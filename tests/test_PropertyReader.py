@@ -2,10 +2,11 @@
 
 import pytest
 import json
+from zipfile import ZipFile
 
 from numpy import array
 
-from JPKay.core.data_structures import Properties
+from JPKay.core.data_structures import ForceArchive, Properties, SharedHeaderCache, shared_headers
 
 
 # noinspection PyShadowingNames
@@ -49,3 +50,93 @@ class TestPropertyReader:
         with open(segments_prop_dict) as infile:
             original_props = json.load(infile)
         assert original_props == loaded_props
+
+    def test_archive_session(self, sample_force_file, general_prop_dict):
+        with ForceArchive(sample_force_file) as archive:
+            props = Properties(archive=archive)
+            assert props.archive is archive
+            assert props.file_path == sample_force_file
+        with open(general_prop_dict) as infile:
+            assert json.load(infile) == props.general
+        with pytest.raises(ValueError):
+            Properties()
+
+    def test_to_from_dict(self, sample_force_file):
+        props = Properties(file_path=sample_force_file)
+        restored = Properties.from_dict(json.loads(json.dumps(props.to_dict())))
+        assert restored.archive is None
+        assert restored.general == props.general
+        assert restored.segments == props.segments
+        assert restored.channel_numbers == props.channel_numbers
+        assert restored.conversion_factors == props.conversion_factors
+        assert restored.units == props.units
+
+    def test_shared_header_cache(self, sample_force_file, tmp_path, monkeypatch):
+        # copy of the sample written an hour later, with an identical shared header otherwise
+        later_file = str(tmp_path / "later.jpk-force")
+        with ZipFile(sample_force_file) as source, ZipFile(later_file, 'w') as target:
+            for info in source.infolist():
+                content = source.read(info)
+                if info.filename.endswith('header.properties'):
+                    content = content.replace(b'18:19:11', b'19:19:11')
+                target.writestr(info.filename, content)
+
+        parsed = []
+        read_properties = ForceArchive.read_properties
+        monkeypatch.setattr(ForceArchive, 'read_properties',
+                            lambda archive, path: parsed.append(path) or read_properties(archive, path))
+
+        shared_headers.clear()
+        props = Properties(file_path=sample_force_file)
+        later = Properties(file_path=later_file)
+
+        assert parsed.count('shared-data/header.properties') == 1
+        assert len(shared_headers) == 1
+        assert later.general["timestamp"] == "2014-12-11 19:19:11 UTC+0000"
+        assert props.general["timestamp"] == "2014-12-11 18:19:11 UTC+0000"
+        assert later.conversion_factors == props.conversion_factors
+        assert later.conversion_factors is not props.conversion_factors
+        assert later.units == props.units
+        assert later.encoders == props.encoders
+
+    def test_shared_header_cache_eviction(self):
+        cache = SharedHeaderCache(maxsize=2)
+        cache.put('a', {})
+        cache.put('b', {})
+        cache.get('a')
+        cache.put('c', {})
+        assert cache.get('b') is None
+        assert cache.get('a') == {}
+        assert len(cache) == 2
+        assert SharedHeaderCache.digest(b'#date 1\nkey=value') == SharedHeaderCache.digest(b'#date 2\nkey=value')
+
+    def test_shared_props(self, sample_force_file):
+        props = Properties(file_path=sample_force_file)
+        with ForceArchive(sample_force_file) as archive:
+            assert props.shared_digest == SharedHeaderCache.digest(archive.read('shared-data/header.properties'))
+        shared = props.shared_props()
+        assert 'timestamp' not in shared
+        assert all(props.general[key] == value for key, value in shared.items())
+
+        # evicted entries are parsed again from the closed archive
+        shared_headers.clear()
+        assert props.shared_props() == shared
+        assert Properties.from_dict(props.to_dict()).shared_props() == {}
+
+    def test_affine_coefficients(self, sample_force_file):
+        props = Properties(file_path=sample_force_file)
+        assert set(props.affine) == {'vDeflection', 'hDeflection', 'height', 'capacitiveSensorHeight'}
+        assert props.default_slots == {'vDeflection': 'force', 'hDeflection': 'volts', 'height': 'nominal',
+                                       'capacitiveSensorHeight': 'nominal'}
+        assert props.slot_units['vDeflection']['force'] == 'N'
+        assert props.slot_units['hDeflection']['volts'] == 'V'
+
+        # calibrated height is based on the nominal one
+        nominal_scale, nominal_offset = props.affine_coefficients('height', 'nominal')
+        calibrated_scale, calibrated_offset = props.affine_coefficients('height', 'calibrated')
+        assert calibrated_scale == pytest.approx(nominal_scale * 0.671446014)
+
+        with pytest.raises(ValueError):
+            props.affine_coefficients('height', 'force')
+        with pytest.raises(ValueError):
+            props.affine_coefficients('lateral')
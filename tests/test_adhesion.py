@@ -0,0 +1,89 @@
+# coding=utf-8
+
+import pytest
+
+import numpy as np
+import numpy.testing as npt
+
+from JPKay.analysis.adhesion import analyze_adhesion, analyze_samples, fit_baseline, stack_curves
+from JPKay.core.data_structures import CellHesion
+
+
+def synthetic_curve(samples=2001, offset=1e-11, slope=1e-6, depth=5e-10):
+    """Retract curve over 10 µm: pushing until 1 µm, a triangular adhesion well down to ``depth`` at 2 µm detaching
+    at 4 µm, on a tilted baseline"""
+    height = np.linspace(0, 10e-6, samples)
+    force = np.where(height < 1e-6, 1e-9 * (1e-6 - height) / 1e-6, 0.0)
+    well = (height >= 1e-6) & (height < 4e-6)
+    force[well] = -depth * np.interp(height[well], [1e-6, 2e-6, 4e-6], [0, 1, 0])
+    return force + offset + slope * height, height
+
+
+class TestAdhesion:
+    def test_stack_curves(self):
+        stacked, lengths = stack_curves([np.ones(3), np.ones(5)])
+        assert stacked.shape == (2, 5)
+        npt.assert_array_equal(lengths, [3, 5])
+        assert np.isnan(stacked[0, 3:]).all()
+
+    def test_stack_channel_arrays(self, sample_force_file):
+        sample = CellHesion(force_file=sample_force_file, lazy=True)
+        stacked, lengths = stack_curves([sample.load_channel_array('retract', 'force'), np.zeros(2)])
+        npt.assert_array_equal(lengths, [1000, 2])
+        npt.assert_array_equal(stacked[0], sample.segment('retract').force)
+
+    def test_fit_baseline(self):
+        force, height = synthetic_curve()
+        slope, intercept, noise = fit_baseline(force[None], height[None])
+        npt.assert_allclose(slope, 1e-6)
+        npt.assert_allclose(intercept, 1e-11)
+        assert noise[0] < 1e-20
+        with pytest.raises(ValueError):
+            fit_baseline(force[None], height[None], fraction=0)
+
+    def test_analyze_adhesion(self):
+        curves = [synthetic_curve(depth=depth) for depth in (5e-10, 2e-10)]
+        short_force, short_height = synthetic_curve(samples=1001)
+        force, lengths = stack_curves([curve[0] for curve in curves] + [short_force])
+        height, _ = stack_curves([curve[1] for curve in curves] + [short_height])
+        force += np.random.RandomState(0).normal(0, 1e-13, force.shape)
+
+        results = analyze_adhesion(force, height, lengths)
+        assert len(results) == 3
+        npt.assert_allclose(results.contact_height, 1e-6, rtol=1e-2)
+        npt.assert_allclose(results.max_adhesion, [5e-10, 2e-10, 5e-10], rtol=1e-2)
+        npt.assert_allclose(results.max_adhesion_height, 2e-6, rtol=1e-2)
+        npt.assert_allclose(results.detachment_length, 3e-6, rtol=2e-2)
+        # area of the triangular well
+        npt.assert_allclose(results.work, [1.5 * 5e-16, 1.5 * 2e-16, 1.5 * 5e-16], rtol=1e-2)
+
+    def test_ragged_work(self):
+        # a curve ending while pulling, stacked with a longer one
+        force, height = synthetic_curve()
+        short_force, short_height = force[:1500].copy(), height[:1500]
+        short_force[-1] -= 1e-10
+        single = analyze_adhesion(short_force[None], short_height[None])
+        stacked_force, lengths = stack_curves([short_force, force])
+        stacked_height, _ = stack_curves([short_height, height])
+        stacked = analyze_adhesion(stacked_force, stacked_height, lengths)
+        assert single.work[0] > 0
+        npt.assert_allclose(stacked.work, [single.work[0], analyze_adhesion(force[None], height[None]).work[0]])
+
+    def test_no_curves(self):
+        results = analyze_adhesion(np.empty((0, 10)), np.empty((0, 10)))
+        assert len(results) == 0
+        assert 'work' in results and results.contact_index.dtype == np.intp
+
+    def test_no_contact(self):
+        height = np.linspace(0, 1e-6, 100)
+        results = analyze_adhesion(np.zeros((1, 100)), height[None])
+        assert results.contact_index[0] == -1
+        assert np.isnan(results.contact_height[0])
+        assert results.work[0] == 0
+
+    def test_analyze_samples(self, sample_force_file):
+        samples = [CellHesion(sample_force_file, lazy=True) for _ in range(2)]
+        results = analyze_samples(samples)
+        assert list(results.index) == [sample_force_file] * 2
+        assert results.max_adhesion.iloc[0] == results.max_adhesion.iloc[1]
+        assert results.max_adhesion.iloc[0] > 0
@@ -0,0 +1,93 @@
+# coding=utf-8
+
+import asyncio
+import pickle
+import time
+from zipfile import ZipFile, ZIP_STORED
+
+import numpy.testing as npt
+
+from JPKay.core.data_structures import CellHesion, ForceArchive
+from JPKay.data_io import iter_cellhesion_async, load_cellhesion_async, load_many_async
+from JPKay.data_io.aio import read_file
+
+
+class SlowReader:
+    """Reader of a high-latency file system, every read takes ``latency`` seconds"""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.calls = 0
+
+    def __call__(self, path):
+        self.calls += 1
+        time.sleep(self.latency)
+        return read_file(path)
+
+
+# noinspection PyShadowingNames
+class TestAio:
+    def test_load_cellhesion_async(self, sample_force_file):
+        sample = asyncio.run(load_cellhesion_async(sample_force_file))
+        assert sample.file == sample_force_file
+        npt.assert_array_equal(sample.data.values, CellHesion(sample_force_file).data.values)
+
+    def test_eager_released(self, sample_force_file):
+        sample = asyncio.run(load_cellhesion_async(sample_force_file))
+        assert sample.archive.closed
+        assert sample.archive._content is None
+        assert not sample.archive._members
+        assert sample.data.shape == (1000, 8)
+
+    def test_archive_from_content(self, sample_force_file, tmp_path):
+        # stored members are viewed in the content without copy
+        stored = str(tmp_path / "stored.jpk-force")
+        with ZipFile(sample_force_file) as source, ZipFile(stored, 'w', compression=ZIP_STORED) as target:
+            for info in source.infolist():
+                target.writestr(info.filename, source.read(info))
+
+        content = read_file(stored)
+        archive = ForceArchive(stored, content=content)
+        buffer = archive.read_buffer('segments/0/channels/vDeflection.dat')
+        assert buffer.base is not None
+        assert archive.read_data('segments/0/channels/vDeflection.dat')[0] == -4454604
+
+    def test_iter_with_errors(self, sample_force_file):
+        async def collect():
+            return [result async for result in iter_cellhesion_async(
+                [sample_force_file, "missing.jpk-force", sample_force_file], concurrency=2, lazy=True)]
+
+        results = asyncio.run(collect())
+        assert sorted(result.path for result in results) == sorted(
+            [sample_force_file, "missing.jpk-force", sample_force_file])
+        assert sum(result.ok for result in results) == 2
+
+    def test_overlapping_reads(self, sample_force_file):
+        reader = SlowReader(latency=0.1)
+        paths = [sample_force_file] * 8
+
+        start = time.perf_counter()
+        results = asyncio.run(load_many_async(paths, concurrency=8, reader=reader, lazy=True))
+        elapsed = time.perf_counter() - start
+
+        assert reader.calls == 8
+        assert all(result.ok for result in results)
+        # lazy samples decode from the content read before
+        reference = CellHesion(sample_force_file)
+        for result in results:
+            npt.assert_array_equal(result.data.segment('retract').force, reference.segment('retract').force)
+            npt.assert_array_equal(result.data.data.values, reference.data.values)
+        # sequential reads alone would take 0.8 s
+        assert elapsed < 0.5
+
+    def test_duplicate_paths(self, sample_force_file):
+        paths = [sample_force_file, "missing.jpk-force", sample_force_file]
+        results = asyncio.run(load_many_async(paths, concurrency=3))
+        assert [result.path for result in results] == paths
+        assert [result.ok for result in results] == [True, False, True]
+        assert results[0].data is not results[2].data
+
+    def test_pickle_lazy(self, sample_force_file):
+        # as returned from a process pool
+        sample = pickle.loads(pickle.dumps(asyncio.run(load_cellhesion_async(sample_force_file, lazy=True))))
+        npt.assert_array_equal(sample.segment('retract').force, CellHesion(sample_force_file).segment('retract').force)
@@ -0,0 +1,65 @@
+# coding=utf-8
+
+import functools
+import os
+import types
+
+import numpy.testing as npt
+import pytest
+
+from JPKay.core.data_structures import CellHesion
+from JPKay.data_io import iter_many, load_many
+
+
+# noinspection PyShadowingNames
+@pytest.mark.usefixtures("sample_force_file")
+class TestBatch:
+
+    @pytest.mark.parametrize("executor", ['thread', 'process'])
+    def test_load_many(self, sample_force_file, executor):
+        paths = [sample_force_file, "missing.jpk-force", sample_force_file]
+        calls = []
+        results = load_many(paths, workers=2, executor=executor, progress=lambda done, total: calls.append(done))
+
+        assert [result.path for result in results] == paths
+        assert [result.ok for result in results] == [True, False, True]
+        assert isinstance(results[0].data, CellHesion)
+        assert results[0].data.data.shape == (1000, 8)
+        assert isinstance(results[1].error, ValueError)
+        assert calls == [1, 2, 3]
+
+    def test_unordered(self, sample_force_file):
+        results = load_many([sample_force_file] * 3, workers=2, executor='thread', ordered=False)
+        assert isinstance(results, types.GeneratorType)
+        first = next(results)
+        assert first.ok and first.data.data.shape == (1000, 8)
+        assert len(list(results)) == 2
+
+        # stopping early cancels the rest
+        for result in iter_many([sample_force_file] * 10, workers=1, executor='thread'):
+            break
+        with pytest.raises(ValueError):
+            iter_many([sample_force_file], executor='cluster')
+
+    @pytest.mark.parametrize("executor", ['thread', 'process'])
+    def test_lazy_loader(self, sample_force_file, executor):
+        reference = CellHesion(sample_force_file)
+        loader = functools.partial(CellHesion, lazy=True)
+        for result in load_many([sample_force_file] * 2, workers=2, executor=executor, loader=loader):
+            # archives closed by pickling are only opened again on access
+            assert result.data.archive.closed == (executor == 'process')
+            npt.assert_array_equal(result.data.segment('retract').force, reference.segment('retract').force)
+            npt.assert_array_equal(result.data.data.values, reference.data.values)
+
+    @pytest.mark.skipif(not os.path.isdir('/proc/self/fd'), reason="open file descriptors are listed in /proc")
+    def test_lazy_results_closed(self, sample_force_file):
+        # lazy samples from worker processes hold no file descriptor until they are read
+        before = len(os.listdir('/proc/self/fd'))
+        loader = functools.partial(CellHesion, lazy=True)
+        results = load_many([sample_force_file] * 8, workers=2, loader=loader)
+        assert len(os.listdir('/proc/self/fd')) <= before
+        assert results[0].data.segment('retract').force.shape == (1000,)
+
+    def test_invalid_executor(self, sample_force_file):
+        with pytest.raises(ValueError):
+            load_many([sample_force_file], executor='cluster')
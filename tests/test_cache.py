@@ -0,0 +1,93 @@
+# coding=utf-8
+
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import numpy as np
+import numpy.testing as npt
+
+from JPKay.core.data_structures import CellHesion
+from JPKay.data_io import CurveCache
+
+
+@pytest.fixture()
+def force_file(tmp_path, sample_force_file):
+    path = str(tmp_path / "sample.jpk-force")
+    shutil.copy(sample_force_file, path)
+    return path
+
+
+# noinspection PyShadowingNames
+class TestCurveCache:
+
+    def test_load(self, tmp_path, force_file):
+        cache = CurveCache(str(tmp_path / "cache"))
+        assert cache.get(force_file) is None
+
+        stored = cache.load(force_file)
+        cached = cache.get(force_file)
+        reference = CellHesion(force_file)
+
+        assert isinstance(cached.segment('retract').force, np.memmap)
+        npt.assert_array_equal(cached.segment('retract').force, reference.segment('retract').force)
+        npt.assert_array_equal(stored.segment('retract').height, reference.segment('retract').height)
+        assert cached.properties.general == reference.properties.general
+        assert cached.properties.units == reference.properties.units
+        assert cached.data.shape == (1000, 8)
+
+    def test_encoded_unavailable(self, tmp_path, force_file):
+        cached = CurveCache(str(tmp_path / "cache")).load(force_file)
+        with pytest.raises(ValueError):
+            cached.load_channel_array('retract', 'force')
+        with pytest.raises(ValueError):
+            cached.load_encoded_channel('retract', 'vDeflection')
+
+    def test_concurrent_store(self, tmp_path, force_file):
+        cache = CurveCache(str(tmp_path / "cache"))
+        sample = CellHesion(force_file, lazy=True)
+        entry = cache.store(sample)
+
+        # a reader keeps using the entry while others store the same version again
+        cached = cache.get(force_file)
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            entries = list(pool.map(cache.store, [sample] * 8))
+
+        assert entries == [entry] * 8
+        assert os.listdir(os.path.dirname(entry)) == [os.path.basename(entry)]
+        npt.assert_array_equal(cache.get(force_file).segment('retract').force, cached.segment('retract').force)
+
+    def test_content_change(self, tmp_path, force_file):
+        cache = CurveCache(str(tmp_path / "cache"), content_hash=True)
+        cache.load(force_file)
+        os.utime(force_file, (0, 0))
+        assert cache.get(force_file) is None
+        cache.load(force_file)
+        assert len(cache.entries()) == 1
+
+    def test_invalidate(self, tmp_path, force_file):
+        cache = CurveCache(str(tmp_path / "cache"))
+        cache.load(force_file)
+        cache.invalidate(force_file)
+        assert cache.get(force_file) is None
+        cache.load(force_file)
+        cache.clear()
+        assert cache.entries() == []
+
+    def test_evict(self, tmp_path, sample_force_file):
+        cache = CurveCache(str(tmp_path / "cache"))
+        paths = []
+        for index in range(3):
+            path = str(tmp_path / "{}.jpk-force".format(index))
+            shutil.copy(sample_force_file, path)
+            entry = cache.store(CellHesion(path, lazy=True))
+            os.utime(os.path.join(entry, cache.properties_file), (index, index))
+            paths.append(path)
+
+        entry_size = cache.entries()[0][1]
+        cache.evict(2 * entry_size)
+        assert cache.get(paths[0]) is None
+        assert cache.get(paths[1]) is not None
+        assert cache.size() == 2 * entry_size
@@ -0,0 +1,89 @@
+# coding=utf-8
+
+import numpy as np
+import numpy.testing as npt
+import pytest
+
+from JPKay.analysis.adhesion import stack_segment
+from JPKay.core.calibration import affine_update, recalibrate_samples, rescale_curves
+from JPKay.core.data_structures import CellHesion, Properties
+
+
+def fresh_force(sample, segment='retract'):
+    """Force converted from the encoded data with the current calibration"""
+    return sample.convert_data('vDeflection', sample.load_encoded_channel(segment, 'vDeflection'))
+
+
+# noinspection PyShadowingNames
+@pytest.mark.usefixtures("sample_force_file")
+class TestCalibration:
+
+    def test_affine_update(self):
+        raw = np.arange(-5.0, 5.0)
+        ratio, shift = affine_update((2.0, 1.0), (3.0, -1.0))
+        npt.assert_allclose(ratio * (2 * raw + 1) + shift, 3 * raw - 1)
+
+        curves = np.array([2 * raw + 1, 4 * raw])
+        ratio, shift = affine_update((np.array([2.0, 4.0]), np.array([1.0, 0.0])), (3.0, -1.0))
+        rescale_curves(curves, ratio, shift)
+        npt.assert_allclose(curves, [3 * raw - 1] * 2)
+
+    def test_properties(self, sample_force_file):
+        props = Properties(file_path=sample_force_file)
+        distance_scale, distance_offset = props.affine['vDeflection']['distance']
+        props.recalibrate(spring_constant=0.03, sensitivity=1e-7)
+
+        assert props.conversion_factors['vDeflection']['force multiplier'] == 0.03
+        assert props.conversion_factors['vDeflection']['distance multiplier'] == 1e-7
+        ratio = 1e-7 / 7.730641603896163e-08
+        npt.assert_allclose(props.affine['vDeflection']['distance'],
+                            (distance_scale * ratio, distance_offset * ratio))
+        npt.assert_allclose(props.affine['vDeflection']['force'],
+                            (distance_scale * ratio * 0.03, distance_offset * ratio * 0.03))
+
+        # kept on export, and not leaking into other files sharing the header
+        assert Properties.from_dict(props.to_dict()).conversion_factors['vDeflection']['force multiplier'] == 0.03
+        other = Properties(file_path=sample_force_file)
+        assert other.conversion_factors['vDeflection']['force multiplier'] == pytest.approx(0.01529211140472191)
+        assert other.affine['vDeflection']['distance'] == (distance_scale, distance_offset)
+
+        with pytest.raises(ValueError):
+            props.recalibrate(multipliers={('vDeflection', 'temperature'): 1.0})
+
+    def test_sample(self, sample_force_file):
+        sample = CellHesion(force_file=sample_force_file)
+        height = sample.data.retract.height.values.copy()
+        memoized = sample.segment('retract').force
+        array = sample.load_channel_array('retract', 'force')
+
+        updates = sample.recalibrate(spring_constant=0.03)
+        assert updates['height'] == (1.0, 0.0)
+        expected = fresh_force(sample)
+        npt.assert_allclose(sample.data.retract.force.values, expected, rtol=1e-12)
+        npt.assert_allclose(memoized, expected, rtol=1e-12)
+        npt.assert_allclose(np.asarray(array), expected)
+        npt.assert_array_equal(sample.data.retract.height.values, height)
+        assert np.isnan(sample.data.approach.force).all()
+
+        sample.data = sample.load_data(layout='long')
+        sample.recalibrate(spring_constant=0.01)
+        npt.assert_allclose(sample.data.force.values, fresh_force(sample), rtol=1e-12)
+
+    def test_samples(self, sample_force_file):
+        samples = [CellHesion(force_file=sample_force_file) for _ in range(3)]
+        force, _, _ = stack_segment(samples, 'retract')
+
+        updates = recalibrate_samples(samples, spring_constant=[0.01, None, 0.03], sensitivity=1e-7)
+        rescale_curves(force, *updates['force'])
+        for row, sample in enumerate(samples):
+            npt.assert_allclose(force[row], fresh_force(sample), rtol=1e-12)
+            npt.assert_allclose(sample.data.retract.force.values, fresh_force(sample), rtol=1e-12)
+        assert samples[1].properties.conversion_factors['vDeflection']['force multiplier'] == \
+            pytest.approx(0.01529211140472191)
+
+        recalibrate_samples(samples, spring_constant={sample_force_file: 0.02})
+        assert all(sample.properties.conversion_factors['vDeflection']['force multiplier'] == 0.02
+                   for sample in samples)
+
+        with pytest.raises(ValueError):
+            recalibrate_samples(samples, spring_constant=[0.01, 0.02])
@@ -0,0 +1,48 @@
+# coding=utf-8
+
+import numpy as np
+import pytest
+
+from JPKay.core.data_structures import ForceArchive
+from JPKay.data_io import scan_metadata
+
+
+# noinspection PyShadowingNames
+@pytest.mark.usefixtures("sample_force_file")
+class TestCatalog:
+
+    @pytest.mark.parametrize("executor", ['thread', 'process'])
+    def test_scan_metadata(self, sample_force_file, executor):
+        paths = [sample_force_file, "missing.jpk-force", sample_force_file]
+        catalog = scan_metadata(paths, workers=2, executor=executor, chunk_size=2)
+
+        assert list(catalog.path) == paths
+        assert catalog.error.isnull().tolist() == [True, False, True]
+        row = catalog.iloc[0]
+        assert str(row.timestamp) == '2014-12-11 18:19:11+00:00'
+        assert row.instrument == 'JPK00542-CellHesion-200'
+        assert row.segments == 'retract'
+        assert row.num_segments == 1
+        assert row.retract_duration == pytest.approx(15.727)
+        assert row.retract_points == 78635
+        assert row.duration == pytest.approx(15.727)
+        assert row.relative_setpoint == pytest.approx(0.4229480348673995)
+        assert np.isnan(row.setpoint)
+        assert row.spring_constant == pytest.approx(0.01529211140472191)
+        assert catalog.num_segments.tolist() == [1, 0, 1]
+
+    def test_skips_channel_data(self, sample_force_file, monkeypatch):
+        read = ForceArchive.read
+
+        def read_properties_only(archive, content_path):
+            assert not content_path.endswith('.dat')
+            return read(archive, content_path)
+
+        monkeypatch.setattr(ForceArchive, 'read', read_properties_only)
+        monkeypatch.setattr(ForceArchive, 'read_buffer', None)
+        catalog = scan_metadata([sample_force_file], executor='thread')
+        assert catalog.error.isnull().all()
+
+    def test_invalid_executor(self, sample_force_file):
+        with pytest.raises(ValueError):
+            scan_metadata([sample_force_file], executor='cluster')
@@ -0,0 +1,60 @@
+# coding=utf-8
+
+import numpy as np
+import pytest
+
+from JPKay.core.channel_array import ChannelArray
+from JPKay.core.data_structures import CellHesion
+
+
+# noinspection PyShadowingNames
+@pytest.mark.usefixtures("sample_force_file")
+class TestChannelArray:
+
+    def test_conversion(self, sample_force_file):
+        sample = CellHesion(force_file=sample_force_file)
+        force = sample.segment('retract').array('force')
+        height = sample.load_channel_array('retract', 'height')
+        expected = sample.data.retract.force.values
+
+        assert isinstance(force, ChannelArray)
+        assert (force.channel, force.slot, force.unit) == ('vDeflection', 'force', 'N')
+        assert height.unit == 'm'
+        assert len(force) == force.size == 1000
+        assert force.nbytes == 4000
+        np.testing.assert_array_equal(np.asarray(force), expected)
+        np.testing.assert_array_equal(np.asarray(height), sample.data.retract.height.values)
+
+        # per slice and per sample
+        np.testing.assert_array_equal(force[10:20], expected[10:20])
+        np.testing.assert_array_equal(force[expected < 0], expected[expected < 0])
+        assert force[3] == expected[3]
+        assert force.to_numpy(dtype=np.float32).dtype == np.float32
+
+        # arithmetic and reductions as for an array
+        np.testing.assert_array_equal(force * 1e12, expected * 1e12)
+        np.testing.assert_array_equal(-force, -expected)
+        assert np.min(force) == expected.min()
+        assert (force < 0).sum() == (expected < 0).sum()
+
+    def test_slots(self, sample_force_file):
+        sample = CellHesion(force_file=sample_force_file, lazy=True)
+        force = sample.load_channel_array('retract', 'force')
+        volts = force.to_slot('volts')
+        assert volts.raw is force.raw
+        assert volts.unit == 'V'
+        np.testing.assert_allclose(np.asarray(volts), sample.convert_data('vDeflection', force.raw, slot='volts'))
+
+        with pytest.raises(ValueError):
+            force.to_slot('nonsense')
+        with pytest.raises(ValueError):
+            sample.load_channel_array('retract', 'temperature')
+
+    def test_recalibration(self, sample_force_file):
+        sample = CellHesion(force_file=sample_force_file, lazy=True)
+        force = sample.load_channel_array('retract', 'force')
+        before = np.asarray(force)
+
+        scale, offset = sample.properties.affine['vDeflection']['force']
+        sample.properties.affine['vDeflection']['force'] = (2 * scale, 2 * offset)
+        np.testing.assert_allclose(np.asarray(force), 2 * before)
@@ -0,0 +1,104 @@
+# coding=utf-8
+
+import numpy as np
+import numpy.testing as npt
+import pytest
+
+from JPKay.plot import decimation
+from JPKay.plot.decimation import DecimationCache, decimate, lttb_decimate, minmax_decimate
+
+
+def reference_lttb(x, y, points):
+    """Textbook LTTB of a single curve"""
+    every = (len(x) - 2) / (points - 2)
+    index, anchor = [0], 0
+    for bucket in range(points - 2):
+        low, high = int(bucket * every) + 1, int((bucket + 1) * every) + 1
+        if bucket == points - 3:
+            next_x, next_y = x[-1], y[-1]
+        else:
+            upper = min(int((bucket + 2) * every) + 1, len(x))
+            next_x, next_y = x[high:upper].mean(), y[high:upper].mean()
+        area = np.abs((x[anchor] - next_x) * (y[low:high] - y[anchor]) -
+                      (x[anchor] - x[low:high]) * (next_y - y[anchor]))
+        anchor = low + area.argmax()
+        index.append(anchor)
+    return np.array(index + [len(x) - 1])
+
+
+@pytest.fixture
+def curves():
+    random = np.random.RandomState(0)
+    x = np.tile(np.linspace(0, 1, 10000), (5, 1))
+    y = random.normal(size=x.shape).cumsum(axis=1)
+    x[2, 7000:] = y[2, 7000:] = np.nan  # a shorter curve, padded as by stack_curves
+    return x, y
+
+
+# noinspection PyShadowingNames
+class TestDecimation:
+
+    def test_minmax(self, curves, monkeypatch):
+        x, y = curves
+        x_out, y_out = minmax_decimate(x, y, 300)
+        assert y_out.shape == (5, 590)  # whole buckets of 34 samples
+        # extremes and order are kept, the padding stays NaN
+        npt.assert_array_equal(np.nanmin(y_out, axis=1), np.nanmin(y, axis=1))
+        npt.assert_array_equal(np.nanmax(y_out, axis=1), np.nanmax(y, axis=1))
+        assert (np.diff(x_out[0]) >= 0).all()
+        assert np.isnan(y_out[2, -150:]).all() and not np.isnan(y_out[2, :400]).any()
+        for row in range(5):
+            assert np.isin(y_out[row][~np.isnan(y_out[row])], y[row]).all()
+
+        single = minmax_decimate(x[0], y[0], 300)
+        npt.assert_array_equal(single[1], y_out[0])
+        monkeypatch.setattr(decimation, 'BLOCK_SIZE', 10000)
+        npt.assert_array_equal(minmax_decimate(x, y, 300)[1], y_out)
+
+        # windows and short curves
+        x_out, y_out = minmax_decimate(x, y, 10, start=100, stop=200)
+        assert x_out.min() >= x[0, 100] and x_out.max() <= x[0, 199]
+        npt.assert_array_equal(minmax_decimate(x, y, 100, stop=150)[1], y[:, :150])
+
+    def test_lttb(self, curves, monkeypatch):
+        x, y = curves
+        x_out, y_out = lttb_decimate(x, y, 500)
+        assert y_out.shape == (5, 500)
+        for row in (0, 1):
+            npt.assert_array_equal(x_out[row], x[row, reference_lttb(x[row], y[row], 500)])
+        assert np.isnan(y_out[2, -100:]).all()
+        monkeypatch.setattr(decimation, 'BLOCK_SIZE', 10000)
+        npt.assert_array_equal(lttb_decimate(x, y, 500)[1], y_out)
+
+        with pytest.raises(ValueError):
+            lttb_decimate(x, y, 2)
+        with pytest.raises(ValueError):
+            decimate(x, y, 500, method='every_nth')
+        with pytest.raises(ValueError):
+            decimate(x, y[:, :10], 500)
+
+    def test_cache(self, curves):
+        x, y = curves
+        cache = DecimationCache(x, y)
+        assert cache.x_limits == (0.0, 1.0)
+        assert cache.y_limits == (np.nanmin(y), np.nanmax(y))
+
+        x_out, _ = cache.get(points=1000)
+        assert 1000 <= x_out.shape[1] <= 3000
+        x_zoom, _ = cache.get((0.2, 0.3), points=1000)
+        assert x_zoom.shape[1] >= 1000
+        assert np.nanmin(x_zoom) <= 0.2 and np.nanmax(x_zoom) >= 0.3
+        assert np.nanmax(x_zoom) - np.nanmin(x_zoom) < 0.5
+
+        # panning decimates only the tile coming into view, zooming back nothing
+        misses = cache.misses
+        cache.get((0.21, 0.31), points=1000)
+        assert cache.misses == misses + 1
+        cache.get((0.2, 0.3), points=1000)
+        cache.get(points=1000)
+        assert cache.misses == misses + 1 and cache.hits >= 7
+
+        assert cache.window((0.2, 0.3)) == (1999, 3001)
+        assert cache.get((2, 3))[1].shape == (5, 0)
+        cache.clear()
+        assert len(cache) == 0
@@ -0,0 +1,85 @@
+# coding=utf-8
+
+import pytest
+
+import numpy as np
+import numpy.testing as npt
+
+from JPKay.analysis.adhesion import stack_curves
+from JPKay.analysis.elasticity import FIT_DTYPE, contact_factor, fit_elasticity, fit_samples, indentation_axis
+from JPKay.core.data_structures import CellHesion
+
+
+def approach_curves(moduli, model='hertz', samples=500, contact=3e-6, offset=2e-11, noise=1e-12, seed=0, **geometry):
+    """Approach curves over 4 µm with contact at ``contact``, one per modulus"""
+    random = np.random.RandomState(seed)
+    position = np.tile(np.linspace(0, 4e-6, samples), (len(moduli), 1))
+    factor = contact_factor(model, **geometry)
+    exponent = {'hertz': 1.5, 'sneddon': 2.0}[model]
+    force = factor * np.asarray(moduli)[:, None] * np.maximum(position - contact, 0) ** exponent + offset
+    return force + random.normal(0, noise, force.shape), position
+
+
+class TestElasticity:
+    def test_contact_factor(self):
+        npt.assert_allclose(contact_factor('hertz', radius=1e-6, poisson=0), 4 / 3 * 1e-3)
+        npt.assert_allclose(contact_factor('sneddon', half_angle=45, poisson=0), 2 / np.pi)
+        with pytest.raises(ValueError):
+            contact_factor('hertz')
+        with pytest.raises(ValueError):
+            contact_factor('flat')
+
+    def test_indentation_axis(self):
+        height = np.array([[3.0, 2.0, 1.0], [1.0, 2.0, 3.0]])
+        force = np.array([[0.0, 0.0, 2.0], [0.0, 0.0, 2.0]])
+        npt.assert_allclose(indentation_axis(force, height), [[-3, -2, -1], [1, 2, 3]])
+        npt.assert_allclose(indentation_axis(force, height, spring_constant=[1.0, 2.0]), [[-3, -2, -3], [1, 2, 2]])
+
+    def test_hertz(self):
+        moduli = np.array([500.0, 1000.0, 5000.0])
+        force, position = approach_curves(moduli, radius=5e-6)
+        fits = fit_elasticity(force, position, radius=5e-6)
+        assert fits.dtype == FIT_DTYPE
+        assert fits['converged'].all()
+        npt.assert_allclose(fits['modulus'], moduli, rtol=0.02)
+        npt.assert_allclose(fits['contact'], 3e-6, rtol=0.01)
+        npt.assert_allclose(fits['rmse'], 1e-12, rtol=0.2)
+        assert (fits['r_squared'] > 0.99).all()
+
+    def test_sneddon_ragged(self):
+        moduli = np.array([2000.0, 3000.0])
+        force, position = approach_curves(moduli, model='sneddon', half_angle=35)
+        force, lengths = stack_curves([force[0], force[1, :450]])
+        position, _ = stack_curves([position[0], position[1, :450]])
+        fits = fit_elasticity(force, position, model='sneddon', half_angle=35)
+        npt.assert_allclose(fits['modulus'], moduli, rtol=0.02)
+
+    def test_warm_start(self):
+        moduli = np.full(6, 1000.0)
+        force, position = approach_curves(moduli, radius=5e-6)
+        initial = fit_elasticity(force, position, radius=5e-6, warm_start=False)
+
+        # a hopeless start for one curve, no iterations to recover on its own
+        initial[4] = (1e-3, 0.0, 1.0, 0, 0, 0, 0, False)
+        cold = fit_elasticity(force, position, radius=5e-6, initial=initial, warm_start=False, max_iter=3)
+        warm = fit_elasticity(force, position, radius=5e-6, initial=initial, shape=(2, 3), max_iter=3)
+        assert not np.isclose(cold['modulus'][4], 1000, rtol=0.02)
+        npt.assert_allclose(warm['modulus'], 1000, rtol=0.02)
+
+    def test_workers(self):
+        moduli = np.linspace(500, 5000, 10)
+        force, position = approach_curves(moduli, radius=5e-6)
+        serial = fit_elasticity(force, position, radius=5e-6)
+        parallel = fit_elasticity(force, position, radius=5e-6, workers=2, executor='thread', chunk_size=3)
+        npt.assert_allclose(parallel['modulus'], serial['modulus'])
+        with pytest.raises(ValueError):
+            fit_elasticity(force, position, radius=5e-6, workers=2, executor='cluster', chunk_size=3)
+        # rejected even if no pool is needed
+        with pytest.raises(ValueError):
+            fit_elasticity(force, position, radius=5e-6, executor='cluster')
+
+    def test_fit_samples(self, sample_force_file):
+        sample = CellHesion(sample_force_file, lazy=True)
+        fits = fit_samples([sample], segment='retract', radius=5e-6)
+        assert fits.shape == (1,)
+        assert np.isfinite(fits['rss'][0])
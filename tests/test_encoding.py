@@ -0,0 +1,47 @@
+# coding=utf-8
+
+import pytest
+
+import numpy as np
+import numpy.testing as npt
+
+from JPKay.core.encoding import decode, encoder_dtype
+
+
+class TestEncoding:
+
+    @pytest.mark.parametrize("encoding, fmt", [
+        ("signedinteger", ">i4"),
+        ("unsignedinteger", ">u4"),
+        ("signedshort", ">i2"),
+        ("unsignedshort", ">u2"),
+        ("float", ">f4"),
+        ("double", ">f8"),
+    ])
+    def test_decode(self, encoding, fmt):
+        values = np.array([0, 1, 2, 127], dtype=fmt)
+        npt.assert_array_equal(decode(values.tobytes(), encoding=encoding), values)
+
+    def test_decode_negative(self):
+        buffer = np.array([-4454604, 468876141], dtype='>i4').tobytes()
+        npt.assert_array_equal(decode(buffer), [-4454604, 468876141])
+
+    def test_decode_shape_and_dtype(self):
+        buffer = np.arange(6, dtype='>i4').tobytes()
+        assert decode(buffer).shape == (6,)
+        assert decode(buffer, column=True).shape == (6, 1)
+        assert decode(buffer, dtype=np.float32).dtype == np.float32
+
+    def test_decode_is_view(self):
+        buffer = np.arange(6, dtype='>i4').tobytes()
+        assert not decode(buffer).flags.owndata
+
+    def test_decode_is_read_only(self):
+        buffer = bytearray(np.arange(6, dtype='>i4').tobytes())
+        assert not decode(buffer).flags.writeable
+        assert decode(buffer, dtype=np.float64).flags.writeable
+
+    def test_encoder_dtype(self):
+        assert encoder_dtype("signedshort-limited") == np.dtype(">i2")
+        with pytest.raises(ValueError):
+            encoder_dtype("complex")
@@ -0,0 +1,70 @@
+# coding=utf-8
+
+import os
+
+import numpy as np
+import pytest
+
+from JPKay.core.data_structures import CellHesion
+from JPKay.data_io import ExperimentStore, export_experiment
+
+
+@pytest.fixture(params=['hdf5', 'zarr'])
+def store_path(request, tmpdir):
+    pytest.importorskip('h5py' if request.param == 'hdf5' else 'zarr')
+    return str(tmpdir.join("experiment.h5" if request.param == 'hdf5' else "experiment.zarr"))
+
+
+# noinspection PyShadowingNames
+@pytest.mark.usefixtures("sample_force_file")
+class TestExport:
+
+    def test_round_trip(self, sample_force_file, store_path):
+        paths = [sample_force_file, "missing.jpk-force", sample_force_file]
+        calls = []
+        failed = export_experiment(paths, store_path, chunk_size=4096,
+                                   progress=lambda done, total: calls.append(done))
+        assert list(failed) == ["missing.jpk-force"]
+        assert calls == [1, 2, 3]
+
+        sample = CellHesion(sample_force_file)
+        with ExperimentStore(store_path) as store:
+            assert len(store) == 2
+            assert store.paths == [sample_force_file, sample_force_file]
+            assert store.segments == ['retract']
+            assert store.unit('retract', 'force') == ('force', 'N')
+
+            force = store.load('retract', 'force', 1)
+            np.testing.assert_array_equal(force, sample.data.retract.force.values)
+            heights = store.load('retract', 'height', slice(None))
+            assert len(heights) == 2
+            np.testing.assert_array_equal(heights[0], sample.data.retract.height.values)
+
+            raw = store.raw('retract', 'vDeflection', 0)
+            assert raw.dtype == np.int32
+            scales, offsets = store.coefficients('retract')
+            np.testing.assert_allclose(raw * scales[0] + offsets[0], force)
+
+            metadata = store.metadata
+            assert list(metadata.path) == store.paths
+            assert metadata.spring_constant[0] == pytest.approx(0.01529211140472191)
+            assert metadata.retract_points[0] == 78635  # as given by the header, the sample holds the first 1000
+
+            with pytest.raises(ValueError):
+                store.load('approach')
+            with pytest.raises(ValueError):
+                store.load('retract', 'hDeflection')
+
+    def test_not_a_store(self, tmpdir):
+        with pytest.raises(ValueError):
+            ExperimentStore(str(tmpdir.join("missing.h5")))
+        with pytest.raises(ValueError):
+            export_experiment([], str(tmpdir.join("experiment.csv")), fmt='csv')
+
+    def test_overwrites(self, sample_force_file, store_path):
+        export_experiment([sample_force_file] * 3, store_path)
+        export_experiment([sample_force_file], store_path)
+        assert os.path.exists(store_path)
+        with ExperimentStore(store_path) as store:
+            assert len(store) == 1
+            assert len(store.raw('retract', 'force', 0)) == 1000
@@ -0,0 +1,106 @@
+# coding=utf-8
+
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from JPKay.core.data_structures import CellHesion, ForceArchive, Properties
+from JPKay.data_io import MetadataIndex
+
+
+@pytest.fixture()
+def experiment(sample_force_file, tmpdir):
+    directory = tmpdir.mkdir("experiment")
+    for name in ("a.jpk-force", "b.jpk-force"):
+        shutil.copy(sample_force_file, str(directory.join(name)))
+    return str(directory)
+
+
+# noinspection PyShadowingNames
+@pytest.mark.usefixtures("sample_force_file")
+class TestMetadataIndex:
+
+    def test_update(self, experiment, tmpdir):
+        database = str(tmpdir.join("index.sqlite"))
+        with MetadataIndex(database) as index:
+            update = index.update(experiment, executor='thread')
+            assert (update.added, update.updated, update.unchanged, update.removed) == (2, 0, 0, 0)
+            assert len(index) == 2
+
+        # persisted, and unchanged files are not read again
+        changed = os.path.join(experiment, "a.jpk-force")
+        os.utime(changed, ns=(0, 10 ** 18))
+        os.remove(os.path.join(experiment, "b.jpk-force"))
+        with MetadataIndex(database) as index:
+            assert len(index) == 2
+            update = index.update(experiment, executor='thread')
+            assert (update.added, update.updated, update.unchanged, update.removed) == (0, 1, 0, 1)
+            assert index.update(experiment, executor='thread').unchanged == 1
+            assert index.query() == [changed]
+
+    def test_failed(self, experiment, tmpdir):
+        broken = os.path.join(experiment, "broken.jpk-force")
+        with open(broken, 'wb') as outfile:
+            outfile.write(b"not a zip file")
+        with MetadataIndex(str(tmpdir.join("index.sqlite"))) as index:
+            update = index.update(experiment, executor='thread')
+            assert update.added == 2
+            assert list(update.failed) == [broken]
+
+    def test_query(self, experiment):
+        with MetadataIndex(":memory:") as index:
+            index.update(experiment, executor='thread')
+            paths = sorted(os.path.join(experiment, name) for name in ("a.jpk-force", "b.jpk-force"))
+
+            assert index.query(relative_setpoint=(0.4, 0.5)) == paths
+            assert index.query(relative_setpoint=(0.5, None)) == []
+            assert index.query(timestamp=('2014-12-11', '2014-12-12')) == paths
+            assert index.query(timestamp=(None, '2014-12-11 18:00')) == []
+            assert index.query(instrument=['JPK00542-CellHesion-200', 'other']) == paths
+            assert index.query(setpoint=None, num_segments=1) == paths
+            assert index.query(path=paths[0]) == paths[:1]
+
+            # retract pulls 100 µm in 20 s
+            assert index.query(segment='retract', speed=(4e-6, 6e-6)) == paths
+            assert index.query(segment='approach') == []
+            assert index.query(points=78635) == paths
+
+            key = 'force-scan-series.header.force-settings.type'
+            assert index.query(properties={key: 'relative-force-settings'}) == paths
+            assert index.query(properties={key: 'absolute-force-settings'}) == []
+            assert index.query(properties={'lcd-info.0.channel.name': 'height'}) == paths
+
+            with pytest.raises(ValueError):
+                index.query(colour='red')
+
+    def test_properties(self, sample_force_file):
+        with MetadataIndex(":memory:") as index:
+            index.update([sample_force_file], executor='thread')
+            restored = index.properties(sample_force_file)
+            with ForceArchive(sample_force_file) as archive:
+                original = Properties(archive=archive)
+
+            assert restored.general == original.general
+            assert restored.segments == original.segments
+            assert restored.affine == original.affine
+            with pytest.raises(ValueError):
+                index.properties("missing.jpk-force")
+
+    def test_load(self, sample_force_file):
+        with MetadataIndex(":memory:") as index:
+            index.update([sample_force_file], executor='thread')
+            samples = list(index.load(segment='retract'))
+            assert len(samples) == 1
+            assert samples[0]._data is None
+            np.testing.assert_array_equal(samples[0].segment('retract').force,
+                                          CellHesion(sample_force_file).data.retract.force.values)
+
+    def test_to_frame(self, experiment):
+        with MetadataIndex(":memory:") as index:
+            index.update(experiment, executor='thread')
+            frame = index.to_frame()
+            assert len(frame) == 2
+            assert frame.segment.tolist() == ['retract', 'retract']
+            assert str(frame.timestamp[0]) == '2014-12-11 18:19:11+00:00'
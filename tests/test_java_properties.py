@@ -0,0 +1,44 @@
+# coding=utf-8
+
+from datetime import datetime, timezone
+
+from JPKay.core.java_properties import UTC_TIMESTAMP_FORMAT, parse_properties, parse_timestamp, unescape
+
+
+class TestJavaProperties:
+
+    def test_parse(self):
+        text = "#Thu Dec 11 18:19:11 CET 2014\nkey=value\nempty=\n\n! comment\n  spaced = padded value\n"
+        assert parse_properties(text) == {"key": "value", "empty": "", "spaced": "padded value"}
+
+    def test_multiple_separators(self):
+        props = parse_properties("a.b=x=y\nc:d=e\nf g")
+        assert props == {"a.b": "x=y", "c": "d=e", "f": "g"}
+
+    def test_escapes(self):
+        props = parse_properties("time=18\\:19\\:01\nkey\\=with\\ space=\\u00b5m\\t")
+        assert props == {"time": "18:19:01", "key=with space": "µm\t"}
+
+    def test_continuation(self):
+        props = parse_properties("list=a \\\n    b \\\r\n    c\nslash=end\\\\\nnext=1")
+        assert props == {"list": "a b c", "slash": "end\\", "next": "1"}
+
+    def test_plain_continuation(self):
+        # a continued value in a header that is otherwise plain
+        props = parse_properties("#Thu Dec 11 18:19:11 CET 2014\nkey=value\nlist=x\\\ny\ntime=18\\:19")
+        assert props == {"key": "value", "list": "xy", "time": "18:19"}
+
+    def test_unescape(self):
+        assert unescape("plain") == "plain"
+        assert unescape("a\\\\b\\n") == "a\\b\n"
+
+    def test_timestamp(self):
+        assert parse_timestamp("#Thu Dec 11 18:19:11 CET 2014") == "2014-12-11 18:19:11 UTC+0000"
+        parse_timestamp.cache_clear()
+        parse_timestamp("#Thu Dec 11 18:19:11 CET 2014")
+        parse_timestamp("#Thu Dec 11 18:19:11 CET 2014")
+        assert parse_timestamp.cache_info().hits == 1
+
+    def test_utc_timestamp_format(self):
+        parsed = datetime.strptime(parse_timestamp("#Thu Dec 11 18:19:11 CET 2014"), UTC_TIMESTAMP_FORMAT)
+        assert parsed == datetime(2014, 12, 11, 18, 19, 11, tzinfo=timezone.utc)
@@ -0,0 +1,56 @@
+# coding=utf-8
+
+import numpy as np
+import pytest
+
+from JPKay.core.data_structures import CellHesion
+from JPKay.plot import CurveOverlay, plot_curves
+
+matplotlib = pytest.importorskip('matplotlib')
+matplotlib.use('Agg')
+plt = pytest.importorskip('matplotlib.pyplot')
+
+
+@pytest.fixture
+def ax():
+    figure, ax = plt.subplots(figsize=(4, 3), dpi=50)
+    yield ax
+    plt.close(figure)
+
+
+# noinspection PyShadowingNames
+@pytest.mark.usefixtures("sample_force_file")
+class TestOverlay:
+
+    def test_samples(self, sample_force_file, ax):
+        samples = [CellHesion(force_file=sample_force_file) for _ in range(3)]
+        overlay = CurveOverlay.from_samples(samples, 'retract')
+        collection = overlay.draw(ax, colors='k', alpha=0.1)
+        ax.figure.canvas.draw()
+
+        assert len(overlay) == 3 and list(ax.collections) == [collection]
+        segments = collection.get_segments()
+        assert len(segments) == 3
+        # decimated to two samples per pixel column, for each of the tiles in view
+        assert 2 * int(ax.bbox.width) <= len(segments[0]) < 1000
+        height = samples[0].data.retract.height.values * 10 ** 6
+        force = samples[0].data.retract.force.values * 10 ** 12
+        assert segments[0][:, 1].min() == pytest.approx(force.min())
+        assert ax.get_xlim()[0] <= height.min() and ax.get_xlim()[1] >= height.max()
+
+    def test_zoom(self, ax):
+        x = np.tile(np.linspace(0, 10, 20000), (20, 1))
+        y = np.random.RandomState(0).normal(size=x.shape).cumsum(axis=1)
+        overlay = plot_curves(x, y, ax, method='lttb', points=500)
+        assert len(overlay.collection.get_segments()[0]) >= 500
+
+        ax.set_xlim(4, 5)
+        zoomed = overlay.collection.get_segments()[0]
+        assert zoomed[:, 0].min() <= 4 and zoomed[:, 0].max() >= 5 and zoomed[:, 0].max() < 8
+        misses = overlay.cache.misses
+        ax.set_xlim(0, 10)
+        assert overlay.cache.misses == misses
+
+        overlay.remove()
+        assert not ax.collections
+        ax.set_xlim(4, 5)
@@ -0,0 +1,77 @@
+# coding=utf-8
+
+import json
+import threading
+from zipfile import ZipFile
+
+from JPKay.core.data_structures import CellHesion, ForceArchive, shared_headers
+from JPKay.utils import profiling
+from JPKay.utils.profiling import Profile, profiled, stage
+
+
+# noinspection PyShadowingNames
+class TestProfiling:
+    def test_disabled(self, sample_force_file):
+        assert not profiling.recording()
+        assert stage('anything') is stage('other')
+        CellHesion(sample_force_file)
+
+    def test_load_pipeline(self, sample_force_file):
+        shared_headers.clear()
+        with Profile() as profile:
+            assert profiling.recording()
+            CellHesion(sample_force_file)
+        assert not profiling.recording()
+
+        summary = profile.summary()
+        for name in ('archive.open', 'archive.read', 'properties', 'properties.parse', 'decode', 'load_data',
+                     'dataframe'):
+            assert summary.loc[name, 'calls'] >= 1
+        assert (summary['exclusive'] <= summary['total'] + 1e-12).all()
+
+        # every member was read exactly once
+        with ZipFile(sample_force_file) as archive:
+            infos = [info for info in archive.infolist() if not info.is_dir()]
+        assert summary.loc['archive.read', 'calls'] == len(infos)
+        assert summary.loc['archive.read', 'bytes_read'] == sum(info.compress_size for info in infos)
+        assert summary.loc['archive.read', 'bytes_decompressed'] == sum(info.file_size for info in infos)
+        assert summary.loc['decode', 'bytes_read'] == 0
+
+    def test_nesting_and_callback(self):
+        @profiled('outer')
+        def outer():
+            with stage('inner'):
+                profiling.count(bytes_read=3)
+
+        seen = []
+        with Profile(callback=seen.append) as profile:
+            outer()
+            thread = threading.Thread(target=outer)
+            thread.start()
+            thread.join()
+
+        assert [record.name for record in seen] == ['inner', 'outer', 'inner', 'outer']
+        inner, outer_record = profile.records[:2]
+        assert inner.depth == 1 and outer_record.depth == 0
+        assert outer_record.children == inner.duration
+        assert inner.bytes_read == 3 and outer_record.bytes_read == 0
+        assert profile.records[0].thread != profile.records[2].thread
+
+    def test_allocations(self, sample_force_file):
+        with ForceArchive(sample_force_file) as archive:
+            sample = CellHesion(archive=archive, lazy=True)
+            with Profile(allocations=True) as profile:
+                data = sample.load_data()
+        assert profile.summary().loc['load_data', 'allocated'] >= data.values.nbytes
+
+    def test_chrome_trace(self, sample_force_file, tmp_path):
+        with Profile() as profile:
+            CellHesion(sample_force_file)
+        path = str(tmp_path / "trace.json")
+        profile.to_chrome_trace(path)
+        with open(path) as infile:
+            trace = json.load(infile)
+        events = trace['traceEvents']
+        assert len(events) == len(profile.records)
+        assert all(event['ph'] == 'X' and event['dur'] >= 0 for event in events)
+        assert [event['ts'] for event in events] == sorted(event['ts'] for event in events)
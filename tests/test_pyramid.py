@@ -0,0 +1,98 @@
+# coding=utf-8
+
+import os
+import shutil
+
+import numpy as np
+import numpy.testing as npt
+import pytest
+
+from JPKay.core.data_structures import CellHesion
+from JPKay.data_io import CurveCache
+from JPKay.ui import Pyramid, PyramidCache
+
+
+@pytest.fixture()
+def force_file(tmp_path, sample_force_file):
+    path = str(tmp_path / "sample.jpk-force")
+    shutil.copy(sample_force_file, path)
+    return path
+
+
+def assert_buckets(data, view, start, stop):
+    """Every bucket holds minimum and maximum of its samples, and the buckets cover the range"""
+    index, low, high = view
+    assert index[0] <= start and (np.diff(index) > 0).all()
+    for first, last, minimum, maximum in zip(index[:-1], index[1:], low, high):
+        assert minimum == data[first:last].min() and maximum == data[first:last].max()
+    # the last bucket reaches at least to the end of the range, and may be shorter than the others
+    step = index[1] - index[0] if len(index) > 1 else 1
+    first, minimum, maximum = index[-1], low[-1], high[-1]
+    assert minimum <= data[first:stop].min() and maximum >= data[first:stop].max()
+    assert minimum in data[first:first + step] and maximum in data[first:first + step]
+
+
+# noinspection PyShadowingNames
+class TestPyramid:
+
+    def test_view(self):
+        data = np.random.RandomState(0).normal(size=100003).cumsum()
+        pyramid = Pyramid.build(data, factor=4)
+        assert len(pyramid.levels) == 9 and len(pyramid.levels[-1]) == 1
+        assert pyramid.levels[-1][0].tolist() == [data.min(), data.max()]
+
+        for start, stop, points in ((0, None, 1000), (12345, 67890, 500), (5, 2000, 100), (99000, 100003, 7)):
+            index, low, high = view = pyramid.view(start, stop, points)
+            stop = len(data) if stop is None else stop
+            assert points // 2 <= len(index) <= points + 1
+            assert_buckets(data, view, start, stop)
+
+        # panning keeps the buckets aligned
+        index, _, _ = pyramid.view(12345, 67890, 500)
+        panned, _, _ = pyramid.view(12345 + 1000, 67890 + 1000, 500)
+        assert np.isin(panned[:-10], index).all()
+
+        # few samples in view are returned as they are
+        index, low, high = pyramid.view(100, 150, 1000)
+        npt.assert_array_equal(index, np.arange(100, 150))
+        npt.assert_array_equal(low, data[100:150])
+        assert len(pyramid.view(200, 100)[0]) == 0
+
+        with pytest.raises(ValueError):
+            Pyramid.build(data, factor=1)
+        with pytest.raises(ValueError):
+            pyramid.view(points=0)
+
+    def test_save(self, tmp_path):
+        data = np.arange(1000, dtype=np.float32)
+        path = str(tmp_path / "pyramid.npy")
+        Pyramid.build(data, factor=8).save(path)
+        pyramid = Pyramid.open(path, data, factor=8)
+        assert isinstance(pyramid.levels[0], np.memmap) and pyramid.levels[0].dtype == np.float32
+        npt.assert_array_equal(pyramid.view(points=10)[1], Pyramid.build(data, factor=8).view(points=10)[1])
+
+        with pytest.raises(ValueError):
+            Pyramid.open(path, data, factor=4)
+
+    def test_cache(self, tmp_path, force_file):
+        cache = PyramidCache(str(tmp_path / "cache"))
+        pyramid = cache.pyramid(force_file, 'retract', 'force')
+        entry = cache.entry_directory(force_file)
+        assert sorted(name for name in os.listdir(entry) if 'pyramid' in name) == [
+            'retract.force.pyramid4.npy', 'retract.height.pyramid4.npy']
+
+        force = CellHesion(force_file).segment('retract').force
+        assert isinstance(pyramid.data, np.memmap)
+        assert_buckets(force, pyramid.view(0, None, 100), 0, len(force))
+
+        with pytest.raises(ValueError):
+            cache.pyramid(force_file, 'approach')
+
+    def test_plain_entries(self, tmp_path, force_file):
+        # entries of a plain curve cache get their pyramids on first use
+        CurveCache(str(tmp_path / "cache")).load(force_file)
+        cache = PyramidCache(str(tmp_path / "cache"), factor=8)
+        height = cache.pyramid(force_file, 'retract', 'height')
+        assert height.factor == 8
+        assert os.path.isfile(os.path.join(cache.entry_directory(force_file), 'retract.height.pyramid8.npy'))
+        assert len(cache.entries()) == 1
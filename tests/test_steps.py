@@ -0,0 +1,71 @@
+# coding=utf-8
+
+import pytest
+
+import numpy as np
+import numpy.testing as npt
+
+from JPKay.analysis.adhesion import stack_curves
+from JPKay.analysis.steps import detect_sample_steps, detect_steps, rolling_step_statistic, segment_sampling_rate
+from JPKay.core.data_structures import CellHesion
+
+
+def staircase(samples=5000, steps=(1000, 2500, 4000), size=1e-11, noise=1e-13, seed=0):
+    """Noisy curve rising by ``size`` at each of ``steps``"""
+    force = np.zeros(samples)
+    for position in steps:
+        force[position:] += size
+    return force + np.random.RandomState(seed).normal(0, noise, samples)
+
+
+class TestSteps:
+    def test_rolling_step_statistic(self):
+        data = staircase()[None]
+        step, t = rolling_step_statistic(data, 50)
+        assert np.isnan(t[0, :50]).all() and np.isnan(t[0, -49:]).all()
+
+        # against a least squares fit of line and step window by window
+        for position in (1000, 1700):
+            values = data[0, position - 50:position + 50]
+            local = np.arange(100.0)
+            design = np.column_stack([np.ones(100), local, local >= 50])
+            coefficients, residual = np.linalg.lstsq(design, values, rcond=None)[:2]
+            error = np.sqrt(residual[0] / 97 * np.linalg.inv(design.T @ design)[2, 2])
+            npt.assert_allclose(step[0, position], coefficients[2], rtol=1e-6)
+            npt.assert_allclose(t[0, position], coefficients[2] / error, rtol=1e-6)
+
+        with pytest.raises(ValueError):
+            rolling_step_statistic(data, 1)
+
+    def test_detect_steps(self):
+        short = staircase(samples=3000, steps=(1000, 2500))
+        force, lengths = stack_curves([staircase(), short, np.random.RandomState(1).normal(0, 1e-13, 5000)])
+        height = np.tile(np.arange(5000.0), (3, 1))
+
+        steps = detect_steps(force, height, window=50, sampling_rate=[1.0, 2.0, 1.0])
+        assert list(steps.curve) == [0, 0, 0, 1, 1]
+        npt.assert_array_equal(steps['index'], [1000, 2500, 4000, 1000, 2500])
+        npt.assert_array_equal(steps.height, [1000, 2500, 4000, 1000, 2500])
+        npt.assert_allclose(steps.step, 1e-11, rtol=0.05)
+        npt.assert_allclose(steps.loading_rate, 0, atol=1e-14)
+
+        # no side lobes next to the steps with windows much larger than the noise needs
+        npt.assert_array_equal(detect_steps(staircase(), window=500)['index'], [1000, 2500, 4000])
+
+    def test_loading_rate(self):
+        force = np.arange(1000.0) * 1e-12 + np.random.RandomState(0).normal(0, 1e-13, 1000)
+        assert detect_steps(force, window=20).empty
+
+        force[500:] -= 1e-10
+        steps = detect_steps(force, window=20, sampling_rate=100.0)
+        assert len(steps) == 1
+        npt.assert_allclose(steps.loading_rate, 1e-10, rtol=0.05)
+        npt.assert_allclose(steps.step, -1e-10, rtol=0.01)
+
+    def test_detect_sample_steps(self, sample_force_file):
+        sample = CellHesion(sample_force_file, lazy=True)
+        rate = segment_sampling_rate(sample.properties, 'retract')
+        npt.assert_allclose(rate, 78635 / 15.727)
+        steps = detect_sample_steps([sample, sample], window=20, threshold=3.0)
+        assert set(steps.file) <= {sample_force_file}
+        assert (steps.groupby('curve').size().reindex([0, 1], fill_value=0).diff().fillna(0) == 0).all()
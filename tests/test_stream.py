@@ -0,0 +1,104 @@
+# coding=utf-8
+
+import os
+import shutil
+from zipfile import ZipFile
+
+import pytest
+
+import numpy.testing as npt
+
+from JPKay.core.data_structures import ForceArchive, Segment
+from JPKay.data_io import find_force_files, iter_force_files
+from JPKay.data_io import stream
+
+
+@pytest.fixture()
+def experiment(tmp_path, sample_force_file):
+    for name in ('a/1.jpk-force', 'a/2.jpk-force', 'b/3.jpk-force', 'b/notes.txt'):
+        os.makedirs(str(tmp_path / os.path.dirname(name)), exist_ok=True)
+        shutil.copy(sample_force_file, str(tmp_path / name))
+    return str(tmp_path)
+
+
+# noinspection PyShadowingNames
+class TestStream:
+
+    def test_find_force_files(self, experiment):
+        found = [os.path.relpath(path, experiment) for path in find_force_files(experiment)]
+        assert found == [os.path.join('a', '1.jpk-force'), os.path.join('a', '2.jpk-force'),
+                         os.path.join('b', '3.jpk-force')]
+
+    @pytest.mark.parametrize("prefetch", [1, 2, 8])
+    def test_iter_force_files(self, experiment, prefetch):
+        streamed = list(iter_force_files(experiment, prefetch=prefetch))
+        assert [os.path.basename(path) for path, segment in streamed] == ['1.jpk-force', '2.jpk-force',
+                                                                          '3.jpk-force']
+        path, segment = streamed[0]
+        assert isinstance(segment, Segment)
+        assert segment.name == 'retract'
+        npt.assert_almost_equal(segment.force[0], -2.98158446715e-11, decimal=20)
+
+    def test_segment_filter(self, experiment):
+        assert list(iter_force_files(experiment, segments=['approach'])) == []
+
+    @pytest.mark.parametrize("prefetch", [1, 2])
+    def test_early_stop(self, experiment, prefetch, monkeypatch):
+        read = []
+        opened = []
+        read_ahead = stream._read_ahead
+
+        def recording_read_ahead(path, segments):
+            read.append(os.path.basename(path))
+            return read_ahead(path, segments)
+
+        class RecordingArchive(ForceArchive):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                opened.append(self)
+
+        monkeypatch.setattr(stream, '_read_ahead', recording_read_ahead)
+        monkeypatch.setattr(stream, 'ForceArchive', RecordingArchive)
+        streamed = iter_force_files(experiment, prefetch=prefetch)
+        path, segment = next(streamed)
+        streamed.close()
+        # the last of the three files is never read, and nothing read ahead is left open
+        assert os.path.basename(path) == '1.jpk-force'
+        assert read == ['1.jpk-force', '2.jpk-force'][:prefetch]
+        assert len(opened) == prefetch
+        assert all(archive.closed for archive in opened)
+
+    def test_stops_at_broken_file(self, experiment, tmp_path):
+        good = list(find_force_files(experiment))
+        broken = str(tmp_path / "broken.jpk-force")
+        with open(broken, 'wb') as f:
+            f.write(b'not a force file')
+        streamed = iter_force_files([good[0], broken, good[1]], prefetch=3)
+        assert next(streamed)[0] == good[0]
+        with pytest.raises(Exception):
+            next(streamed)
+
+    def test_invalid_prefetch(self, experiment):
+        with pytest.raises(ValueError):
+            next(iter_force_files(experiment, prefetch=0))
+
+    def test_broken_file_closed(self, tmp_path, sample_force_file, monkeypatch):
+        # a force file without its shared header fails after its archive is opened
+        broken = str(tmp_path / "broken.jpk-force")
+        with ZipFile(sample_force_file) as source, ZipFile(broken, 'w') as target:
+            for info in source.infolist():
+                if info.filename != 'shared-data/header.properties':
+                    target.writestr(info, source.read(info))
+
+        opened = []
+
+        class RecordingArchive(ForceArchive):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                opened.append(self)
+
+        monkeypatch.setattr(stream, 'ForceArchive', RecordingArchive)
+        with pytest.raises(Exception):
+            next(iter_force_files([broken]))
+        assert len(opened) == 1
+        assert opened[0].closed